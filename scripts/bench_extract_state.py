@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark embedded-state extraction in MercadoLibrePublicAPI.extract_from_html
+Compares the previous marker-by-marker slice-and-copy approach with the
+single-pass raw_decode path, on text and on raw bytes
+
+Usage: python scripts/bench_extract_state.py [page.html ...]
+Without arguments it uses scripts/fixtures/mercadolibre/*.html (recorded
+listado.mercadolibre.cl pages), or a synthetic page when none are saved
+"""
+
+import builtins
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_GLOB = os.path.join(SCRIPTS_DIR, 'fixtures', 'mercadolibre', '*.html')
+
+
+def synthetic_listado(items: int = 2000) -> str:
+    """A listado-shaped page with a multi-megabyte preloaded state"""
+    results = [{
+        'id': f'MLC{1000000 + i}',
+        'title': f'Parrilla carbón modelo {i} acero inoxidable',
+        'price': 19990 + i * 10,
+        'thumbnail': f'https://http2.mlstatic.com/D_{i}-I.jpg',
+        'permalink': f'https://articulo.mercadolibre.cl/MLC-{1000000 + i}',
+        'condition': 'new',
+        'shipping': {'free_shipping': i % 2 == 0},
+        'attributes': [{'id': f'ATTR_{j}', 'value_name': 'x' * 40} for j in range(8)]
+    } for i in range(items)]
+    state = json.dumps({'initialState': {'melidata': {}}, 'search_results': {'results': results}})
+    head = '<html><head>' + ''.join(f'<link rel="preload" href="/static/{i}.js">' for i in range(300)) + '</head>'
+    body = '<body>' + '<div class="ui-search-layout__item">item</div>' * 2000
+    return f'{head}{body}<script>window.__PRELOADED_STATE__ = {state};</script></body></html>'
+
+
+def legacy_extract(api, html: str) -> Optional[Dict]:
+    """The pre-raw_decode implementation, kept here as the baseline"""
+    result = {'products': [], 'source': 'html'}
+    markers = ['window.__PRELOADED_STATE__ = ', 'window.initialState = ', '__INITIAL_STATE__ = ']
+    for marker in markers:
+        if marker in html:
+            try:
+                start = html.index(marker) + len(marker)
+                end = html.index('</script>', start)
+                json_str = html[start:end].strip()
+                if json_str.endswith(';'):
+                    json_str = json_str[:-1]
+                data = json.loads(json_str)
+                if api.extract_products_from_state(data, result):
+                    return result
+            except ValueError:
+                pass
+    return None
+
+
+def measure(fn: Callable, pages: List, min_seconds: float = 2.0) -> Dict:
+    runs = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_seconds:
+        for page in pages:
+            fn(page)
+        runs += len(pages)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for page in pages:
+        fn(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'ms_per_page': elapsed / runs * 1000, 'peak_alloc_mb': peak / (1024 * 1024)}
+
+
+def main():
+    sys.path.insert(0, SCRIPTS_DIR)
+    os.environ.setdefault('FERIADOS24_HTTP_CACHE', '0')
+    from mercadolibre_public_test import MercadoLibrePublicAPI
+
+    paths = sys.argv[1:] or sorted(glob.glob(FIXTURES_GLOB))
+    if paths:
+        texts = [open(path, encoding='utf-8').read() for path in paths]
+        source = f"{len(paths)} recorded pages"
+    else:
+        texts = [synthetic_listado()]
+        source = 'synthetic listado page'
+    raw = [text.encode('utf-8') for text in texts]
+
+    api = MercadoLibrePublicAPI()
+    size_mb = sum(len(page) for page in raw) / len(raw) / (1024 * 1024)
+
+    real_print = builtins.print
+    builtins.print = lambda *args, **kwargs: None
+    try:
+        variants = [
+            ('legacy slice + loads', lambda page: legacy_extract(api, page), texts),
+            ('raw_decode (str)', api.extract_from_html, texts),
+            ('raw_decode (bytes)', lambda page: api.extract_from_html(memoryview(page)), raw),
+        ]
+        results = [(name, measure(fn, pages)) for name, fn, pages in variants]
+    finally:
+        builtins.print = real_print
+
+    print("="*70)
+    print(f"⏱️ EMBEDDED STATE EXTRACTION ({source}, {size_mb:.1f}MB avg)")
+    print("="*70)
+    baseline = results[0][1]['ms_per_page']
+    for name, result in results:
+        print(f"{name:<24}{result['ms_per_page']:>10.2f} ms/page"
+              f"{baseline / result['ms_per_page']:>8.2f}x"
+              f"{result['peak_alloc_mb']:>10.1f}MB peak")
+
+
+if __name__ == "__main__":
+    main()
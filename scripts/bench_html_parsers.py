@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark FalabellaScraper.parse_search_results across HTML parser backends
+Reports pages per second and peak RSS for each backend, each measured in its
+own subprocess so memory numbers don't bleed into each other
+
+Usage: python scripts/bench_html_parsers.py [page.html ...]
+Without arguments it uses scripts/fixtures/falabella/*.html, or a synthetic
+listing page when no fixtures are saved
+"""
+
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import List
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_GLOB = os.path.join(SCRIPTS_DIR, 'fixtures', 'falabella', '*.html')
+
+
+def synthetic_listing(products: int = 48) -> str:
+    """A Falabella-shaped listing page for when no recorded fixtures exist"""
+    pods = []
+    for i in range(products):
+        pods.append(f'''
+        <div data-testid="product-pod" class="pod pod-item">
+          <a class="pod-link" href="/falabella-cl/product/{1000 + i}/producto-{i}">
+            <img src="https://media.falabella.com/{1000 + i}.jpg" alt="producto {i}">
+            <b class="pod-title">Marca {i % 7}</b>
+            <span class="pod-subTitle title">Producto de prueba número {i}</span>
+          </a>
+          <div class="prices">
+            <span class="copy10 primary price">$ {19990 + i * 1000:,}</span>
+            <span class="copy3 crossed price">$ {29990 + i * 1000:,}</span>
+          </div>
+          <!-- rating --><div class="ratings"><span>4.{i % 10}</span></div>
+        </div>''')
+    filler = '<div class="menu"><ul>' + ''.join(f'<li><a href="/c/{i}">Categoría {i}</a></li>' for i in range(400)) + '</ul></div>'
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Resultados</title></head>'
+        f'<body>{filler}<section id="testId-searchResults-products">{"".join(pods)}</section>'
+        '<script id="__NEXT_DATA__" type="application/json">{"buildId": "bench"}</script>'
+        '</body></html>'
+    )
+
+
+def load_pages(paths: List[str]) -> List[str]:
+    paths = paths or sorted(glob.glob(FIXTURES_GLOB))
+    if not paths:
+        return [synthetic_listing()]
+    pages = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+
+def run_backend(backend: str, paths: List[str], min_seconds: float = 2.0) -> dict:
+    """Parse the pages repeatedly with one backend; runs inside the child process"""
+    import builtins
+    os.environ.setdefault('FERIADOS24_HTTP_CACHE', '0')
+    from test_falabella_scraper import FalabellaScraper
+
+    pages = load_pages(paths)
+    scraper = FalabellaScraper(parser=backend)
+
+    # Keep the scraper's progress prints out of the timing loop
+    real_print = builtins.print
+    builtins.print = lambda *args, **kwargs: None
+    try:
+        products = sum(len(scraper.parse_search_results(page)['products']) for page in pages)
+        parsed = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < min_seconds:
+            for page in pages:
+                scraper.parse_search_results(page)
+            parsed += len(pages)
+        elapsed = time.perf_counter() - started
+    finally:
+        builtins.print = real_print
+
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+    return {
+        'backend': scraper.parser.name,
+        'pages_per_second': parsed / elapsed,
+        'peak_rss_mb': rss_mb,
+        'products_per_pass': products
+    }
+
+
+def main():
+    sys.path.insert(0, SCRIPTS_DIR)
+    from html_parsers import available_backends
+
+    if len(sys.argv) > 2 and sys.argv[1] == '--child':
+        print(json.dumps(run_backend(sys.argv[2], sys.argv[3:])))
+        return
+
+    paths = sys.argv[1:]
+    source = f"{len(paths)} pages" if paths else (
+        'saved fixtures' if glob.glob(FIXTURES_GLOB) else 'synthetic listing page'
+    )
+
+    print("="*70)
+    print(f"⏱️ HTML PARSER BENCHMARK ({source})")
+    print("="*70)
+    print(f"{'backend':<14}{'pages/s':>12}{'speedup':>10}{'peak RSS':>12}{'products':>10}")
+
+    baseline = None
+    for backend in reversed(available_backends()):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', backend, *paths],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        baseline = baseline or result['pages_per_second']
+        print(f"{result['backend']:<14}{result['pages_per_second']:>12.1f}"
+              f"{result['pages_per_second'] / baseline:>9.1f}x"
+              f"{result['peak_rss_mb']:>10.1f}MB{result['products_per_pass']:>10}")
+
+
+if __name__ == "__main__":
+    main()
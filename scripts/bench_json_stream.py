@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark streamed JSON decoding against json.loads on large answers
+For a search answer of growing size, compares decoding the whole body
+with json_stream keeping the first hits: time, bytes read and peak memory
+
+Usage: python scripts/bench_json_stream.py
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from bench_search_projection import synthetic_search
+from json_stream import CHUNK_SIZE, JSONStream, read_object
+
+KEPT = 10
+
+
+def chunked(body: bytes):
+    return [body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)]
+
+
+def measure(fn: Callable, min_seconds: float = 1.0) -> Dict:
+    runs = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_seconds or runs < 3:
+        fn()
+        runs += 1
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'ms': elapsed / runs * 1000, 'peak_mb': peak / (1024 * 1024)}
+
+
+def main():
+    print("="*70)
+    print(f"🌊 STREAMED JSON DECODING (first {KEPT} results)")
+    print("="*70)
+    print(f"{'hits':>6}{'body':>10}  {'json.loads':>22}  {'streamed':>22}{'read':>10}")
+
+    for hits in (50, 500, 5000):
+        body = json.dumps(synthetic_search(hits)).encode()
+        chunks = chunked(body)
+        streams = []
+
+        def loads():
+            data = json.loads(b''.join(chunks))
+            return data['paging'], data['results'][:KEPT]
+
+        def streamed():
+            stream = JSONStream(chunks)
+            streams.append(stream)
+            return read_object(stream, ('paging', 'results'), {'results': KEPT})
+
+        assert loads()[1] == streamed()['results']
+        full, partial = measure(loads), measure(streamed)
+        read = streams[-1].bytes_read
+        print(f"{hits:>6}{len(body) / 1024:>8.0f}KB"
+              f"  {full['ms']:>8.2f} ms {full['peak_mb']:>7.2f}MB"
+              f"  {partial['ms']:>8.2f} ms {partial['peak_mb']:>7.2f}MB"
+              f"{read / 1024:>8.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Memory footprint of Product records versus the formatted product dicts
+Parses the same synthetic MercadoLibre search hits both ways and reports
+retained bytes per product and the cost of sorting by price
+
+Usage: python scripts/bench_product_memory.py [count]
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from products import Product
+
+SELLERS = [f'TIENDA_{i}' for i in range(200)]
+
+
+def synthetic_hits(count: int) -> List[Dict]:
+    rng = random.Random(24)
+    hits = []
+    for i in range(count):
+        price = rng.randrange(2990, 899990, 10)
+        hits.append({
+            'id': f'MLC{1000000000 + i}',
+            'title': f'Producto {i} para feriados en Chile',
+            'price': price,
+            'original_price': price + rng.randrange(0, 50000, 10) if i % 3 == 0 else None,
+            'currency_id': 'CLP',
+            'condition': 'new' if i % 10 else 'used',
+            'thumbnail': f'http://http2.mlstatic.com/D_{i}-I.jpg',
+            'permalink': f'https://articulo.mercadolibre.cl/MLC-{1000000000 + i}',
+            # Fresh strings, as json.loads would produce them
+            'seller': {'nickname': ''.join(rng.choice(SELLERS))},
+            'shipping': {'free_shipping': i % 2 == 0},
+            'available_quantity': rng.randrange(1, 500),
+            'sold_quantity': rng.randrange(0, 5000),
+            'tags': ['good_quality_thumbnail', 'immediate_payment']
+        })
+    return hits
+
+
+def legacy_product(item: Dict) -> Dict:
+    """The formatted dict parse_search_results used to build"""
+    product = {
+        'id': item.get('id'),
+        'title': item.get('title'),
+        'price': f"${item.get('price'):,.0f} CLP" if item.get('price') else 'N/A',
+        'original_price': f"${item.get('original_price'):,.0f} CLP" if item.get('original_price') else None,
+        'currency': item.get('currency_id'),
+        'condition': item.get('condition'),
+        'thumbnail': item.get('thumbnail'),
+        'permalink': item.get('permalink'),
+        'seller': item.get('seller', {}).get('nickname', 'Unknown'),
+        'shipping': 'Envío gratis' if item.get('shipping', {}).get('free_shipping') else 'Envío pagado',
+        'available_quantity': item.get('available_quantity', 0),
+        'sold_quantity': item.get('sold_quantity', 0),
+        'tags': item.get('tags', [])
+    }
+    if item.get('original_price') and item.get('price'):
+        discount = ((item['original_price'] - item['price']) / item['original_price']) * 100
+        product['discount'] = f"{discount:.0f}% OFF"
+    return product
+
+
+def retained_bytes(build: Callable, hits: List[Dict]) -> Tuple[int, list]:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    products = [build(hit) for hit in hits]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, products
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    hits = synthetic_hits(count)
+
+    legacy_bytes, legacy = retained_bytes(legacy_product, hits)
+    record_bytes, records = retained_bytes(Product.from_mercadolibre, hits)
+
+    started = time.perf_counter()
+    sorted(legacy, key=lambda p: int(p['price'].strip('$ CLP').replace(',', '')) if p['price'] != 'N/A' else 0)
+    legacy_sort = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sorted(records, key=lambda p: p.price or 0)
+    record_sort = time.perf_counter() - started
+
+    print("="*70)
+    print(f"🧮 PRODUCT RECORD FOOTPRINT ({count:,} products)")
+    print("="*70)
+    print(f"{'':<16}{'bytes/product':>16}{'total MB':>12}{'sort by price':>16}")
+    print(f"{'formatted dict':<16}{legacy_bytes / count:>16.0f}{legacy_bytes / 1e6:>12.1f}{legacy_sort * 1000:>13.1f} ms")
+    print(f"{'Product':<16}{record_bytes / count:>16.0f}{record_bytes / 1e6:>12.1f}{record_sort * 1000:>13.1f} ms")
+    print(f"\n✅ {1 - record_bytes / legacy_bytes:.0%} less memory, "
+          f"{legacy_sort / record_sort:.1f}x faster price sort")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark the `attributes=`-projected MercadoLibre search
+Compares bytes per page (identity and compressed) and decode + parse time
+for a full search answer, the projection with filters, and the projection
+without them, as search_products(filters=False) requests it
+
+Usage: python scripts/bench_search_projection.py [search.json ...]
+Without arguments it uses scripts/fixtures/mercadolibre/search.json (a
+recorded /sites/MLC/search answer), or a synthetic one shaped like it
+"""
+
+import builtins
+import glob
+import gzip
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from typing import Callable, Dict, List
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_GLOB = os.path.join(SCRIPTS_DIR, 'fixtures', 'mercadolibre', 'search.json')
+
+try:
+    import brotli
+except ImportError:  # br numbers are skipped without it
+    brotli = None
+
+
+def synthetic_search(count: int = 50) -> Dict:
+    """A /sites/MLC/search page with the bulk a live answer carries"""
+    sys.path.insert(0, SCRIPTS_DIR)
+    from bench_product_memory import synthetic_hits
+
+    rng = random.Random(21)
+    results = []
+    for hit in synthetic_hits(count):
+        results.append({
+            **hit,
+            'seller': {**hit['seller'], 'id': rng.randrange(10 ** 8), 'tags': ['normal', 'credits_priority_4'],
+                       'seller_reputation': {'level_id': '5_green', 'power_seller_status': 'platinum',
+                                             'transactions': {'total': rng.randrange(10 ** 5), 'completed': 0}}},
+            'attributes': [{'id': f'ATTR_{j}', 'name': f'Atributo {j}', 'value_id': str(rng.randrange(10 ** 7)),
+                            'value_name': f'Valor {j}', 'attribute_group_id': 'OTHERS',
+                            'attribute_group_name': 'Otros', 'source': 1505} for j in range(12)],
+            'installments': {'quantity': 12, 'amount': hit['price'] / 12, 'rate': 0, 'currency_id': 'CLP'},
+            'address': {'state_id': 'CL-RM', 'state_name': 'RM (Metropolitana)', 'city_name': 'Santiago'},
+            'category_id': f'MLC{rng.randrange(1000, 9999)}',
+            'domain_id': 'MLC-GRILLS',
+        })
+
+    filters = [{
+        'id': f'FILTER_{i}', 'name': f'Filtro {i}', 'type': 'STRING',
+        'values': [{'id': str(rng.randrange(10 ** 7)), 'name': f'Opción {i}.{j}', 'results': rng.randrange(5000)}
+                   for j in range(25)]
+    } for i in range(20)]
+
+    return {
+        'site_id': 'MLC',
+        'query': 'parrilla',
+        'paging': {'total': 4821, 'offset': 0, 'limit': count, 'primary_results': 1000},
+        'results': results,
+        'sort': {'id': 'relevance', 'name': 'Más relevantes'},
+        'available_sorts': [{'id': 'price_asc', 'name': 'Menor precio'}, {'id': 'price_desc', 'name': 'Mayor precio'}],
+        'filters': [],
+        'available_filters': filters,
+        'pdp_tracking': {'group': False, 'product_info': [{'id': f'MLC{i}', 'score': i} for i in range(count)]},
+    }
+
+
+def encodings(body: bytes) -> Dict[str, int]:
+    sizes = {'identity': len(body), 'gzip': len(gzip.compress(body, 6)), 'deflate': len(zlib.compress(body, 6))}
+    if brotli is not None:
+        sizes['br'] = len(brotli.compress(body, quality=5))
+    return sizes
+
+
+def measure(fn: Callable, pages: List[bytes], min_seconds: float = 2.0) -> float:
+    """Milliseconds per page"""
+    runs = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_seconds:
+        for page in pages:
+            fn(page)
+        runs += len(pages)
+    return (time.perf_counter() - started) / runs * 1000
+
+
+def main():
+    sys.path.insert(0, SCRIPTS_DIR)
+    os.environ.setdefault('FERIADOS24_HTTP_CACHE', '0')
+    from mercadolibre_api_test import MercadoLibreAPI
+    from stub_server import select_attributes
+
+    paths = sys.argv[1:] or sorted(glob.glob(FIXTURES_GLOB))
+    if paths:
+        searches = [json.load(open(path, encoding='utf-8')) for path in paths]
+        source = f"{len(paths)} recorded answers"
+    else:
+        searches = [synthetic_search()]
+        source = 'synthetic 50-hit page'
+
+    api = MercadoLibreAPI()
+    variants = [
+        ('full answer', None, True),
+        ('projected, filters', api.search_projection(filters=True)['attributes'], True),
+        ('projected, no filters', api.search_projection(filters=False)['attributes'], False),
+    ]
+
+    real_print = builtins.print
+    builtins.print = lambda *args, **kwargs: None
+    try:
+        results = []
+        for name, attributes, filters in variants:
+            pages = [json.dumps(select_attributes(data, attributes)).encode() for data in searches]
+            parse = lambda page: api.parse_search_results(json.loads(page), max_products=50, filters=filters)
+            sizes = [encodings(page) for page in pages]
+            average = {coding: sum(s[coding] for s in sizes) / len(sizes) for coding in sizes[0]}
+            results.append((name, average, measure(parse, pages)))
+    finally:
+        builtins.print = real_print
+
+    print("="*70)
+    print(f"📉 SEARCH PROJECTION ({source})")
+    print("="*70)
+    codings = list(results[0][1])
+    print(f"{'':<24}" + ''.join(f"{coding:>10}" for coding in codings) + f"{'decode+parse':>15}")
+    baseline = results[0][2]
+    for name, sizes, ms in results:
+        print(f"{name:<24}" + ''.join(f"{sizes[coding] / 1024:>8.1f}KB" for coding in codings)
+              + f"{ms:>9.3f} ms {baseline / ms:>4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the marketplace clients
+Runs parser microbenchmarks and end-to-end client throughput against the
+local stub server (no internet needed), with and without injected latency
+and errors, and writes the numbers to a JSON results file
+
+Usage: python scripts/bench_suite.py [--output results.json] [--compare old.json]
+                                     [--quick] [--only NAME ...]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from typing import Callable, Dict, List, Optional
+
+from http_cache import default_cache_dir
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Results outlive the run, so they go to the real cache dir, not the scratch one
+DEFAULT_OUTPUT = os.path.join(default_cache_dir(), 'bench_results.json')
+
+# Measure the clients themselves: no response cache, state in a scratch dir
+os.environ['FERIADOS24_HTTP_CACHE'] = '0'
+os.environ.setdefault('FERIADOS24_CACHE_DIR', tempfile.mkdtemp(prefix='feriados24-bench-'))
+
+from rate_limiter import get_shared_limiters
+from stub_server import StubServer, redirect_session
+
+RESULTS_VERSION = 1
+# A benchmark this much slower than the compared run is flagged
+REGRESSION_THRESHOLD = 0.10
+
+
+@contextmanager
+def quiet():
+    """Silence the clients' progress prints while timing"""
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+        yield
+
+
+def measure(fn: Callable, min_seconds: float, repeats: int = 5) -> Dict:
+    """Run fn repeatedly; per-call timings from `repeats` rounds of at least min_seconds/repeats"""
+    # One warm-up call, then calibrate how many calls fill a round
+    fn()
+    started = time.perf_counter()
+    fn()
+    single = max(time.perf_counter() - started, 1e-7)
+    per_round = max(1, int(min_seconds / repeats / single))
+
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(per_round):
+            fn()
+        samples.append((time.perf_counter() - started) / per_round)
+
+    return {
+        'ms_per_op': statistics.median(samples) * 1000,
+        'ms_min': min(samples) * 1000,
+        'ops_per_sec': 1 / statistics.median(samples),
+        'calls': per_round * repeats,
+    }
+
+
+def micro_benchmarks(stub: StubServer, min_seconds: float) -> Dict[str, Dict]:
+    from falabella_api_test import FalabellaAPI
+    from mercadolibre_api_test import MercadoLibreAPI
+    from mercadolibre_public_test import MercadoLibrePublicAPI
+    from test_falabella_scraper import FalabellaScraper
+
+    ml = MercadoLibreAPI()
+    public = MercadoLibrePublicAPI()
+    scraper = FalabellaScraper()
+    falabella = FalabellaAPI()
+
+    search_data = json.loads(stub.search_page({'q': 'bench', 'limit': '50'}))
+    falabella_data = json.loads(stub.falabella_search)
+    listing = stub.falabella_listing.decode('utf-8')
+    listado = stub.ml_listado
+
+    with quiet():
+        root = scraper.parser.parse(listing)
+        elements, _ = scraper.plan.find_products(root, listing)
+
+    cases = {
+        'micro.ml.parse_search_results': lambda: ml.parse_search_results(search_data, max_products=50),
+        'micro.ml_public.extract_from_html': lambda: public.extract_from_html(memoryview(listado)),
+        'micro.falabella_scraper.parse_search_results': lambda: scraper.parse_search_results(listing),
+        'micro.falabella_scraper.extract_product_data': lambda: [scraper.extract_product_data(e) for e in elements],
+        'micro.falabella_api.parse_response': lambda: falabella.parse_response(falabella_data),
+    }
+
+    results = {}
+    with quiet():
+        for name, fn in cases.items():
+            results[name] = measure(fn, min_seconds)
+    results['micro.falabella_scraper.extract_product_data']['items_per_op'] = len(elements)
+    return results
+
+
+def throughput(fn: Callable, requests_per_call: int, min_seconds: float) -> Dict:
+    """Requests per second for a client call that issues `requests_per_call` requests"""
+    calls, failures = 0, 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_seconds or calls < 3:
+        if not fn():
+            failures += 1
+        calls += 1
+    elapsed = time.perf_counter() - started
+    return {
+        'requests_per_sec': calls * requests_per_call / elapsed,
+        'ms_per_call': elapsed / calls * 1000,
+        'calls': calls,
+        'failed_calls': failures,
+    }
+
+
+def e2e_benchmarks(stub: StubServer, label: str, min_seconds: float) -> Dict[str, Dict]:
+    from falabella_api_test import FalabellaAPI
+    from mercadolibre_api_test import HOLIDAY_QUERIES, AsyncMercadoLibreAPI, MercadoLibreAPI, httpx
+    from mercadolibre_public_test import MercadoLibrePublicAPI
+    from test_falabella_scraper import FalabellaScraper
+
+    ml = MercadoLibreAPI()
+    public = MercadoLibrePublicAPI()
+    scraper = FalabellaScraper()
+    falabella = FalabellaAPI()
+    for client in (ml, public, scraper, falabella):
+        redirect_session(client.session, stub)
+
+    ids = list(stub.items)[:200]
+    cases = {
+        'ml.search_products': (lambda: ml.search_products('parrilla', limit=50), 1),
+        'ml.iter_search': (lambda: sum(1 for _ in ml.iter_search('parrilla', max_items=500)), 10),
+        'ml.get_items': (lambda: ml.get_items(ids)['items'], 10),
+        'ml_public.search_web_format': (lambda: public.search_web_format('parrilla'), 1),
+        'falabella_scraper.search_products': (lambda: scraper.search_products('parrilla'), 1),
+        'falabella_api.search_products': (lambda: falabella.search_products('parrilla'), 1),
+    }
+
+    results = {}
+    with quiet():
+        for name, (fn, per_call) in cases.items():
+            results[f'e2e.{label}.{name}'] = throughput(fn, per_call, min_seconds)
+
+        if httpx is not None:
+            async def refresh(api):
+                return await api.get_all_holiday_recommendations()
+
+            async_api = AsyncMercadoLibreAPI(max_concurrency=16)
+            async_api.base_url = stub.origin('api.mercadolibre.com')
+            loop = asyncio.new_event_loop()
+            try:
+                per_call = sum(len(queries) for queries in HOLIDAY_QUERIES.values())
+                results[f'e2e.{label}.ml_async.get_all_holiday_recommendations'] = throughput(
+                    lambda: loop.run_until_complete(refresh(async_api)), per_call, min_seconds
+                )
+                loop.run_until_complete(async_api.aclose())
+            finally:
+                loop.close()
+
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPTS_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict, previous: Dict) -> List[str]:
+    """Benchmarks that got slower than REGRESSION_THRESHOLD"""
+    regressions = []
+    for name, result in current['benchmarks'].items():
+        old = previous.get('benchmarks', {}).get(name)
+        if not old:
+            continue
+        if 'ms_per_op' in result and 'ms_per_op' in old:
+            change = result['ms_per_op'] / old['ms_per_op'] - 1
+        elif 'requests_per_sec' in result and 'requests_per_sec' in old:
+            change = old['requests_per_sec'] / result['requests_per_sec'] - 1
+        else:
+            continue
+        result['change_vs_previous'] = round(change, 4)
+        if change > REGRESSION_THRESHOLD:
+            regressions.append(f"{name}: {change:+.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--compare', help='previous results file to diff against')
+    parser.add_argument('--quick', action='store_true', help='shorter runs, noisier numbers')
+    parser.add_argument('--only', nargs='*', default=None, help='name prefixes to run (micro, e2e)')
+    args = parser.parse_args()
+
+    min_seconds = 0.5 if args.quick else 2.0
+    wanted = lambda name: not args.only or any(name.startswith(prefix) for prefix in args.only)
+
+    # The stub answers for every host on 127.0.0.1; don't pace it like the real sites
+    get_shared_limiters().limits['127.0.0.1'] = (100000.0, 100000)
+
+    benchmarks: Dict[str, Dict] = {}
+    scenarios = [
+        ('fast', {}),
+        ('slow', {'latency': 0.02, 'jitter': 0.02}),
+        ('flaky', {'latency': 0.005, 'error_rate': 0.05, 'throttle_rate': 0.05, 'retry_after': 0.01}),
+    ]
+
+    if wanted('micro'):
+        with StubServer() as stub:
+            benchmarks.update(micro_benchmarks(stub, min_seconds))
+    for label, options in scenarios:
+        if wanted('e2e') or wanted(f'e2e.{label}'):
+            with StubServer(**options) as stub:
+                benchmarks.update(e2e_benchmarks(stub, label, min_seconds))
+                benchmarks[f'e2e.{label}.stub_requests'] = {'by_route': dict(stub.counts)}
+
+    results = {
+        'version': RESULTS_VERSION,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'scenarios': dict(scenarios),
+        'benchmarks': benchmarks,
+    }
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+    print("="*70)
+    print(f"📏 BENCHMARK SUITE ({results['git_revision'] or 'unknown revision'})")
+    print("="*70)
+    for name, result in benchmarks.items():
+        if 'ms_per_op' in result:
+            print(f"{name:<58}{result['ms_per_op']:>9.3f} ms/op")
+        elif 'requests_per_sec' in result:
+            failed = f"  ({result['failed_calls']} failed)" if result['failed_calls'] else ''
+            print(f"{name:<58}{result['requests_per_sec']:>9.1f} req/s{failed}")
+    print(f"\n💾 Results written to {args.output}")
+
+    if regressions:
+        print(f"\n⚠️ {len(regressions)} regression(s) over {REGRESSION_THRESHOLD:.0%}:")
+        for line in regressions:
+            print(f"  • {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark connection reuse of the shared transport against the local stub
+Compares a fresh connection per request (bare requests.get), one pool per
+client session, and the shared per-host pools, counting the connections
+the stub accepts. Uses HTTPS with a throwaway self-signed certificate when
+the openssl CLI is available, so the TLS handshake is part of the cost
+
+Usage: python scripts/bench_transport.py [rounds]
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Optional, Tuple
+
+os.environ['FERIADOS24_HTTP_CACHE'] = '0'
+
+import requests
+
+from http_cache import CachingAdapter, install_cache
+from rate_limiter import RateLimiterRegistry
+from stub_server import StubServer, redirect_session
+from transport import HTTP2_AVAILABLE
+
+# test_direct_api's endpoints, read by each of the four clients every round
+ENDPOINTS = [
+    "https://api.mercadolibre.com/sites/MLC",
+    "https://api.mercadolibre.com/sites/MLC/categories",
+    "https://api.mercadolibre.com/currencies/CLP",
+    "https://api.mercadolibre.com/sites/MLC/listing_types",
+]
+CLIENTS = 4
+
+
+def self_signed_cert(directory: str) -> Optional[Tuple[str, str]]:
+    """(certfile, keyfile) for 127.0.0.1, or None without openssl"""
+    if shutil.which('openssl') is None:
+        return None
+    certfile = os.path.join(directory, 'stub.pem')
+    keyfile = os.path.join(directory, 'stub.key')
+    try:
+        subprocess.run(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+             '-keyout', keyfile, '-out', certfile, '-subj', '/CN=127.0.0.1',
+             '-addext', 'subjectAltName=IP:127.0.0.1'],
+            check=True, capture_output=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return certfile, keyfile
+
+
+def run(stub: StubServer, label: str, fn: Callable[[], int], requests_made: int):
+    connections = stub.connections
+    started = time.perf_counter()
+    failed = fn()
+    elapsed = time.perf_counter() - started
+    opened = stub.connections - connections
+    print(f"{label:<40}{elapsed / requests_made * 1000:>8.2f} ms/req  "
+          f"{opened:>5} connections for {requests_made} requests" + (f"  ({failed} failed)" if failed else ''))
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+    limiters = RateLimiterRegistry({'127.0.0.1': (100000.0, 100000)})
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert = self_signed_cert(directory)
+        certfile, keyfile = cert or (None, None)
+
+        with StubServer(certfile=certfile, keyfile=keyfile) as stub:
+            def stub_url(url: str) -> str:
+                return f"{stub.base_url}/{url.split('://', 1)[1]}"
+
+            def bare() -> int:
+                # What test_direct_api did: requests.get, a new connection each time
+                failed = 0
+                for _ in range(rounds):
+                    for _ in range(CLIENTS):
+                        for url in ENDPOINTS:
+                            failed += requests.get(stub_url(url), timeout=5, verify=certfile or True).status_code != 200
+                return failed
+
+            def sessions_for(shared: bool):
+                sessions = []
+                for _ in range(CLIENTS):
+                    session = requests.Session()
+                    if shared:
+                        install_cache(session, limiters=limiters)
+                    else:
+                        adapter = CachingAdapter(None, limiters)
+                        session.mount('https://', adapter)
+                        session.mount('http://', adapter)
+                    redirect_session(session, stub)
+                    sessions.append(session)
+                return sessions
+
+            def sequential(sessions) -> Callable[[], int]:
+                def fn() -> int:
+                    failed = 0
+                    for _ in range(rounds):
+                        for session in sessions:
+                            for url in ENDPOINTS:
+                                failed += session.get(url, timeout=5).status_code != 200
+                    return failed
+                return fn
+
+            total = rounds * CLIENTS * len(ENDPOINTS)
+            print("="*70)
+            print(f"🔌 SHARED TRANSPORT ({'HTTPS' if cert else 'HTTP, no openssl for a certificate'}, "
+                  f"HTTP/2 {'available' if HTTP2_AVAILABLE else 'not installed'} for async clients)")
+            print("="*70)
+            run(stub, "bare requests.get", bare, total)
+            run(stub, f"{CLIENTS} clients, a pool each", sequential(sessions_for(False)), total)
+            run(stub, f"{CLIENTS} clients, shared pools", sequential(sessions_for(True)), total)
+
+
+if __name__ == "__main__":
+    main()
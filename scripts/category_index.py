@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Full MercadoLibre category tree with a compact, memory-mapped lookup index
+CategoryCrawler walks every /categories/{id} of a site with bounded
+parallelism through the shared response cache. write_index() packs the tree
+into one flat file: nodes in depth-first order, so a subtree is a contiguous
+range, with int32 parent / size / depth columns, a UTF-8 string blob and
+open-addressing hash tables for ids and for folded names (one slot per
+distinct name, pointing at a run of every category sharing it).
+CategoryIndex maps that file read-only and answers without parsing or
+network calls
+
+Usage: python scripts/category_index.py [--crawl] [--index PATH] [id or name ...]
+"""
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional
+
+from http_cache import default_cache_dir
+from products import fold
+
+MAGIC = b'F24C'
+INDEX_VERSION = 1
+# magic, version, node count, distinct names, id table slots, name table slots, blob bytes, built at
+HEADER = struct.Struct('<4sIIIIIIq')
+INT32 = 4
+EMPTY = -1
+
+# Separator between levels in resolve() paths and printed paths
+PATH_SEPARATOR = ' > '
+
+
+def default_index_path(site_id: str = 'MLC') -> str:
+    return os.path.join(default_cache_dir(), f"{site_id.lower()}_categories.idx")
+
+
+class CategoryCrawler:
+    """
+    Walks a site's whole category tree through /categories/{id}
+    At most `max_workers` details are in flight; each is paced by the shared
+    per-host rate limiter and answered from the response cache (24 h TTL on
+    /categories/) when fresh, so a re-crawl costs next to nothing
+    """
+
+    def __init__(self, api=None, max_workers: int = 8):
+        if api is None:
+            from mercadolibre_api_test import MercadoLibreAPI
+            api = MercadoLibreAPI()
+        self.api = api
+        self.max_workers = max_workers
+        self.failed: List[str] = []
+
+    def top_level(self) -> List[Dict]:
+        """Every top-level category of the site"""
+        try:
+            response = self.api.session.get(f"{self.api.base_url}/sites/{self.api.site_id}/categories", timeout=10)
+            if response.status_code == 200:
+                return response.json()
+            print(f"❌ Error fetching categories: {response.status_code}")
+        except Exception as e:
+            print(f"❌ Error: {str(e)}")
+        return []
+
+    def fetch(self, category_id: str) -> Optional[Dict]:
+        """One category's detail: name, path_from_root and children_categories"""
+        try:
+            response = self.api.session.get(f"{self.api.base_url}/categories/{category_id}", timeout=10)
+            if response.status_code == 200:
+                return response.json()
+        except Exception:
+            pass
+        return None
+
+    def crawl(self, roots: Optional[List[Dict]] = None) -> Dict[str, Dict]:
+        """
+        {id: {'name', 'parent', 'children'}} for every category under `roots`
+        (the site's top level by default). Children are queued as soon as
+        their parent answers; a category whose detail fails stays a leaf
+        and is listed in self.failed
+        """
+        roots = roots if roots is not None else self.top_level()
+        nodes: Dict[str, Dict] = {}
+        self.failed = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = {}
+
+            def enqueue(category: Dict, parent: Optional[str]):
+                # Placed at queue time, so roots keep the API's order
+                if category['id'] not in nodes:
+                    nodes[category['id']] = {'name': category.get('name') or '', 'parent': parent, 'children': []}
+                    pending[pool.submit(self.fetch, category['id'])] = category['id']
+
+            for category in roots:
+                enqueue(category, None)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    category_id = pending.pop(future)
+                    detail = future.result()
+                    if detail is None:
+                        self.failed.append(category_id)
+                        continue
+
+                    node = nodes[category_id]
+                    node['name'] = detail.get('name') or node['name']
+                    children = detail.get('children_categories') or []
+                    node['children'] = [child['id'] for child in children]
+                    for child in children:
+                        enqueue(child, category_id)
+
+        if self.failed:
+            print(f"⚠️ {len(self.failed)} of {len(nodes)} categories failed; kept as leaves")
+        return nodes
+
+
+def table_slots(count: int) -> int:
+    """Power of two at least twice `count`, so probes stay short"""
+    slots = 8
+    while slots < 2 * count:
+        slots *= 2
+    return slots
+
+
+def probe(key: bytes, slots: int) -> Iterator[int]:
+    """Linear probe sequence for a key"""
+    slot = zlib.crc32(key) & (slots - 1)
+    while True:
+        yield slot
+        slot = (slot + 1) & (slots - 1)
+
+
+def write_index(nodes: Dict[str, Dict], path: str) -> int:
+    """
+    Pack a crawled tree into an index file, atomically; returns its size
+    Categories whose parent is missing from `nodes` become roots
+    """
+    order: List[str] = []
+    position: Dict[str, int] = {}
+    size: Dict[str, int] = {}
+    depth: Dict[str, int] = {}
+
+    # Depth-first preorder, iterative: a node's size is known once its subtree is laid out
+    roots = [cid for cid, node in nodes.items() if node['parent'] not in nodes]
+    stack = [(cid, 0, False) for cid in reversed(roots)]
+    while stack:
+        cid, level, finished = stack.pop()
+        if finished:
+            size[cid] = len(order) - position[cid]
+            continue
+        position[cid] = len(order)
+        order.append(cid)
+        depth[cid] = level
+        stack.append((cid, level, True))
+        for child in reversed(nodes[cid]['children']):
+            # Only under the parent the crawl recorded, so subtrees stay contiguous
+            if child in nodes and nodes[child]['parent'] == cid:
+                stack.append((child, level + 1, False))
+
+    count = len(order)
+    index = {cid: i for i, cid in enumerate(order)}
+
+    parent_col = array('i', (index.get(nodes[cid]['parent'], EMPTY) for cid in order))
+    size_col = array('i', (size[cid] for cid in order))
+    depth_col = array('i', (depth[cid] for cid in order))
+
+    blob = bytearray()
+    str_off, name_off = array('i'), array('i')
+    for cid in order:
+        str_off.append(len(blob))
+        blob += cid.encode('utf-8')
+        name_off.append(len(blob))
+        blob += nodes[cid]['name'].encode('utf-8')
+    str_off.append(len(blob))
+
+    id_slots = table_slots(count)
+    id_table = array('i', [EMPTY]) * id_slots
+    for i, cid in enumerate(order):
+        for slot in probe(cid.encode('utf-8'), id_slots):
+            if id_table[slot] == EMPTY:
+                id_table[slot] = i
+                break
+
+    # Categories sharing a folded name form one run, shallowest first
+    groups: Dict[str, List[int]] = {}
+    for i, cid in enumerate(order):
+        groups.setdefault(fold(nodes[cid]['name']), []).append(i)
+    name_runs, run_off = array('i'), array('i')
+    name_slots = table_slots(len(groups))
+    name_table = array('i', [EMPTY]) * name_slots
+    for group, (key, members) in enumerate(groups.items()):
+        run_off.append(len(name_runs))
+        name_runs.extend(sorted(members, key=lambda i: depth_col[i]))
+        for slot in probe(key.encode('utf-8'), name_slots):
+            if name_table[slot] == EMPTY:
+                name_table[slot] = group
+                break
+    run_off.append(len(name_runs))
+
+    columns = [parent_col, size_col, depth_col, str_off, name_off, id_table, name_runs, run_off, name_table]
+    if sys.byteorder != 'little':
+        for column in columns:
+            column.byteswap()
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    # Unique per writer, so concurrent crawls never write into each other's file
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
+    with os.fdopen(fd, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, INDEX_VERSION, count, len(groups), id_slots, name_slots,
+                            len(blob), int(time.time())))
+        for column in columns:
+            f.write(column.tobytes())
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+class CategoryIndex:
+    """
+    Read-only view of an index file
+    id -> node and name -> ids are hash probes, parent / path walk up at
+    most `depth` steps, and subtree(id) is the contiguous preorder range
+    [node, node + size)
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.index_path = path or default_index_path()
+        with open(self.index_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, names, id_slots, name_slots, blob_len, built_at = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != INDEX_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{self.index_path} is not a version {INDEX_VERSION} category index")
+        self.count = count
+        self.built_at = built_at
+
+        view = self._view = memoryview(self._mmap)
+        offset = HEADER.size
+
+        def column(length: int):
+            nonlocal offset
+            data = view[offset:offset + length * INT32]
+            offset += length * INT32
+            if sys.byteorder == 'little':
+                return data.cast('i')
+            swapped = array('i', data.tobytes())
+            swapped.byteswap()
+            return swapped
+
+        self._parent = column(count)
+        self._size = column(count)
+        self._depth = column(count)
+        self._str_off = column(count + 1)
+        self._name_off = column(count)
+        self._id_table = column(id_slots)
+        self._name_runs = column(count)
+        self._run_off = column(names + 1)
+        self._name_table = column(name_slots)
+        self._blob = view[offset:offset + blob_len]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for name in ('_parent', '_size', '_depth', '_str_off', '_name_off', '_id_table', '_name_runs',
+                     '_run_off', '_name_table', '_blob', '_view'):
+            value = getattr(self, name, None)
+            if isinstance(value, memoryview):
+                value.release()
+        self._mmap.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, category_id: str) -> bool:
+        return self._find_id(category_id) is not None
+
+    def _id(self, i: int) -> str:
+        return str(self._blob[self._str_off[i]:self._name_off[i]], 'utf-8')
+
+    def _name(self, i: int) -> str:
+        return str(self._blob[self._name_off[i]:self._str_off[i + 1]], 'utf-8')
+
+    def _find_id(self, category_id: str) -> Optional[int]:
+        key = category_id.encode('utf-8')
+        for slot in probe(key, len(self._id_table)):
+            i = self._id_table[slot]
+            if i == EMPTY:
+                return None
+            if self._blob[self._str_off[i]:self._name_off[i]] == key:
+                return i
+
+    def _require(self, category_id: str) -> int:
+        i = self._find_id(category_id)
+        if i is None:
+            raise KeyError(category_id)
+        return i
+
+    def name(self, category_id: str) -> str:
+        return self._name(self._require(category_id))
+
+    def parent(self, category_id: str) -> Optional[str]:
+        parent = self._parent[self._require(category_id)]
+        return None if parent == EMPTY else self._id(parent)
+
+    def depth(self, category_id: str) -> int:
+        return self._depth[self._require(category_id)]
+
+    def _children(self, i: int) -> Iterator[int]:
+        """Direct children, skipping over each child's subtree"""
+        child, end = i + 1, i + self._size[i]
+        while child < end:
+            yield child
+            child += self._size[child]
+
+    def children(self, category_id: str) -> List[str]:
+        return [self._id(child) for child in self._children(self._require(category_id))]
+
+    def path(self, category_id: str) -> List[Dict[str, str]]:
+        """Root-first [{'id', 'name'}], like the API's path_from_root"""
+        i = self._require(category_id)
+        path = []
+        while i != EMPTY:
+            path.append({'id': self._id(i), 'name': self._name(i)})
+            i = self._parent[i]
+        path.reverse()
+        return path
+
+    def path_text(self, category_id: str) -> str:
+        return PATH_SEPARATOR.join(step['name'] for step in self.path(category_id))
+
+    def subtree(self, category_id: str) -> Iterator[str]:
+        """The category and all its descendants, depth-first"""
+        i = self._require(category_id)
+        for j in range(i, i + self._size[i]):
+            yield self._id(j)
+
+    def subtree_size(self, category_id: str) -> int:
+        return self._size[self._require(category_id)]
+
+    def get(self, category_id: str) -> Optional[Dict]:
+        """Full record, or None for an unknown id"""
+        if category_id not in self:
+            return None
+        return {
+            'id': category_id,
+            'name': self.name(category_id),
+            'parent': self.parent(category_id),
+            'children': self.children(category_id),
+            'path': self.path(category_id),
+        }
+
+    def roots(self) -> List[str]:
+        roots, i = [], 0
+        while i < self.count:
+            roots.append(self._id(i))
+            i += self._size[i]
+        return roots
+
+    def _find(self, key: str) -> List[int]:
+        """Nodes whose folded name is `key`, shallowest first"""
+        for slot in probe(key.encode('utf-8'), len(self._name_table)):
+            group = self._name_table[slot]
+            if group == EMPTY:
+                return []
+            start, end = self._run_off[group], self._run_off[group + 1]
+            if fold(self._name(self._name_runs[start])) == key:
+                return list(self._name_runs[start:end])
+
+    def find(self, name: str) -> List[str]:
+        """Ids of every category with this name (accent and case folded), shallowest first"""
+        return [self._id(i) for i in self._find(fold(name).strip())]
+
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        Category id for a name or a 'Parent > Child' path
+        Names shared by many categories ('Otros') resolve to the shallowest;
+        qualify them with their parents to pick another
+        """
+        if name in self:
+            return name
+        steps = [fold(step) for step in name.split(PATH_SEPARATOR.strip())]
+        steps = [step.strip() for step in steps if step.strip()]
+        if not steps:
+            return None
+
+        # Top-down from every match of the first step, through matching children
+        candidates = self._find(steps[0])
+        for step in steps[1:]:
+            candidates = [child for i in candidates for child in self._children(i)
+                          if fold(self._name(child)) == step]
+        if not candidates:
+            return None
+        return self._id(min(candidates, key=lambda i: self._depth[i]))
+
+
+def main():
+    args = sys.argv[1:]
+    path = default_index_path()
+    if '--index' in args:
+        i = args.index('--index')
+        path = args[i + 1]
+        del args[i:i + 2]
+    crawl = '--crawl' in args
+    queries = [arg for arg in args if arg != '--crawl']
+
+    print("="*70)
+    print("🗂️ MERCADOLIBRE CATEGORY INDEX")
+    print("="*70)
+
+    if crawl or not os.path.exists(path):
+        crawler = CategoryCrawler()
+        started = time.perf_counter()
+        nodes = crawler.crawl()
+        elapsed = time.perf_counter() - started
+        if not nodes:
+            print("❌ No categories crawled")
+            return
+        size = write_index(nodes, path)
+        print(f"🕸️ Crawled {len(nodes)} categories in {elapsed:.1f}s")
+        print(f"💾 Index: {path} ({size / 1024:.0f}KB)")
+
+    with CategoryIndex(path) as index:
+        print(f"📂 {len(index)} categories, {len(index.roots())} top-level, built "
+              f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(index.built_at))}")
+
+        for query in queries:
+            category_id = index.resolve(query)
+            if category_id is None:
+                print(f"\n❓ {query}: not found")
+                continue
+            print(f"\n📌 {query} → {category_id}")
+            print(f"  Path: {index.path_text(category_id)}")
+            print(f"  Children: {len(index.children(category_id))}, "
+                  f"subtree: {index.subtree_size(category_id)} categories")
+            others = index.find(index.name(category_id))
+            if len(others) > 1:
+                print(f"  ({len(others)} categories share this name; qualify it as 'Parent{PATH_SEPARATOR}Name')")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Change detection over parsed products, so refreshes emit only deltas
+Keeps a content hash, prices and stock per item id for every scope (a
+crawled search page, a holiday query) and compares each refresh with it.
+New, removed, price-changed and stock-changed items come out as compact
+NDJSON records; unchanged items cost nothing downstream
+
+Usage: python scripts/change_detector.py [holiday ...] [--output deltas.ndjson]
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from dataclasses import dataclass, field, fields
+from typing import Dict, Iterable, List, Optional, TextIO
+
+from http_cache import default_cache_dir
+from products import Product
+
+# Counters that move with every sale; a change alone isn't worth a write
+VOLATILE_FIELDS = ('sold_quantity',)
+PRICE_FIELDS = ('price', 'original_price')
+STOCK_FIELDS = ('available_quantity',)
+
+# Everything else goes into the content hash
+HASHED_FIELDS = tuple(
+    f.name for f in fields(Product)
+    if f.name not in VOLATILE_FIELDS + PRICE_FIELDS + STOCK_FIELDS
+)
+# Snapshot entry layout: [content hash, *PRICE_FIELDS, *STOCK_FIELDS]
+TRACKED_FIELDS = PRICE_FIELDS + STOCK_FIELDS
+
+
+def content_hash(product: Product) -> str:
+    """Short digest of the fields other than prices, stock and counters"""
+    values = repr(tuple(getattr(product, name) for name in HASHED_FIELDS))
+    return hashlib.blake2b(values.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def snapshot_entry(product: Product) -> list:
+    return [content_hash(product), *(getattr(product, name) for name in TRACKED_FIELDS)]
+
+
+@dataclass
+class Delta:
+    """
+    What one refresh changed, as NDJSON-ready records
+    Records are {'op': 'new' | 'removed' | 'changed', 'scope', 'id', ...};
+    'changed' carries old/new pairs for prices and stock, plus the product
+    when other content changed too
+    """
+
+    records: List[Dict] = field(default_factory=list)
+    unchanged: int = 0
+    # Snapshot per scope after this refresh, adopted by ChangeDetector.commit
+    snapshots: Dict[str, Dict[str, list]] = field(default_factory=dict)
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(['new', 'removed', 'price_changed', 'stock_changed', 'updated'], 0)
+        for record in self.records:
+            if record['op'] != 'changed':
+                counts[record['op']] += 1
+                continue
+            changes = record['changes']
+            counts['price_changed'] += any(name in changes for name in PRICE_FIELDS)
+            counts['stock_changed'] += any(name in changes for name in STOCK_FIELDS)
+            counts['updated'] += 'content' in changes
+        counts['unchanged'] = self.unchanged
+        return counts
+
+    def write(self, out: TextIO):
+        """One compact JSON record per line"""
+        for record in self.records:
+            out.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            out.write('\n')
+
+
+class ChangeDetector:
+    """
+    Per-scope product snapshots, persisted as JSON
+    diff() compares a refresh with the last committed snapshot of its scope
+    without touching it; commit() adopts the new snapshots once the delta
+    has been written, so a failed write is emitted again on the next run
+    Only diff successful fetches: an empty refresh marks every item removed
+    """
+
+    def __init__(self, path: Optional[str] = None, deltas_path: Optional[str] = None):
+        self.path = path or os.path.join(default_cache_dir(), 'product_snapshots.json')
+        self.deltas_path = deltas_path or os.path.join(default_cache_dir(), 'product_deltas.ndjson')
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.snapshots: Dict[str, Dict[str, list]] = json.load(f)
+        except (OSError, ValueError):
+            self.snapshots = {}
+
+    def diff(self, scope: str, products: Iterable[Product], delta: Optional[Delta] = None) -> Delta:
+        """Add the changes between `scope`'s snapshot and this refresh to `delta`"""
+        delta = delta if delta is not None else Delta()
+        previous = self.snapshots.get(scope, {})
+        current: Dict[str, list] = {}
+
+        for product in products:
+            if not product.id or product.id in current:
+                continue
+            entry = current[product.id] = snapshot_entry(product)
+            old = previous.get(product.id)
+
+            if old is None:
+                delta.records.append({'op': 'new', 'scope': scope, 'id': product.id, 'product': product.to_dict()})
+                continue
+            if old == entry:
+                delta.unchanged += 1
+                continue
+
+            changes = {
+                name: [old_value, new_value]
+                for name, old_value, new_value in zip(TRACKED_FIELDS, old[1:], entry[1:])
+                if old_value != new_value
+            }
+            record = {'op': 'changed', 'scope': scope, 'id': product.id, 'changes': changes}
+            if old[0] != entry[0]:
+                changes['content'] = True
+                record['product'] = product.to_dict()
+            delta.records.append(record)
+
+        for item_id in previous.keys() - current.keys():
+            delta.records.append({'op': 'removed', 'scope': scope, 'id': item_id})
+
+        delta.snapshots[scope] = current
+        return delta
+
+    def diff_recommendations(self, recommendations: Iterable[Dict], delta: Optional[Delta] = None) -> Delta:
+        """Changes across get_holiday_recommendations() answers, one scope per holiday query"""
+        delta = delta if delta is not None else Delta()
+        for recs in recommendations:
+            for query, products in recs['categories'].items():
+                self.diff(f"{recs['holiday']}|{query}", products, delta)
+        return delta
+
+    def commit(self, delta: Delta):
+        """Adopt the delta's snapshots and persist them"""
+        with self._lock:
+            self.snapshots.update(delta.snapshots)
+            try:
+                directory = os.path.dirname(self.path)
+                os.makedirs(directory, exist_ok=True)
+                # Unique per writer, so concurrent refreshes never share a temp file
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.product_snapshots.')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.snapshots, f, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"⚠️ Could not persist product snapshots: {e}")
+
+    def emit(self, delta: Delta, out: Optional[TextIO] = None):
+        """
+        Append the delta's records to `out` (deltas_path by default), then commit
+        A crash in between re-emits the same records next run, so downstream
+        writes must be idempotent upserts/deletes keyed by (scope, id)
+        """
+        if out is not None:
+            delta.write(out)
+            out.flush()
+        elif delta.records:
+            os.makedirs(os.path.dirname(self.deltas_path), exist_ok=True)
+            with open(self.deltas_path, 'a', encoding='utf-8') as f:
+                delta.write(f)
+        self.commit(delta)
+
+
+def main():
+    from mercadolibre_api_test import HOLIDAY_QUERIES, MercadoLibreAPI
+
+    args = sys.argv[1:]
+    output = None
+    if '--output' in args:
+        index = args.index('--output')
+        output = args[index + 1]
+        del args[index:index + 2]
+    holidays = args or list(HOLIDAY_QUERIES)
+
+    api = MercadoLibreAPI()
+    detector = ChangeDetector(deltas_path=output)
+    recommendations = [api.get_holiday_recommendations(holiday) for holiday in holidays]
+    delta = detector.diff_recommendations(recommendations)
+    detector.emit(delta)
+
+    counts = delta.counts()
+    print("="*70)
+    print(f"🔁 PRODUCT CHANGES ({len(holidays)} holidays)")
+    print("="*70)
+    for name, count in counts.items():
+        print(f"  • {name:<14}{count:>6}")
+    print(f"\n💾 {len(delta.records)} delta records appended to {detector.deltas_path}")
+
+
+if __name__ == "__main__":
+    main()
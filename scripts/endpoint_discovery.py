@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Concurrent discovery of candidate marketplace endpoints
+Probes every candidate at once with HEAD (a one-byte ranged GET when HEAD
+is refused) and records status, latency and content type in a registry
+persisted under the cache directory. Entries expire, so clients pick live
+endpoints from the registry without probing again on every run
+
+Usage: python scripts/endpoint_discovery.py [--refresh]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional
+
+from http_cache import default_cache_dir
+from metrics import verbose
+
+# How long a probe result is trusted; failed probes are retried sooner
+ENDPOINT_TTL = 24 * 3600
+ERROR_TTL = 3600
+PROBE_TIMEOUT = 5
+# Statuses that mean HEAD itself is not supported
+HEAD_REFUSED = {405, 501}
+# Statuses that mean the endpoint is gone, not just refusing this probe
+DEAD_STATUSES = {404, 410}
+
+
+class EndpointRegistry:
+    """Probe results per endpoint URL, persisted as JSON with an expiry"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(default_cache_dir(), 'endpoints.json')
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.entries: Dict[str, Dict] = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, url: str) -> Optional[Dict]:
+        """The fresh entry for a URL, or None when unknown or expired"""
+        with self._lock:
+            entry = self.entries.get(url)
+        if entry is None or entry['expires_at'] < time.time():
+            return None
+        return entry
+
+    def record(self, url: str, entry: Dict):
+        ttl = ENDPOINT_TTL if entry.get('status') is not None else ERROR_TTL
+        with self._lock:
+            self.entries[url] = {**entry, 'checked_at': time.time(), 'expires_at': time.time() + ttl}
+
+    def save(self):
+        with self._lock:
+            snapshot = json.dumps(self.entries, indent=2)
+        try:
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.endpoints.')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not persist endpoint registry: {e}")
+
+    @staticmethod
+    def alive(entry: Optional[Dict]) -> bool:
+        """A 2xx answer with a JSON body: an endpoint worth sending searches to"""
+        entry = entry or {}
+        status = entry.get('status')
+        return status is not None and 200 <= status < 300 and 'json' in (entry.get('content_type') or '')
+
+    @staticmethod
+    def dead(entry: Optional[Dict]) -> bool:
+        """A probe that found nothing there, as opposed to no or a failed probe"""
+        return (entry or {}).get('status') in DEAD_STATUSES
+
+    def choose(self, base_url: str, endpoints: List[str]) -> str:
+        """
+        The primary endpoint (the first one) unless a fresh probe found it
+        dead, in which case the first candidate known to be alive
+        Missing, expired, failed or merely unsuccessful probes never move a
+        client off its primary endpoint
+        """
+        primary, *candidates = endpoints
+        if not self.dead(self.get(f"{base_url}{primary}")):
+            return primary
+        for endpoint in candidates:
+            if self.alive(self.get(f"{base_url}{endpoint}")):
+                return endpoint
+        return primary
+
+
+def probe(session, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None) -> Dict:
+    """Status, latency and content type of one URL, without downloading its body"""
+    started = time.perf_counter()
+    try:
+        response = session.head(url, params=params, headers=headers, timeout=PROBE_TIMEOUT, allow_redirects=True)
+        method = 'HEAD'
+        if response.status_code in HEAD_REFUSED:
+            ranged = {**(headers or {}), 'Range': 'bytes=0-0'}
+            # Streamed and closed unread, so at most one chunk comes down
+            response = session.get(url, params=params, headers=ranged, timeout=PROBE_TIMEOUT, stream=True)
+            response.close()
+            method = 'GET'
+        return {
+            'status': response.status_code,
+            'latency': round(time.perf_counter() - started, 4),
+            'content_type': response.headers.get('Content-Type', '').split(';')[0],
+            'method': method,
+        }
+    except Exception as e:
+        return {'status': None, 'latency': round(time.perf_counter() - started, 4), 'error': str(e)[:200]}
+
+
+def discover(session, base_url: str, endpoints: Iterable[str], registry: Optional[EndpointRegistry] = None,
+             params: Optional[Dict] = None, headers: Optional[Dict] = None,
+             refresh: bool = False, max_workers: int = 8) -> Dict[str, Dict]:
+    """
+    {endpoint: entry} for every candidate, probing concurrently only those
+    without a fresh registry entry (all of them with refresh)
+    """
+    registry = registry or EndpointRegistry()
+    endpoints = list(endpoints)
+    results = {}
+    stale = []
+    for endpoint in endpoints:
+        entry = None if refresh else registry.get(f"{base_url}{endpoint}")
+        if entry is None:
+            stale.append(endpoint)
+        else:
+            results[endpoint] = entry
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(stale))) as pool:
+            futures = {
+                pool.submit(probe, session, f"{base_url}{endpoint}", params, headers): endpoint
+                for endpoint in stale
+            }
+            for future in as_completed(futures):
+                endpoint = futures[future]
+                registry.record(f"{base_url}{endpoint}", future.result())
+                results[endpoint] = registry.get(f"{base_url}{endpoint}")
+        registry.save()
+
+    return {endpoint: results[endpoint] for endpoint in endpoints}
+
+
+def print_discovery(results: Dict[str, Dict], label: str = 'endpoint'):
+    """One line per candidate: found, answering but not usable, missing or failed"""
+    for endpoint, entry in results.items():
+        if EndpointRegistry.alive(entry):
+            print(f"✅ Found {label}: {endpoint} (Status: {entry['status']}, "
+                  f"{entry['content_type']}, {entry['latency'] * 1000:.0f} ms)")
+        elif entry.get('status') is None:
+            print(f"⚠️ {endpoint}: {entry.get('error', 'probe failed')}")
+        elif EndpointRegistry.dead(entry):
+            verbose(f"❌ {endpoint} (Status: {entry['status']})")
+        else:
+            print(f"❔ {endpoint} answers but not with JSON (Status: {entry['status']}, "
+                  f"{entry['content_type'] or 'no content type'})")
+
+
+def main():
+    from falabella_api_test import FalabellaAPI
+    from test_falabella_scraper import FalabellaScraper
+
+    refresh = '--refresh' in sys.argv[1:]
+    started = time.perf_counter()
+    api = FalabellaAPI()
+    scraper = FalabellaScraper()
+
+    print("="*70)
+    print("🧭 ENDPOINT DISCOVERY")
+    print("="*70)
+    api.test_mobile_api(refresh=refresh)
+    scraper.test_api_endpoints(refresh=refresh)
+    print(f"\n⏱️ {time.perf_counter() - started:.2f}s; registry: {EndpointRegistry().path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Compiled selector plans for scraping product listings
+All candidate selectors are evaluated in one grouped tree walk, and the
+selector combination that worked for a site and layout is remembered, so
+steady-state pages cost a single targeted pass
+"""
+
+import json
+import os
+import re
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from http_cache import default_cache_dir
+
+# tag, tag[attr], tag[attr="v"], [attr*=v] ... the subset our selectors use
+SIMPLE_SELECTOR_RE = re.compile(
+    r'^(?P<tag>[a-zA-Z][\w-]*)?'
+    r'(?:\[(?P<attr>[\w-]+)(?:(?P<op>[*^$]?=)(?P<quote>["\']?)(?P<value>[^"\'\]]*)(?P=quote))?\])?$'
+)
+
+# Next.js build id changes whenever the site ships a new layout
+BUILD_ID_RE = re.compile(r'"buildId"\s*:\s*"([^"]+)"')
+
+# Products in a row where another selector found a field its winner missed,
+# before that selector replaces the winner
+RELEARN_MISSES = 3
+
+
+class SelectorMatcher:
+    """Tests a single node against a simple CSS selector without a tree walk"""
+
+    def __init__(self, selector: str):
+        self.selector = selector
+        match = SIMPLE_SELECTOR_RE.match(selector.strip())
+        self.supported = bool(match) and bool(match.group('tag') or match.group('attr'))
+        if self.supported:
+            self.tag = match.group('tag')
+            self.attr = match.group('attr')
+            self.op = match.group('op')
+            self.value = match.group('value')
+
+    def matches(self, node) -> bool:
+        if self.tag and node.name != self.tag:
+            return False
+        if not self.attr:
+            return True
+
+        value = node.attrs.get(self.attr)
+        if value is None:
+            return False
+        if isinstance(value, list):  # BeautifulSoup splits class into a list
+            value = ' '.join(value)
+        if self.op is None:
+            return True
+        if self.op == '=':
+            return value == self.value
+        if not self.value:
+            return False
+        if self.op == '*=':
+            return self.value in value
+        if self.op == '^=':
+            return value.startswith(self.value)
+        return value.endswith(self.value)
+
+
+def layout_fingerprint(html: str) -> str:
+    """Cheap identifier of the page layout version"""
+    match = BUILD_ID_RE.search(html)
+    return match.group(1) if match else 'default'
+
+
+class PlanStore:
+    """
+    JSON file remembering the winning selectors per site/layout
+    Each entry maps 'product' to the container selector and every field
+    name to the selector that last matched it
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(default_cache_dir(), 'extraction_plans.json')
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.winners: Dict[str, Dict[str, str]] = json.load(f)
+        except (OSError, ValueError):
+            self.winners = {}
+
+    def get(self, site: str, fingerprint: str) -> Dict[str, str]:
+        # An unseen layout starts from the site's last winners
+        return dict(self.winners.get(f"{site}|{fingerprint}") or self.winners.get(site) or {})
+
+    def put(self, site: str, fingerprint: str, winners: Dict[str, str]):
+        with self._lock:
+            if self.winners.get(f"{site}|{fingerprint}") == winners:
+                return
+            self.winners[f"{site}|{fingerprint}"] = dict(winners)
+            self.winners[site] = dict(winners)
+            try:
+                directory = os.path.dirname(self.path)
+                os.makedirs(directory, exist_ok=True)
+                # Unique per writer: pipeline workers each hold a store on the same file
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.extraction_plans.')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.winners, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"⚠️ Could not persist extraction plan: {e}")
+
+
+class ExtractionPlan:
+    """
+    Product container and field selectors for one site, compiled once
+    Selector lists are in priority order: when probing, the first selector
+    with any match wins, exactly like trying them one after another. Once a
+    combination has worked for a layout it is tried directly and takes
+    precedence over that order, so every product of a layout is read the
+    same way; a field a product lacks is looked up among the other
+    selectors for that product only, and the winner changes only after
+    RELEARN_MISSES products in a row needed another selector
+    """
+
+    def __init__(self, site: str, product_selectors: List[str],
+                 field_selectors: Dict[str, List[str]], store: Optional[PlanStore] = None):
+        self.site = site
+        self.product_selectors = product_selectors
+        self.field_selectors = field_selectors
+        self.store = store or PlanStore()
+
+        self.product_matchers = [SelectorMatcher(s) for s in product_selectors]
+        self.product_group = ', '.join(product_selectors)
+
+        field_list = [s for selectors in field_selectors.values() for s in selectors]
+        self.field_group = ', '.join(dict.fromkeys(field_list))
+        self.field_matchers = {
+            field: [SelectorMatcher(s) for s in selectors]
+            for field, selectors in field_selectors.items()
+        }
+        self.grouped = all(m.supported for m in self.product_matchers) and all(
+            m.supported for matchers in self.field_matchers.values() for m in matchers
+        )
+
+        self.fingerprint = 'default'
+        self.winners: Dict[str, str] = {}
+        self.misses: Dict[str, int] = {}
+        self.fast_hits = 0
+        self.probes = 0
+
+    def find_products(self, root, html: str) -> Tuple[List, Optional[str]]:
+        """Product container nodes and the selector that found them"""
+        fingerprint = layout_fingerprint(html)
+        if fingerprint != self.fingerprint:
+            self.misses = {}
+        self.fingerprint = fingerprint
+        self.winners = self.store.get(self.site, self.fingerprint)
+
+        winner = self.winners.get('product')
+        if winner:
+            products = root.select(winner)
+            if products:
+                self.fast_hits += 1
+                return products, winner
+
+        # Layout changed or first visit: probe every candidate
+        self.probes += 1
+        products, selector = self.probe_products(root)
+        if selector:
+            self.winners = {'product': selector}
+            self.store.put(self.site, self.fingerprint, self.winners)
+        return products, selector
+
+    def probe_products(self, root) -> Tuple[List, Optional[str]]:
+        if not self.grouped:
+            for selector in self.product_selectors:
+                products = root.select(selector)
+                if products:
+                    return products, selector
+            return [], None
+
+        # One walk for all candidates, then attribute each match
+        by_selector: List[List] = [[] for _ in self.product_matchers]
+        for node in root.select(self.product_group):
+            for i, matcher in enumerate(self.product_matchers):
+                if matcher.matches(node):
+                    by_selector[i].append(node)
+
+        for selector, products in zip(self.product_selectors, by_selector):
+            if products:
+                return products, selector
+        return [], None
+
+    def extract_fields(self, element) -> Dict:
+        """
+        Node for each field of a product element
+        Remembered field selectors are tried first. Fields they miss come
+        from one grouped probe for this product; a miss only counts against
+        the remembered winner, which is replaced (and the plan rewritten)
+        once it has missed RELEARN_MISSES products in a row
+        """
+        found = {}
+        missed = []
+        for field in self.field_selectors:
+            selector = self.winners.get(field)
+            node = element.select_one(selector) if selector else None
+            if node is None:
+                missed.append(field)
+            else:
+                found[field] = node
+                self.misses.pop(field, None)
+        if not missed:
+            return found
+
+        probed = self.probe_fields(element)
+        changed = False
+        for field in missed:
+            if field not in probed:
+                # The product simply lacks it (no image, say): nothing to learn
+                continue
+            selector, found[field] = probed[field]
+            if field in self.winners:
+                self.misses[field] = self.misses.get(field, 0) + 1
+                if self.misses[field] < RELEARN_MISSES:
+                    continue
+            self.misses.pop(field, None)
+            self.winners[field] = selector
+            changed = True
+
+        if changed:
+            self.store.put(self.site, self.fingerprint, self.winners)
+        return found
+
+    def probe_fields(self, element) -> Dict[str, Tuple[str, object]]:
+        """(selector, node) of each field's highest-priority matching selector"""
+        if not self.grouped:
+            found = {}
+            for field, selectors in self.field_selectors.items():
+                for selector in selectors:
+                    node = element.select_one(selector)
+                    if node is not None:
+                        found[field] = (selector, node)
+                        break
+            return found
+
+        # One walk for every field's candidates
+        best: Dict[str, Tuple[int, object]] = {}
+        for node in element.select(self.field_group):
+            for field, matchers in self.field_matchers.items():
+                current = best.get(field, (len(matchers), None))[0]
+                for i, matcher in enumerate(matchers[:current]):
+                    if matcher.matches(node):
+                        best[field] = (i, node)
+                        break
+
+        return {
+            field: (self.field_selectors[field][i], node)
+            for field, (i, node) in best.items()
+        }
+
+    def stats(self) -> Dict:
+        return {'fast_hits': self.fast_hits, 'probes': self.probes}
@@ -3,14 +3,89 @@
 Test Falabella API endpoint for product search
 """
 
+import os
 import requests
 import json
-from typing import Dict, List, Optional
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from endpoint_discovery import EndpointRegistry, discover, print_discovery
+from http_cache import ResponseCache, default_cache_dir, install_cache
+from json_stream import array_length, read_object, stream_response
+from metrics import report, timed_parser, verbose
+from products import Product, intern, to_clp
+
+# How long a discovered parameter schema is trusted before probing again
+SCHEMA_TTL = 7 * 24 * 3600
+
+# Keys that may hold the product list, in the order they are tried
+PRODUCT_KEYS = [
+    'products', 'items', 'results', 'data',
+    'searchResults', 'productList', 'content'
+]
+# Products parsed from an answer; the rest are only counted
+PRODUCTS_SHOWN = 5
+
+# Search endpoint first, then the mobile candidates test_mobile_api probes
+SEARCH_ENDPOINT = "/rest/model/falabella/catalog/ProductCatalogActor/search"
+MOBILE_ENDPOINTS = [
+    '/mobile-apps/api/v1/search',
+    '/api/v1/products/search',
+    '/api/search/products',
+    '/fbch-api/search',
+    '/s/api/v1/search-api/search'
+]
+
+class ParamSchemaStore:
+    """
+    Persists the index of the parameter format that last worked, per endpoint
+    A schema raced against one endpoint says nothing about another, so it
+    is only handed back for the endpoint it was saved with
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: int = SCHEMA_TTL):
+        self.path = path or os.path.join(default_cache_dir(), 'falabella_param_schema.json')
+        self.ttl = ttl
+
+    def load(self, endpoint: str) -> Optional[int]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('expires_at', 0) < time.time() or entry.get('endpoint') != endpoint:
+            return None
+        return entry.get('schema')
+
+    def save(self, schema: int, endpoint: str):
+        try:
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            # Unique temp name, so concurrent runs never write into each other's file
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.falabella_param_schema.')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'schema': schema, 'endpoint': endpoint, 'expires_at': time.time() + self.ttl}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not persist parameter schema: {e}")
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
 
 class FalabellaAPI:
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None,
+                 schema_store: Optional[ParamSchemaStore] = None,
+                 endpoints: Optional[EndpointRegistry] = None):
         self.base_url = "https://www.falabella.com"
-        self.api_endpoint = "/rest/model/falabella/catalog/ProductCatalogActor/search"
+        # The search endpoint, or a live candidate once discovery found it gone
+        self.endpoints = endpoints or EndpointRegistry()
+        self.api_endpoint = self.endpoints.choose(self.base_url, [SEARCH_ENDPOINT, *MOBILE_ENDPOINTS])
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
             'Accept': 'application/json, text/plain, */*',
@@ -20,12 +95,36 @@ class FalabellaAPI:
         }
         self.session = requests.Session()
         self.session.headers.update(self.headers)
+        self.cache = install_cache(self.session, cache)
+        self.schema_store = schema_store or ParamSchemaStore()
 
     def search_products(self, query: str, page: int = 1, size: int = 20) -> Optional[Dict]:
-        """Search products using the API endpoint"""
+        """
+        Search products using the API endpoint
+        Uses the remembered parameter schema when there is one; otherwise all
+        formats are raced and the first answer holding products wins. Only a
+        winner is remembered, so a format that answers JSON without products
+        is never stuck to
+        """
+        param_sets = self.build_param_sets(query, page, size)
+
+        schema = self.schema_store.load(self.api_endpoint)
+        if schema is not None and schema < len(param_sets):
+            verbose(f"\n🔍 Using remembered params: {list(param_sets[schema].keys())}")
+            result = self.fetch_products(param_sets[schema])
+            if result is not None and result['products']:
+                return result
+
+            print("⚠️ Remembered parameter schema found no products, probing again")
+
+        schema, result = self.race_param_sets(param_sets)
+        if schema is not None:
+            self.schema_store.save(schema, self.api_endpoint)
+        return result
 
-        # Try different parameter formats
-        param_sets = [
+    def build_param_sets(self, query: str, page: int, size: int) -> List[Dict]:
+        """Candidate parameter formats, one per known schema"""
+        return [
             {
                 'Ntt': query,
                 'page': page,
@@ -48,37 +147,83 @@ class FalabellaAPI:
             }
         ]
 
-        for i, params in enumerate(param_sets, 1):
-            print(f"\n🔍 Attempt {i}/4 with params: {list(params.keys())}")
-
-            try:
-                response = self.session.get(
-                    f"{self.base_url}{self.api_endpoint}",
-                    params=params,
-                    timeout=10
-                )
+    def race_param_sets(self, param_sets: List[Dict]) -> Tuple[Optional[int], Optional[Dict]]:
+        """
+        Probe every parameter format at once and keep the first answer with products
+        Returns (winning schema, parsed result). When no format finds products
+        the schema is None and the result is the first JSON answer, if any.
+        Probes that haven't started are cancelled and the ones still in
+        flight close their response without reading the body (the response
+        cache only stores bodies read to the end)
+        """
+        verbose(f"\n🏁 Racing {len(param_sets)} parameter formats...")
+
+        won = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=len(param_sets))
+        futures = {
+            pool.submit(self.fetch_products, params, won): i
+            for i, params in enumerate(param_sets)
+        }
 
-                print(f"Status: {response.status_code}")
+        fallback = None
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                if result is None:
+                    continue
+                if result['products']:
+                    schema = futures[future]
+                    won.set()
+                    verbose(f"✅ Got products with params: {list(param_sets[schema].keys())}")
+                    return schema, result
+                fallback = fallback or result
+            return None, fallback
+
+        finally:
+            won.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def fetch_products(self, params: Dict, won: Optional[threading.Event] = None) -> Optional[Dict]:
+        """fetch_json parsed by parse_response, or None when no JSON came back"""
+        data = self.fetch_json(params, won)
+        return self.parse_response(data) if data is not None else None
+
+    def fetch_json(self, params: Dict, won: Optional[threading.Event] = None) -> Optional[Dict]:
+        """GET the search endpoint and return its JSON body, or None"""
+        try:
+            response = self.session.get(
+                f"{self.base_url}{self.api_endpoint}",
+                params=params,
+                timeout=10,
+                stream=True
+            )
+
+            with response:
+                verbose(f"Status: {response.status_code} for params: {list(params.keys())}")
+
+                if won is not None and won.is_set():
+                    return None
 
                 if response.status_code == 200:
+                    # Decoded as it downloads, holding only the first products of each list
+                    stream = stream_response(response)
                     try:
-                        data = response.json()
-                        print(f"✅ Got JSON response!")
-                        return self.parse_response(data)
+                        return read_object(stream, limits=dict.fromkeys(PRODUCT_KEYS, PRODUCTS_SHOWN))
                     except json.JSONDecodeError:
                         # Maybe it's HTML, let's check
-                        if '<html' in response.text[:100]:
+                        if '<html' in stream.preview[:100]:
                             print("❌ Received HTML instead of JSON")
                         else:
-                            print(f"Response preview: {response.text[:200]}...")
+                            print(f"Response preview: {stream.preview[:200]}...")
                 else:
                     print(f"Response: {response.text[:200]}...")
 
-            except Exception as e:
-                print(f"❌ Error: {str(e)}")
+        except Exception as e:
+            print(f"❌ Error: {str(e)}")
 
         return None
 
+    @timed_parser('falabella.api')
     def parse_response(self, data: Dict) -> Dict:
         """Parse API response and extract product info"""
 
@@ -89,34 +234,31 @@ class FalabellaAPI:
         }
 
         # Try different response structures
-        possible_product_keys = [
-            'products', 'items', 'results', 'data',
-            'searchResults', 'productList', 'content'
-        ]
-
-        for key in possible_product_keys:
+        for key in PRODUCT_KEYS:
             if key in data:
                 products_data = data[key]
                 if isinstance(products_data, list):
-                    print(f"Found products in key: '{key}'")
-                    for product in products_data[:5]:  # First 5 products
+                    verbose(f"Found products in key: '{key}'")
+                    for product in products_data[:PRODUCTS_SHOWN]:
                         result['products'].append(self.extract_product_info(product))
-                    result['total'] = len(products_data)
+                    result['total'] = array_length(products_data)
                     break
 
         # If we didn't find products in simple structure, print the keys
         if not result['products']:
-            print(f"Response structure keys: {list(data.keys())}")
+            verbose(f"Response structure keys: {list(data.keys())}")
 
             # Try to navigate nested structure
             if 'response' in data:
                 return self.parse_response(data['response'])
             elif 'result' in data:
                 return self.parse_response(data['result'])
+            elif isinstance(data.get('data'), dict):
+                return self.parse_response(data['data'])
 
         return result
 
-    def extract_product_info(self, product: Dict) -> Dict:
+    def extract_product_info(self, product: Dict) -> Product:
         """Extract relevant product information"""
 
         # Common field mappings
@@ -124,64 +266,38 @@ class FalabellaAPI:
         price_fields = ['price', 'salePrice', 'listPrice', 'pricing', 'currentPrice']
         image_fields = ['image', 'imageUrl', 'thumbnail', 'mainImage', 'primaryImage']
 
-        info = {}
-
-        # Extract name
-        for field in name_fields:
-            if field in product:
-                info['name'] = product[field]
-                break
-
-        # Extract price
-        for field in price_fields:
-            if field in product:
-                if isinstance(product[field], dict):
-                    info['price'] = product[field].get('amount', product[field])
-                else:
-                    info['price'] = product[field]
-                break
-
-        # Extract image
-        for field in image_fields:
-            if field in product:
-                info['image'] = product[field]
-                break
-
-        # Extract other useful fields
-        info['id'] = product.get('id', product.get('productId', 'N/A'))
-        info['brand'] = product.get('brand', product.get('brandName', ''))
-        info['url'] = product.get('url', product.get('productUrl', ''))
-
-        return info
-
-    def test_mobile_api(self):
-        """Test if there's a mobile API with different endpoints"""
+        # First present field of each kind
+        name = next((product[f] for f in name_fields if f in product), '')
+        price = next((product[f] for f in price_fields if f in product), None)
+        image = next((product[f] for f in image_fields if f in product), None)
+
+        return Product(
+            id=product.get('id', product.get('productId', 'N/A')),
+            title=name,
+            price=to_clp(price),
+            original_price=to_clp(product.get('listPrice')) if 'listPrice' in product else None,
+            brand=intern(product.get('brand', product.get('brandName', ''))),
+            thumbnail=image,
+            permalink=product.get('url', product.get('productUrl', '')),
+            source='falabella'
+        )
+
+    def test_mobile_api(self, refresh: bool = False) -> Dict[str, Dict]:
+        """
+        Test if there's a mobile API with different endpoints
+        Probed concurrently and remembered in the endpoint registry, so a
+        rerun within its TTL doesn't probe again unless refresh is set
+        """
 
         print("\n📱 Testing mobile API endpoints...")
 
-        mobile_endpoints = [
-            '/mobile-apps/api/v1/search',
-            '/api/v1/products/search',
-            '/api/search/products',
-            '/fbch-api/search',
-            '/s/api/v1/search-api/search'
-        ]
-
         test_headers = {**self.headers}
         test_headers['User-Agent'] = 'Falabella/1.0 (iPhone; iOS 15.0)'
 
-        for endpoint in mobile_endpoints:
-            try:
-                response = self.session.get(
-                    f"{self.base_url}{endpoint}",
-                    params={'q': 'test'},
-                    headers=test_headers,
-                    timeout=5
-                )
-                if response.status_code != 404:
-                    print(f"✅ Found mobile endpoint: {endpoint} (Status: {response.status_code})")
-            except:
-                pass
+        results = discover(self.session, self.base_url, MOBILE_ENDPOINTS, self.endpoints,
+                           params={'q': 'test'}, headers=test_headers, refresh=refresh)
+        print_discovery(results, 'mobile endpoint')
+        return results
 
 def main():
     print("="*60)
@@ -207,14 +323,14 @@ def main():
             print(f"\n✅ Found {result['total']} products!")
             for i, product in enumerate(result['products'], 1):
                 print(f"\nProduct {i}:")
-                for key, value in product.items():
-                    if value:
-                        print(f"  {key}: {value}")
+                for key, value in product.display_fields().items():
+                    print(f"  {key}: {value}")
         else:
             print("\n❌ No products found or unable to parse response")
 
     # Test mobile API
     api.test_mobile_api()
+    report()
 
     print(f"\n{'='*60}")
     print("💡 ALTERNATIVE SOLUTIONS:")
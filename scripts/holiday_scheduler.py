@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Holiday-aware crawl scheduler for MercadoLibre recommendations
+Ranks (holiday, query, page) refresh jobs by how close the holiday is and
+how stale the last refresh is, and spends a fixed per-cycle request budget
+on the most urgent ones: near holidays refresh hourly, far ones weekly
+
+Holidays come from the same backend endpoint lib/api/holidays.ts uses
+Usage: python scripts/holiday_scheduler.py [budget] [--run [--deltas] [--index]]
+"""
+
+import heapq
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from change_detector import ChangeDetector, Delta
+from http_cache import default_cache_dir, install_cache
+from mercadolibre_api_test import HOLIDAY_QUERIES, SEARCH_PAGE_SIZE, MercadoLibreAPI
+from products import fold
+from search_index import ProductIndex
+
+# Same backend and default as lib/api/holidays.ts
+BACKEND_API_URL = os.environ.get('NEXT_PUBLIC_BACKEND_API_URL', 'http://localhost:8001/api/v1')
+
+# (holiday within days, refresh interval seconds, pages per query), nearest first
+REFRESH_TIERS = [
+    (7, 3600, 3),
+    (30, 6 * 3600, 2),
+    (90, 24 * 3600, 1),
+    (None, 7 * 24 * 3600, 1),
+]
+
+# Accent-folded name fragments -> HOLIDAY_QUERIES key
+HOLIDAY_KEYWORDS = [
+    ('navidad', 'navidad'),
+    ('ano nuevo', 'año_nuevo'),
+    ('independencia', 'fiestas_patrias'),
+    ('glorias del ejercito', 'fiestas_patrias'),
+    ('fiestas patrias', 'fiestas_patrias'),
+]
+# Any other long weekend is a barbecue weekend
+DEFAULT_HOLIDAY_KEY = 'asado'
+
+# Fixed-date holidays used when the backend is unreachable
+FALLBACK_HOLIDAYS = [
+    ('01-01', 'Año Nuevo'),
+    ('09-18', 'Independencia Nacional'),
+    ('09-19', 'Día de las Glorias del Ejército'),
+    ('12-25', 'Navidad'),
+]
+
+
+def holiday_key(name: str) -> str:
+    folded = fold(name)
+    for keyword, key in HOLIDAY_KEYWORDS:
+        if keyword in folded:
+            return key
+    return DEFAULT_HOLIDAY_KEY
+
+
+def seasonal_events(year: int) -> List[Tuple[date, str]]:
+    """Shopping seasons the holiday calendar does not list"""
+    august_first = date(year, 8, 1)
+    first_sunday = august_first + timedelta(days=(6 - august_first.weekday()) % 7)
+    return [
+        (date(year, 12, 21), 'verano'),
+        (first_sunday + timedelta(days=7), 'dia_del_niño'),  # second Sunday of August
+    ]
+
+
+def tier_for(days_until: int) -> Tuple[int, int]:
+    """(refresh interval seconds, pages per query) for a holiday this far away"""
+    for max_days, interval, pages in REFRESH_TIERS:
+        if max_days is None or days_until <= max_days:
+            return interval, pages
+    return REFRESH_TIERS[-1][1:]
+
+
+@dataclass(slots=True)
+class CrawlJob:
+    holiday: str
+    query: str
+    page: int
+    days_until: int
+    interval: int
+    last_refresh: float
+    priority: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.holiday}|{self.query}|{self.page}"
+
+
+class CrawlState:
+    """Last successful refresh time per job, persisted as JSON"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(default_cache_dir(), 'crawl_schedule.json')
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.refreshed: Dict[str, float] = json.load(f)
+        except (OSError, ValueError):
+            self.refreshed = {}
+
+    def get(self, key: str) -> float:
+        return self.refreshed.get(key, 0.0)
+
+    def mark(self, keys: List[str], when: Optional[float] = None):
+        when = when if when is not None else time.time()
+        with self._lock:
+            self.refreshed.update(dict.fromkeys(keys, when))
+            try:
+                directory = os.path.dirname(self.path)
+                os.makedirs(directory, exist_ok=True)
+                # Unique per writer, so concurrent scheduler runs never share a temp file
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.crawl_schedule.')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.refreshed, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"⚠️ Could not persist crawl schedule: {e}")
+
+
+class HolidayScheduler:
+    """
+    Picks which searches to refresh this cycle
+    A job is due once its age exceeds the interval for its holiday's
+    distance; due jobs are ranked by how overdue they are, weighted
+    towards near holidays and first pages, and the top `budget` run
+    """
+
+    def __init__(self, api: Optional[MercadoLibreAPI] = None, state: Optional[CrawlState] = None,
+                 api_url: str = BACKEND_API_URL, horizon_days: int = 365):
+        self.api = api or MercadoLibreAPI()
+        self.state = state or CrawlState()
+        self.api_url = api_url
+        self.horizon_days = horizon_days
+        self.session = requests.Session()
+        install_cache(self.session)
+        self._holidays: Dict[int, List[Dict]] = {}
+
+    def fetch_holidays(self, year: int) -> List[Dict]:
+        """Holidays for a year from the backend, or the fixed-date ones when it is down"""
+        if year in self._holidays:
+            return self._holidays[year]
+
+        holidays = None
+        try:
+            response = self.session.get(f"{self.api_url}/holidays-simple/", params={'year': year}, timeout=10)
+            if response.status_code == 200:
+                holidays = response.json().get('holidays', [])
+            else:
+                print(f"⚠️ Holidays API error {response.status_code}, using fixed-date holidays")
+        except Exception as e:
+            print(f"⚠️ Holidays API unreachable ({type(e).__name__}), using fixed-date holidays")
+
+        if holidays is None:
+            holidays = [{'date': f"{year}-{day}", 'name': name} for day, name in FALLBACK_HOLIDAYS]
+        self._holidays[year] = holidays
+        return holidays
+
+    def upcoming(self, today: Optional[date] = None) -> Dict[str, int]:
+        """Days until the next occurrence of each HOLIDAY_QUERIES key"""
+        today = today or date.today()
+        events = []
+        for year in (today.year, today.year + 1):
+            for holiday in self.fetch_holidays(year):
+                try:
+                    events.append((date.fromisoformat(holiday['date'][:10]), holiday_key(holiday['name'])))
+                except (KeyError, ValueError):
+                    continue
+            events.extend(seasonal_events(year))
+
+        nearest: Dict[str, int] = {}
+        for day, key in events:
+            days_until = (day - today).days
+            if 0 <= days_until <= self.horizon_days and days_until < nearest.get(key, self.horizon_days + 1):
+                nearest[key] = days_until
+        return nearest
+
+    def jobs(self, today: Optional[date] = None, now: Optional[float] = None) -> List[CrawlJob]:
+        """Every due job with its priority"""
+        now = now if now is not None else time.time()
+        due = []
+        for holiday, days_until in self.upcoming(today).items():
+            interval, pages = tier_for(days_until)
+            for query in HOLIDAY_QUERIES.get(holiday, []):
+                for page in range(pages):
+                    job = CrawlJob(holiday, query, page, days_until, interval, 0.0, 0.0)
+                    job.last_refresh = self.state.get(job.key)
+                    overdue = (now - job.last_refresh) / interval
+                    if overdue < 1:
+                        continue
+                    # Capped, so a long-stale far holiday cannot outrank a near one
+                    overdue = min(overdue, 2.0)
+                    job.priority = overdue / (1 + days_until / 7) / (1 + page)
+                    due.append(job)
+        return due
+
+    def plan(self, budget: int, today: Optional[date] = None, now: Optional[float] = None) -> List[CrawlJob]:
+        """The `budget` most urgent due jobs; each costs one search request"""
+        return heapq.nlargest(budget, self.jobs(today, now), key=lambda job: job.priority)
+
+    def run_cycle(self, budget: int, history=None, changes: Optional[ChangeDetector] = None,
+                  index: Optional[ProductIndex] = None, max_workers: int = 4) -> Dict[str, Optional[Dict]]:
+        """
+        Fetch the planned pages and record which succeeded
+        Products are appended to a PriceHistoryStore when one is given, each
+        page's delta against its last crawl is emitted by a ChangeDetector,
+        and a ProductIndex is updated and saved for LocalSearch
+        """
+        planned = self.plan(budget)
+        if not planned:
+            return {}
+
+        def fetch(job: CrawlJob):
+            params = self.api.search_params(job.query)
+            return self.api.fetch_search_page(params, job.page * SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(planned)))) as pool:
+            pages = list(pool.map(fetch, planned))
+
+        done = [job.key for job, page in zip(planned, pages) if page is not None]
+        self.state.mark(done)
+
+        if history is not None or changes is not None or index is not None:
+            delta = Delta()
+            for job, page in zip(planned, pages):
+                if not page:
+                    continue
+                products = [self.api.parse_item(item) for item in page.get('results', [])]
+                if history is not None:
+                    history.append(products, job.query)
+                if changes is not None:
+                    changes.diff(job.key, products, delta)
+                if index is not None:
+                    index.add(products)
+            if index is not None:
+                index.save()
+            if changes is not None:
+                changes.emit(delta)
+                print(f"🔁 {len(delta.records)} delta records, {delta.unchanged} items unchanged")
+
+        print(f"🗓️ Refreshed {len(done)}/{len(planned)} planned pages")
+        return {job.key: page for job, page in zip(planned, pages)}
+
+
+def main():
+    import sys
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    budget = int(args[0]) if args else 20
+
+    scheduler = HolidayScheduler()
+    print("="*70)
+    print(f"🗓️ HOLIDAY CRAWL PLAN (budget {budget} requests)")
+    print("="*70)
+
+    for holiday, days_until in sorted(scheduler.upcoming().items(), key=lambda item: item[1]):
+        interval, pages = tier_for(days_until)
+        print(f"  • {holiday:<16} in {days_until:>3} days: every {interval // 3600}h, {pages} page(s)/query")
+
+    print()
+    for job in scheduler.plan(budget):
+        age = 'never' if not job.last_refresh else f"{(time.time() - job.last_refresh) / 3600:.1f}h ago"
+        print(f"  {job.priority:>6.3f}  {job.holiday:<16} p{job.page}  {job.query:<24} ({age})")
+
+    if '--run' in sys.argv:
+        index = None
+        if '--index' in sys.argv:
+            index = ProductIndex()
+            index.load()
+        scheduler.run_cycle(budget, changes=ChangeDetector() if '--deltas' in sys.argv else None, index=index)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Pluggable HTML parser backends for the scrapers
+Every backend returns nodes with the small BeautifulSoup-like surface the
+scrapers use (select, select_one, get_text, get, name, attrs), so CSS selectors keep the
+same meaning whichever parser builds the tree
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except ImportError:
+        SelectolaxParser = None
+
+try:
+    import lxml.html
+    from cssselect import HTMLTranslator
+    from lxml.etree import XPath
+except ImportError:
+    HTMLTranslator = None
+
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+# Fastest first; the first installed backend is the default
+PREFERRED_BACKENDS = ['selectolax', 'lxml', 'bs4-lxml', 'html.parser']
+
+
+class SelectolaxNode:
+    """selectolax node with the BeautifulSoup calls the scrapers use"""
+
+    __slots__ = ('node',)
+
+    def __init__(self, node):
+        self.node = node
+
+    # selectolax matches the node itself too; BeautifulSoup only descendants
+    def select(self, selector: str) -> List['SelectolaxNode']:
+        own = self.node.mem_id
+        return [SelectolaxNode(n) for n in self.node.css(selector) if n.mem_id != own]
+
+    def select_one(self, selector: str) -> Optional['SelectolaxNode']:
+        node = self.node.css_first(selector)
+        if node is not None and node.mem_id == self.node.mem_id:
+            matches = self.node.css(selector)
+            node = matches[1] if len(matches) > 1 else None
+        return SelectolaxNode(node) if node is not None else None
+
+    def get_text(self, strip: bool = False) -> str:
+        return self.node.text(deep=True, separator='', strip=strip)
+
+    def get(self, attr: str, default=None):
+        value = self.node.attributes.get(attr)
+        return default if value is None else value
+
+    @property
+    def name(self) -> str:
+        return self.node.tag
+
+    @property
+    def attrs(self) -> Dict:
+        return self.node.attributes
+
+
+@lru_cache(maxsize=256)
+def compile_selector(selector: str):
+    """
+    Translate a CSS selector to XPath once per process
+    Descendants only, matching BeautifulSoup's select (the node itself is excluded)
+    """
+    return XPath(HTMLTranslator().css_to_xpath(selector, prefix='descendant::'))
+
+
+class LxmlNode:
+    """lxml element with the BeautifulSoup calls the scrapers use"""
+
+    __slots__ = ('element',)
+
+    def __init__(self, element):
+        self.element = element
+
+    def select(self, selector: str) -> List['LxmlNode']:
+        return [LxmlNode(e) for e in compile_selector(selector)(self.element)]
+
+    def select_one(self, selector: str) -> Optional['LxmlNode']:
+        matches = compile_selector(selector)(self.element)
+        return LxmlNode(matches[0]) if matches else None
+
+    def get_text(self, strip: bool = False) -> str:
+        # Text nodes only, like BeautifulSoup (comments are skipped)
+        texts = self.element.xpath('descendant-or-self::text()')
+        if strip:
+            return ''.join(t.strip() for t in texts)
+        return ''.join(texts)
+
+    def get(self, attr: str, default=None):
+        return self.element.get(attr, default)
+
+    @property
+    def name(self) -> str:
+        return self.element.tag
+
+    @property
+    def attrs(self) -> Dict:
+        return self.element.attrib
+
+
+class ParserBackend:
+    """Named factory that turns an HTML string into a queryable root node"""
+
+    name = ''
+
+    def parse(self, html: str):
+        raise NotImplementedError
+
+
+class HtmlParserBackend(ParserBackend):
+    """Pure-Python stdlib parser through BeautifulSoup; always available"""
+
+    name = 'html.parser'
+
+    def parse(self, html: str) -> BeautifulSoup:
+        return BeautifulSoup(html, 'html.parser')
+
+
+class Bs4LxmlBackend(ParserBackend):
+    """BeautifulSoup tree built by lxml; identical selector engine, faster build"""
+
+    name = 'bs4-lxml'
+
+    def parse(self, html: str) -> BeautifulSoup:
+        return BeautifulSoup(html, 'lxml')
+
+
+class LxmlBackend(ParserBackend):
+    """Native lxml tree with cssselect-compiled XPath"""
+
+    name = 'lxml'
+
+    def parse(self, html: str) -> LxmlNode:
+        return LxmlNode(lxml.html.document_fromstring(html))
+
+
+class SelectolaxBackend(ParserBackend):
+    """Lexbor (or Modest) C parser with native CSS matching"""
+
+    name = 'selectolax'
+
+    def parse(self, html: str) -> SelectolaxNode:
+        return SelectolaxNode(SelectolaxParser(html).root)
+
+
+BACKENDS: Dict[str, type] = {
+    'selectolax': SelectolaxBackend,
+    'lxml': LxmlBackend,
+    'bs4-lxml': Bs4LxmlBackend,
+    'html.parser': HtmlParserBackend,
+}
+
+
+def available_backends() -> List[str]:
+    """Installed backends, fastest first"""
+    installed = {
+        'selectolax': SelectolaxParser is not None,
+        'lxml': HTMLTranslator is not None,
+        'bs4-lxml': HAS_LXML,
+        'html.parser': True,
+    }
+    return [name for name in PREFERRED_BACKENDS if installed[name]]
+
+
+def get_parser(name: Optional[str] = None) -> ParserBackend:
+    """
+    Backend by name, or the fastest installed one
+    Falls back to html.parser when the requested backend is missing
+    """
+    available = available_backends()
+    if name is None:
+        name = available[0]
+    elif name not in available:
+        print(f"⚠️ HTML parser '{name}' not installed, falling back to html.parser")
+        name = 'html.parser'
+    return BACKENDS[name]()
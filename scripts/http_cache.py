@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Disk-backed HTTP response cache shared by the marketplace clients
+Mounted under a requests.Session as a transport adapter, so every GET goes
+through it without changes to the calling code
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from requests import Session
+from requests.models import PreparedRequest, Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from rate_limiter import RateLimiterRegistry, ThrottledAdapter, get_shared_limiters
+
+# Seconds to keep each kind of endpoint, first match wins
+DEFAULT_TTL_RULES = [
+    (r'/sites/\w+/categories', 24 * 3600),
+    (r'/categories/', 24 * 3600),
+    (r'/sites/\w+$', 24 * 3600),
+    (r'/sites/\w+/listing_types', 24 * 3600),
+    (r'/currencies/', 24 * 3600),
+    (r'/highlights/', 6 * 3600),
+    (r'/search', 3600),
+]
+DEFAULT_TTL = 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Headers that describe the wire encoding, not the decoded body we store
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+def normalize_url(url: str) -> str:
+    """Lowercase scheme/host, drop fragments and sort query params"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    path = parts.path or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+
+def cache_key(request: PreparedRequest) -> str:
+    """Normalized URL, scoped to the credentials when the request carries any"""
+    key = normalize_url(request.url)
+    authorization = request.headers.get('Authorization')
+    if authorization:
+        key += '#auth=' + hashlib.sha256(authorization.encode('utf-8')).hexdigest()[:16]
+    return key
+
+
+class TeeRaw:
+    """
+    Wraps a response's urllib3 body, copying decoded chunks as they are read
+    The copy goes to on_complete only when the body was read to the end, so
+    a streamed response the caller stops reading early is never cached and
+    never buffered past what the caller read
+    """
+
+    def __init__(self, raw, on_complete, max_bytes: int):
+        self._raw = raw
+        self._on_complete = on_complete
+        self._max_bytes = max_bytes
+        self._chunks: Optional[List[bytes]] = []
+        self._size = 0
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def _copy(self, chunk: bytes):
+        if self._chunks is None:
+            return
+        self._size += len(chunk)
+        if self._size > self._max_bytes:
+            self._chunks = None
+        else:
+            self._chunks.append(chunk)
+
+    def stream(self, amt=None, decode_content=None):
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            self._copy(chunk)
+            yield chunk
+        if self._chunks is not None:
+            body, self._chunks = b''.join(self._chunks), None
+            self._on_complete(body)
+
+
+@dataclass
+class CacheEntry:
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU store of GET responses in a SQLite file
+    Entries expire per endpoint TTL and are revalidated with ETag /
+    Last-Modified when upstream provides them
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_rules: Optional[List[Tuple[str, int]]] = None,
+                 default_ttl: int = DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttl_rules = [(re.compile(pattern), ttl) for pattern, ttl in (ttl_rules or DEFAULT_TTL_RULES)]
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stored = 0
+        self.evicted = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)')
+        # Running total, so set() doesn't sum the table on every store
+        self.total_bytes = self._stored_bytes()
+
+    def record(self, counter: str):
+        """Bump one of the hit/miss counters"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def ttl_for(self, url: str) -> int:
+        """TTL in seconds for a URL, based on its path"""
+        path = urlsplit(url).path.rstrip('/')
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(path):
+                return ttl
+        return self.default_ttl
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Look up an entry, fresh or stale, and mark it recently used"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT status, headers, body, etag, last_modified, expires_at FROM responses WHERE key = ?',
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE responses SET last_access = ? WHERE key = ?', (time.time(), key))
+
+        status, headers, body, etag, last_modified, expires_at = row
+        return CacheEntry(status, json.loads(headers), body, etag, last_modified, expires_at)
+
+    def set(self, key: str, response: Response, ttl: int, body: Optional[bytes] = None):
+        """Store a response body (read from the response unless given) and its validators"""
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS}
+        body = (response.content if body is None else body) or b''
+        now = time.time()
+
+        with self._lock:
+            row = self._db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, response.status_code, json.dumps(headers), body,
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                 now + ttl, now, len(body))
+            )
+            self.total_bytes += len(body) - (row[0] if row else 0)
+            self.stored += 1
+            self._evict()
+
+    def refresh(self, key: str, ttl: int):
+        """Extend a stale entry after upstream confirmed it unchanged"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'UPDATE responses SET expires_at = ?, last_access = ? WHERE key = ?',
+                (now + ttl, now, key)
+            )
+
+    def _stored_bytes(self) -> int:
+        return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def _evict(self):
+        """Drop least recently used entries until under max_bytes"""
+        if self.total_bytes <= self.max_bytes:
+            return
+
+        # Other processes may share the file: recount before dropping anything
+        self.total_bytes = self._stored_bytes()
+        if self.total_bytes <= self.max_bytes:
+            return
+
+        for key, size in self._db.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall():
+            self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self.evicted += 1
+            self.total_bytes -= size
+            if self.total_bytes <= self.max_bytes:
+                break
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._db.execute('DELETE FROM responses')
+            self.total_bytes = 0
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current store size"""
+        with self._lock:
+            entries, size = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses'
+            ).fetchone()
+
+        lookups = self.hits + self.misses + self.revalidated
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'stored': self.stored,
+            'evicted': self.evicted,
+            'hit_rate': (self.hits + self.revalidated) / lookups if lookups else 0.0,
+            'entries': entries,
+            'bytes': size
+        }
+
+
+class CachingAdapter(ThrottledAdapter):
+    """
+    Transport adapter that answers GETs from a ResponseCache
+    Only real network sends go through the per-host rate limiter. A miss is
+    stored as its body is read, only once it has been read to the end, so
+    stream=True callers that stop early still leave the rest unread
+    """
+
+    def __init__(self, cache: Optional[ResponseCache] = None,
+                 limiters: Optional[RateLimiterRegistry] = None, **kwargs):
+        super().__init__(limiters, **kwargs)
+        self.cache = cache
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        if request.method != 'GET' or self.cache is None:
+            return super().send(request, **kwargs)
+
+        key = cache_key(request)
+        ttl = self.cache.ttl_for(request.url)
+        entry = self.cache.get(key)
+
+        host = urlsplit(request.url).hostname or ''
+        if entry and entry.expires_at > time.time():
+            self.cache.record('hits')
+            self.metrics.inc('cache_lookups_total', host=host, result='hit')
+            return self.build_cached_response(request, entry)
+
+        if entry:
+            # Stale: ask upstream whether it changed instead of refetching
+            if entry.etag:
+                request.headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                request.headers['If-Modified-Since'] = entry.last_modified
+
+        response = super().send(request, **kwargs)
+
+        if entry and response.status_code == 304:
+            self.cache.record('revalidated')
+            self.metrics.inc('cache_lookups_total', host=host, result='revalidated')
+            self.cache.refresh(key, ttl)
+            # Drain the (empty) 304 body so its connection goes back to the pool
+            response.content
+            response.close()
+            return self.build_cached_response(request, entry)
+
+        self.cache.record('misses')
+        self.metrics.inc('cache_lookups_total', host=host, result='miss')
+        cache_control = response.headers.get('Cache-Control', '')
+        if response.status_code == 200 and ttl > 0 and 'no-store' not in cache_control:
+            if response._content is not False:
+                # Already read (timed downloads read it in send_timed)
+                self.cache.set(key, response, ttl)
+            elif response.raw is not None:
+                store = lambda body: self.cache.set(key, response, ttl, body)
+                response.raw = TeeRaw(response.raw, store, self.cache.max_bytes)
+
+        return response
+
+    def build_cached_response(self, request: PreparedRequest, entry: CacheEntry) -> Response:
+        """Rebuild a requests.Response from a stored entry"""
+        response = Response()
+        response.status_code = entry.status
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(entry.headers)
+        response._content = entry.body
+        # Nothing left on the wire: close() and streamed reads must not touch raw
+        response._content_consumed = True
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.from_cache = True
+        return response
+
+
+def default_cache_dir() -> str:
+    """Directory for on-disk crawler state, from FERIADOS24_CACHE_DIR"""
+    return os.environ.get(
+        'FERIADOS24_CACHE_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'feriados24')
+    )
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_adapters: Dict[Tuple[int, int], Tuple] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache() -> Optional[ResponseCache]:
+    """
+    Process-wide cache used by all clients by default
+    Location comes from FERIADOS24_CACHE_DIR; FERIADOS24_HTTP_CACHE=0 disables it
+    """
+    global _shared_cache
+
+    if os.environ.get('FERIADOS24_HTTP_CACHE', '1') == '0':
+        return None
+
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(os.path.join(default_cache_dir(), 'http_cache.sqlite'))
+        return _shared_cache
+
+
+def install_cache(session: Session, cache: Optional[ResponseCache] = None,
+                  limiters: Optional[RateLimiterRegistry] = None) -> Optional[ResponseCache]:
+    """
+    Mount the caching, rate-limited adapter on a session
+    Uses the shared cache and per-host limiters by default. Sessions with
+    the same cache and limiters share one adapter, and with it one set of
+    connection pools, so every client reuses the warm connections to a host
+    """
+    cache = cache or get_shared_cache()
+    limiters = limiters or get_shared_limiters()
+
+    key = (id(cache), id(limiters))
+    with _shared_lock:
+        # The entry keeps cache and limiters alive, so their ids stay unique
+        entry = _shared_adapters.get(key)
+        if entry is None:
+            entry = _shared_adapters[key] = (cache, limiters, CachingAdapter(cache, limiters))
+        adapter = entry[2]
+
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return cache
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON decoding for large API answers
+Walks a body chunk by chunk as it downloads, decoding one array item or
+object member at a time with the C scanner behind json.raw_decode, so
+callers keep only the items they want and can stop reading the body once
+they have them. Peak memory follows the largest single item, not the body
+"""
+
+import codecs
+import json
+import re
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+# Bytes per read from the socket
+CHUNK_SIZE = 16 * 1024
+# Unread remainder small enough to read off, so the connection can be reused
+DRAIN_LIMIT = 64 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+DECODER = json.JSONDecoder()
+
+
+class ArrayHead(list):
+    """
+    First items of a streamed array
+    `total` is the array's full length, or None when the rest was left unread
+    """
+
+    total: Optional[int] = None
+
+
+class JSONStream:
+    """
+    Pull decoder over an iterable of byte chunks
+    members() and items() walk an object or array lazily; the value of each
+    member must be read (value, skip, items or members) before the next key
+    """
+
+    def __init__(self, chunks: Iterable[bytes], encoding: str = 'utf-8'):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)('replace')
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+        # Start of the body, for error messages once the stream is consumed
+        self.preview = ''
+
+    def _read(self) -> str:
+        """Decoded text of the next chunk, '' once the body is exhausted"""
+        while not self.eof:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.eof = True
+                text = self._decoder.decode(b'', final=True)
+            else:
+                self.bytes_read += len(chunk)
+                text = self._decoder.decode(chunk)
+            if text:
+                if len(self.preview) < 200:
+                    self.preview += text[:200 - len(self.preview)]
+                return text
+        return ''
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer; False at the end of the body"""
+        text = self._read()
+        if not text:
+            return False
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def _grow(self) -> bool:
+        """Read until the pending text doubles, so re-decoding a large value stays linear"""
+        pending = len(self.buf) - self.pos
+        target = 2 * max(pending, CHUNK_SIZE)
+        texts = []
+        while pending < target:
+            text = self._read()
+            if not text:
+                break
+            texts.append(text)
+            pending += len(text)
+        if not texts:
+            return False
+        # One join per doubling, not one copy of the buffer per chunk
+        self.buf = self.buf[self.pos:] + ''.join(texts)
+        self.pos = 0
+        return True
+
+    def error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self.buf, self.pos)
+
+    def peek(self) -> str:
+        """Next non-whitespace character, '' at the end of the body"""
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise self.error(f"Expecting {char!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete value"""
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._grow():
+                    continue
+                raise
+            # A number running into the end of the buffer may go on in the next chunk
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if NUMBER_TAIL.match(self.buf, end).end() == len(self.buf) and self._fill():
+                    continue
+            self.pos = end
+            return value
+
+    def skip(self):
+        """Step over the next value"""
+        self.value()
+
+    def members(self) -> Iterator[str]:
+        """Keys of the object that starts here, one at a time"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise self.error("Expecting property name")
+            self.expect(':')
+            yield key
+            if self.peek() == '}':
+                self.pos += 1
+                return
+            self.expect(',')
+
+    def items(self) -> Iterator[Any]:
+        """Items of the array that starts here, decoded as they are reached"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ']':
+                self.pos += 1
+                return
+            self.expect(',')
+
+    def drain(self, limit: int = DRAIN_LIMIT) -> bool:
+        """Read off up to `limit` more bytes; True when the body was fully read"""
+        self.buf, self.pos = '', 0
+        start = self.bytes_read
+        while self.bytes_read - start <= limit:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.eof = True
+                return True
+            self.bytes_read += len(chunk)
+        return False
+
+
+def read_head(items: Iterator, limit: int, count: bool) -> ArrayHead:
+    """The first `limit` items; with `count` the rest are decoded one by one to get the total"""
+    head = ArrayHead(islice(items, limit))
+    if len(head) < limit:
+        head.total = len(head)
+    elif count:
+        head.total = len(head) + sum(1 for _ in items)
+    return head
+
+
+def read_array(stream: JSONStream, limit: Optional[int] = None) -> ArrayHead:
+    """A top-level array, stopping after `limit` items"""
+    if limit is None:
+        head = ArrayHead(stream.items())
+        head.total = len(head)
+        return head
+    return read_head(stream.items(), limit, count=False)
+
+
+def read_object(stream: JSONStream, keys: Optional[Iterable[str]] = None,
+                limits: Optional[Dict[str, int]] = None) -> Dict:
+    """
+    A top-level object restricted to `keys` (every key when None)
+    Arrays under a key in `limits` keep only their first items. Reading
+    stops as soon as every wanted key has been seen, so an array that comes
+    last is cut off mid-body with total=None
+    """
+    wanted = set(keys) if keys is not None else None
+    limits = limits or {}
+    data = {}
+
+    for key in stream.members():
+        if wanted is not None and key not in wanted:
+            stream.skip()
+            continue
+
+        limit = limits.get(key)
+        if limit is not None and stream.peek() == '[':
+            more = wanted is None or not wanted <= {*data, key}
+            data[key] = read_head(stream.items(), limit, count=more)
+        else:
+            data[key] = stream.value()
+
+        if wanted is not None and wanted <= data.keys():
+            break
+
+    return data
+
+
+def array_length(items: list) -> int:
+    """Full length of an array, streamed or not"""
+    total = getattr(items, 'total', None)
+    return len(items) if total is None else total
+
+
+def stream_response(response, chunk_size: int = CHUNK_SIZE) -> JSONStream:
+    """JSONStream over a requests response opened with stream=True"""
+    return JSONStream(response.iter_content(chunk_size), response.encoding or 'utf-8')
+
+
+def release(response, stream: JSONStream):
+    """
+    Finish with a streamed response
+    A short unread remainder is read off so the connection returns to the
+    pool; a long one is cut by closing the connection
+    """
+    if not stream.eof:
+        stream.drain()
+    response.close()
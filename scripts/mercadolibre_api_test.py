@@ -4,46 +4,225 @@ Test MercadoLibre API for Chilean market
 Official API documentation: https://developers.mercadolibre.cl/
 """
 
+import asyncio
 import requests
 import json
-from typing import Dict, List, Optional
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
 from datetime import datetime
 
-class MercadoLibreAPI:
-    def __init__(self):
+from http_cache import ResponseCache, install_cache
+from json_stream import read_array, read_object, release, stream_response
+from metrics import Exchange, Metrics, get_metrics, report, timed_parser, verbose
+from ml_auth import BearerAuth, TokenManager
+from products import Product, format_clp
+from rate_limiter import RateLimiterRegistry, get_shared_limiters, parse_retry_after
+from transport import ACCEPT_ENCODING, create_async_client
+
+try:
+    import httpx
+    from ml_auth import AsyncBearerAuth
+except ImportError:  # Only needed for AsyncMercadoLibreAPI
+    httpx = None
+
+# Search API paging limits for public access
+SEARCH_PAGE_SIZE = 50
+MAX_SEARCH_OFFSET = 1000
+
+# Most ids the /items multi-get accepts per call
+ITEMS_MULTIGET_MAX = 20
+
+# Top-level keys of a search answer the parsers read; `attributes=` makes the
+# API leave out the rest (applied filters, sorts, related results, tracking)
+SEARCH_ATTRIBUTES = ('paging', 'results')
+# Only fetched when the caller wants results['filters']
+SEARCH_FILTER_ATTRIBUTES = ('available_filters',)
+
+# Top-level categories get_categories returns
+CATEGORIES_SHOWN = 10
+
+# Map holiday types to search queries
+HOLIDAY_QUERIES = {
+    'navidad': ['regalos navidad', 'decoracion navidad', 'arbol navidad'],
+    'año_nuevo': ['champagne', 'cotillon año nuevo', 'fuegos artificiales'],
+    'fiestas_patrias': ['bandera chile', 'parrilla carbon', 'anticucho'],
+    'asado': ['parrilla', 'carbon', 'carne vacuno', 'cerveza'],
+    'verano': ['piscina', 'bloqueador solar', 'cooler'],
+    'dia_del_niño': ['juguetes', 'bicicleta niños', 'videojuegos']
+}
+
+class MercadoLibreBase:
+    """
+    Request building and answer parsing shared by the sync and async clients
+    Subclasses do the I/O: MercadoLibreAPI over a requests session,
+    AsyncMercadoLibreAPI over an httpx client
+    """
+
+    def __init__(self, tokens: Optional[TokenManager] = None):
         # MercadoLibre Chile site ID
         self.site_id = "MLC"  # Chile
         self.base_url = "https://api.mercadolibre.com"
         self.headers = {
             'User-Agent': 'Feriados24.cl/1.0',
-            'Accept': 'application/json'
+            'Accept': 'application/json',
+            'Accept-Encoding': ACCEPT_ENCODING
         }
+        self.tokens = tokens
+
+    @property
+    def search_url(self) -> str:
+        return f"{self.base_url}/sites/{self.site_id}/search"
+
+    @timed_parser('mercadolibre.search')
+    def parse_search_results(self, data: Dict, max_products: int = 10, filters: bool = True) -> Dict:
+        """Parse MercadoLibre search results"""
+
+        results = {
+            'total_results': data.get('paging', {}).get('total', 0),
+            'products': [],
+            'filters': [],
+            'categories': []
+        }
+
+        # Extract products
+        for item in data.get('results', [])[:max_products]:
+            results['products'].append(self.parse_item(item))
+
+        if not filters:
+            return results
+
+        # Extract available filters
+        for filter_item in data.get('available_filters', []):
+            filter_info = {
+                'id': filter_item.get('id'),
+                'name': filter_item.get('name'),
+                'type': filter_item.get('type'),
+                'values': [v.get('name') for v in filter_item.get('values', [])[:5]]
+            }
+            results['filters'].append(filter_info)
+
+        return results
+
+    def parse_item(self, item: Dict) -> Product:
+        """Parse a single search hit into a Product record"""
+        return Product.from_mercadolibre(item)
+
+    def search_projection(self, filters: bool = True) -> Dict:
+        """`attributes=` selection limiting a search answer to what parse_search_results reads"""
+        keys = SEARCH_ATTRIBUTES + (SEARCH_FILTER_ATTRIBUTES if filters else ())
+        return {'attributes': ','.join(keys)}
+
+    def search_params(self, query: Optional[str] = None, category_id: Optional[str] = None) -> Dict:
+        """Build the base search params for a query and/or category"""
+        params = {}
+        if query:
+            params['q'] = query
+        if category_id:
+            params['category'] = category_id
+            params['sort'] = 'relevance'
+        return params
+
+    def page_offsets(self, total: int, max_items: int, page_size: int) -> List[int]:
+        """Offsets of the remaining pages after the first one"""
+        end = min(total, max_items, MAX_SEARCH_OFFSET)
+        return list(range(page_size, end, page_size))
+
+    def item_chunks(self, ids: Iterable[str]) -> List[List[str]]:
+        """Unique ids in request order, split into multi-get sized chunks"""
+        unique = list(dict.fromkeys(item_id for item_id in ids if item_id))
+        return [unique[i:i + ITEMS_MULTIGET_MAX] for i in range(0, len(unique), ITEMS_MULTIGET_MAX)]
+
+    def items_params(self, chunk: List[str], attributes: Optional[List[str]] = None) -> Dict:
+        params = {'ids': ','.join(chunk)}
+        if attributes:
+            # Ask only for the needed fields; id is required to match answers
+            params['attributes'] = ','.join(dict.fromkeys(['id', *attributes]))
+        return params
+
+    def merge_items_chunk(self, chunk: List[str], data, result: Dict):
+        """
+        Fold one multi-get answer into result['items'] / result['errors']
+        Entries come back in request order, each with its own status code
+        """
+        if not isinstance(data, list):
+            for item_id in chunk:
+                result['errors'][item_id] = 'invalid response'
+            return
+
+        for item_id, entry in zip(chunk, data):
+            body = entry.get('body') or {}
+            if entry.get('code') == 200 and body:
+                result['items'][body.get('id', item_id)] = body
+            else:
+                result['errors'][item_id] = body.get('message') or f"HTTP {entry.get('code')}"
+
+        for item_id in chunk[len(data):]:
+            result['errors'][item_id] = 'missing from response'
+
+    def collect_items(self, chunks: List[List[str]], answers: Iterable) -> Dict[str, Dict]:
+        """{'items', 'errors'} from the multi-get answers (or error strings) of each chunk"""
+        result = {'items': {}, 'errors': {}}
+        for chunk, data in zip(chunks, answers):
+            if isinstance(data, str):
+                result['errors'].update(dict.fromkeys(chunk, data))
+            else:
+                self.merge_items_chunk(chunk, data, result)
+
+        if result['errors']:
+            print(f"⚠️ {len(result['errors'])} of {len(result['items']) + len(result['errors'])} items failed")
+        return result
+
+    def holiday_recommendations(self, holiday_type: str, results: Iterable) -> Dict:
+        """Top hits of each holiday query's search result, in query order"""
+        recommendations = {
+            'holiday': holiday_type,
+            'timestamp': datetime.now().isoformat(),
+            'categories': {}
+        }
+        for query, result in results:
+            if result and result['products']:
+                recommendations['categories'][query] = result['products'][:3]
+        return recommendations
+
+class MercadoLibreAPI(MercadoLibreBase):
+    def __init__(self, cache: Optional[ResponseCache] = None, tokens: Optional[TokenManager] = None):
+        super().__init__(tokens)
         self.session = requests.Session()
         self.session.headers.update(self.headers)
+        self.cache = install_cache(self.session, cache)
+        # Bearer header from the token manager, refreshed ahead of expiry
+        if tokens:
+            self.session.auth = BearerAuth(tokens)
 
-    def search_products(self, query: str, limit: int = 20, offset: int = 0) -> Optional[Dict]:
+    def search_products(self, query: str, limit: int = 20, offset: int = 0,
+                        filters: bool = True, max_products: int = 10) -> Optional[Dict]:
         """
         Search products in MercadoLibre Chile
         No authentication required for basic search!
+        With filters=False available_filters is neither downloaded nor parsed
         """
-        endpoint = f"{self.base_url}/sites/{self.site_id}/search"
+        endpoint = self.search_url
 
         params = {
             'q': query,
             'limit': limit,
-            'offset': offset
+            'offset': offset,
+            **self.search_projection(filters)
         }
 
         try:
-            print(f"🔍 Searching for: {query}")
-            print(f"URL: {endpoint}")
+            verbose(f"🔍 Searching for: {query}")
+            verbose(f"URL: {endpoint}")
 
-            response = self.session.get(endpoint, params=params, timeout=10)
-            print(f"Status Code: {response.status_code}")
+            response = self.session.get(endpoint, params=params, timeout=10, stream=True)
+            verbose(f"Status Code: {response.status_code}")
 
             if response.status_code == 200:
-                data = response.json()
-                return self.parse_search_results(data)
+                data = self.read_search(response, max_products, filters)
+                return self.parse_search_results(data, max_products, filters)
             else:
                 print(f"❌ Error: {response.status_code}")
                 print(response.text[:500])
@@ -53,66 +232,149 @@ class MercadoLibreAPI:
             print(f"❌ Request error: {str(e)}")
             return None
 
-    def parse_search_results(self, data: Dict) -> Dict:
-        """Parse MercadoLibre search results"""
+    def read_search(self, response: requests.Response, max_products: int = 10, filters: bool = True) -> Dict:
+        """
+        Decode a streamed search answer as it downloads, keeping max_products hits
+        Once those hits (and paging, and filters if wanted) are in, the rest
+        of the body is left unread
+        """
+        stream = stream_response(response)
+        try:
+            keys = SEARCH_ATTRIBUTES + (SEARCH_FILTER_ATTRIBUTES if filters else ())
+            return read_object(stream, keys, {'results': max_products})
+        finally:
+            release(response, stream)
 
-        results = {
-            'total_results': data.get('paging', {}).get('total', 0),
-            'products': [],
-            'filters': [],
-            'categories': []
-        }
+    def fetch_search_page(self, params: Dict, offset: int, limit: int) -> Optional[Dict]:
+        """Fetch one raw search page, returning the decoded JSON"""
+        endpoint = self.search_url
 
-        # Extract products
-        for item in data.get('results', [])[:10]:  # First 10 products
-            product = {
-                'id': item.get('id'),
-                'title': item.get('title'),
-                'price': f"${item.get('price'):,.0f} CLP" if item.get('price') else 'N/A',
-                'original_price': f"${item.get('original_price'):,.0f} CLP" if item.get('original_price') else None,
-                'currency': item.get('currency_id'),
-                'condition': item.get('condition'),
-                'thumbnail': item.get('thumbnail'),
-                'permalink': item.get('permalink'),
-                'seller': item.get('seller', {}).get('nickname', 'Unknown'),
-                'shipping': 'Envío gratis' if item.get('shipping', {}).get('free_shipping') else 'Envío pagado',
-                'available_quantity': item.get('available_quantity', 0),
-                'sold_quantity': item.get('sold_quantity', 0),
-                'tags': item.get('tags', [])
-            }
+        try:
+            response = self.session.get(
+                endpoint,
+                params={**params, 'limit': limit, 'offset': offset, **self.search_projection(filters=False)},
+                timeout=10
+            )
+            if response.status_code == 200:
+                return response.json()
+            print(f"❌ Error {response.status_code} at offset {offset}")
+            return None
 
-            # Check for discounts
-            if item.get('original_price') and item.get('price'):
-                discount = ((item['original_price'] - item['price']) / item['original_price']) * 100
-                product['discount'] = f"{discount:.0f}% OFF"
+        except Exception as e:
+            print(f"❌ Request error at offset {offset}: {str(e)}")
+            return None
 
-            results['products'].append(product)
+    def iter_search(self, query: Optional[str] = None, max_items: int = 1000,
+                    category_id: Optional[str] = None, page_size: int = SEARCH_PAGE_SIZE,
+                    prefetch: int = 3) -> Iterator[Product]:
+        """
+        Stream every product of a search one at a time
+        The first page reveals paging.total; the remaining offset windows are
+        then fetched in parallel, keeping at most `prefetch` pages in flight
+        ahead of the caller so memory stays flat
+        """
+        if max_items <= 0:
+            return
+        params = self.search_params(query, category_id)
+        page_size = min(page_size, max_items, SEARCH_PAGE_SIZE)
+        prefetch = max(1, prefetch)
+
+        first = self.fetch_search_page(params, 0, page_size)
+        if not first:
+            return
+
+        yielded = 0
+        for item in first.get('results', []):
+            if yielded >= max_items:
+                return
+            yield self.parse_item(item)
+            yielded += 1
+
+        total = first.get('paging', {}).get('total')
+        if total is None:
+            # Total unknown: walk pages sequentially until a short page arrives
+            offset = page_size
+            while yielded < max_items and offset < MAX_SEARCH_OFFSET:
+                page = self.fetch_search_page(params, offset, page_size)
+                items = page.get('results', []) if page else []
+                for item in items[:max_items - yielded]:
+                    yield self.parse_item(item)
+                    yielded += 1
+                if len(items) < page_size:
+                    return
+                offset += page_size
+            return
+
+        offsets = iter(self.page_offsets(total, max_items, page_size))
+        with ThreadPoolExecutor(max_workers=prefetch) as pool:
+            in_flight = deque()
+            for offset in islice(offsets, prefetch):
+                in_flight.append(pool.submit(self.fetch_search_page, params, offset, page_size))
+
+            try:
+                while in_flight and yielded < max_items:
+                    page = in_flight.popleft().result()
+                    # Keep the window full while the caller consumes this page
+                    for offset in islice(offsets, 1):
+                        in_flight.append(pool.submit(self.fetch_search_page, params, offset, page_size))
+
+                    for item in (page or {}).get('results', []):
+                        if yielded >= max_items:
+                            break
+                        yield self.parse_item(item)
+                        yielded += 1
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+    def fetch_items_chunk(self, chunk: List[str], attributes: Optional[List[str]] = None):
+        """Raw multi-get answer for up to ITEMS_MULTIGET_MAX ids, or an error string"""
+        try:
+            response = self.session.get(
+                f"{self.base_url}/items",
+                params=self.items_params(chunk, attributes),
+                timeout=10
+            )
+            if response.status_code == 200:
+                return response.json()
+            return f"HTTP {response.status_code}"
 
-        # Extract available filters
-        for filter_item in data.get('available_filters', []):
-            filter_info = {
-                'id': filter_item.get('id'),
-                'name': filter_item.get('name'),
-                'type': filter_item.get('type'),
-                'values': [v.get('name') for v in filter_item.get('values', [])[:5]]
-            }
-            results['filters'].append(filter_info)
+        except Exception as e:
+            return f"request error: {str(e)}"
 
-        return results
+    def get_items(self, ids: Iterable[str], attributes: Optional[List[str]] = None,
+                  max_workers: int = 8) -> Dict[str, Dict]:
+        """
+        Full item bodies (attributes, pictures, stock) for many ids at once
+        Uses the /items?ids= multi-get, so 1,000 ids take 50 requests, issued
+        concurrently. Per-id failures are collected instead of failing the batch:
+        {'items': {id: body}, 'errors': {id: reason}}
+        """
+        chunks = self.item_chunks(ids)
+        if not chunks:
+            return {'items': {}, 'errors': {}}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+            return self.collect_items(chunks, pool.map(lambda chunk: self.fetch_items_chunk(chunk, attributes), chunks))
 
     def get_categories(self) -> Optional[List]:
         """Get all categories for Chile"""
         endpoint = f"{self.base_url}/sites/{self.site_id}/categories"
 
         try:
-            print("\n📂 Fetching categories...")
-            response = self.session.get(endpoint, timeout=10)
+            verbose("\n📂 Fetching categories...")
+            response = self.session.get(endpoint, timeout=10, stream=True)
 
             if response.status_code == 200:
-                categories = response.json()
-                return categories[:10]  # First 10 categories
+                # Decoded as it downloads; the rest of the list is never read
+                stream = stream_response(response)
+                try:
+                    return list(read_array(stream, CATEGORIES_SHOWN))
+                finally:
+                    release(response, stream)
             else:
                 print(f"❌ Error fetching categories: {response.status_code}")
+                response.close()
                 return None
 
         except Exception as e:
@@ -135,19 +397,21 @@ class MercadoLibreAPI:
 
     def search_by_category(self, category_id: str, limit: int = 10) -> Optional[Dict]:
         """Search products by category"""
-        endpoint = f"{self.base_url}/sites/{self.site_id}/search"
+        endpoint = self.search_url
 
         params = {
             'category': category_id,
             'limit': limit,
-            'sort': 'relevance'  # or 'price_asc', 'price_desc'
+            'sort': 'relevance',  # or 'price_asc', 'price_desc'
+            **self.search_projection()
         }
 
         try:
-            response = self.session.get(endpoint, params=params, timeout=10)
+            response = self.session.get(endpoint, params=params, timeout=10, stream=True)
 
             if response.status_code == 200:
-                return self.parse_search_results(response.json())
+                return self.parse_search_results(self.read_search(response))
+            response.close()
             return None
 
         except:
@@ -159,40 +423,239 @@ class MercadoLibreAPI:
         This simulates what you could do with Claude AI integration
         """
 
-        # Map holiday types to search queries
-        holiday_queries = {
-            'navidad': ['regalos navidad', 'decoracion navidad', 'arbol navidad'],
-            'año_nuevo': ['champagne', 'cotillon año nuevo', 'fuegos artificiales'],
-            'fiestas_patrias': ['bandera chile', 'parrilla carbon', 'anticucho'],
-            'asado': ['parrilla', 'carbon', 'carne vacuno', 'cerveza'],
-            'verano': ['piscina', 'bloqueador solar', 'cooler'],
-            'dia_del_niño': ['juguetes', 'bicicleta niños', 'videojuegos']
-        }
+        queries = HOLIDAY_QUERIES.get(holiday_type, ['regalo'])
+        results = ((query, self.search_products(query, limit=5, filters=False)) for query in queries)
+        return self.holiday_recommendations(holiday_type, results)
+
+class AsyncMercadoLibreAPI(MercadoLibreBase):
+    """
+    Async counterpart of MercadoLibreAPI, with the same methods as coroutines
+    All queries share one connection pool and run concurrently, so a
+    refresh takes as long as the slowest query instead of the sum of all
+    """
+
+    def __init__(self, max_concurrency: int = 8, timeout: float = 10,
+                 limiters: Optional[RateLimiterRegistry] = None, max_retries: int = 3,
+                 tokens: Optional[TokenManager] = None, metrics: Optional[Metrics] = None):
+        super().__init__(tokens)
+        if httpx is None:
+            raise ImportError("AsyncMercadoLibreAPI requires httpx (pip install httpx)")
+
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limiters = limiters or get_shared_limiters()
+        self.metrics = metrics or get_metrics()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # HTTP/2 when h2 is installed: every query multiplexed over one connection
+        self.client = create_async_client(
+            self.headers, max_concurrency, timeout,
+            auth=AsyncBearerAuth(tokens) if tokens else None
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the shared connection pool"""
+        await self.client.aclose()
+
+    async def get(self, url: str, params: Optional[Dict] = None) -> "httpx.Response":
+        """
+        GET through the shared per-host rate limiter
+        429/503 answers slow the host down and are retried; every attempt
+        is timed into the shared metrics
+        """
+        limiter = self.limiters.for_url(url)
+
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire_async()
+            exchange = Exchange(self.metrics, url) if self.metrics.enabled else None
+            try:
+                response = await self.client.get(
+                    url, params=params,
+                    extensions={'trace': exchange.trace} if exchange else None
+                )
+            except Exception as e:
+                if exchange:
+                    exchange.finish('error', downloaded=False)
+                limiter.on_error(e, attempt)
+                raise
+
+            if exchange:
+                exchange.finish(response.status_code, len(response.content))
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if not limiter.feedback(response.status_code, retry_after, attempt):
+                break
+            if exchange and attempt < self.max_retries:
+                self.metrics.inc('http_retries_total', host=exchange.host, reason='throttle')
+
+        return response
+
+    async def search_products(self, query: str, limit: int = 20, offset: int = 0,
+                              filters: bool = True, max_products: int = 10) -> Optional[Dict]:
+        """Search products in MercadoLibre Chile without blocking the event loop"""
+        endpoint = self.search_url
 
-        queries = holiday_queries.get(holiday_type, ['regalo'])
-        recommendations = {
-            'holiday': holiday_type,
-            'timestamp': datetime.now().isoformat(),
-            'categories': {}
+        params = {
+            'q': query,
+            'limit': limit,
+            'offset': offset,
+            **self.search_projection(filters)
         }
 
-        for query in queries:
-            results = self.search_products(query, limit=5)
-            if results and results['products']:
-                recommendations['categories'][query] = results['products'][:3]
+        async with self._semaphore:
+            try:
+                verbose(f"🔍 Searching for: {query}")
+                response = await self.get(endpoint, params=params)
 
-        return recommendations
+                if response.status_code == 200:
+                    return self.parse_search_results(response.json(), max_products, filters)
+                else:
+                    print(f"❌ Error {response.status_code} for: {query}")
+                    return None
+
+            except Exception as e:
+                print(f"❌ Request error for {query}: {str(e)}")
+                return None
+
+    async def fetch_search_page(self, params: Dict, offset: int, limit: int) -> Optional[Dict]:
+        """Fetch one raw search page, returning the decoded JSON"""
+        endpoint = self.search_url
+
+        async with self._semaphore:
+            try:
+                response = await self.get(
+                    endpoint,
+                    params={**params, 'limit': limit, 'offset': offset, **self.search_projection(filters=False)}
+                )
+                if response.status_code == 200:
+                    return response.json()
+                print(f"❌ Error {response.status_code} at offset {offset}")
+                return None
+
+            except Exception as e:
+                print(f"❌ Request error at offset {offset}: {str(e)}")
+                return None
+
+    async def iter_search(self, query: Optional[str] = None, max_items: int = 1000,
+                          category_id: Optional[str] = None, page_size: int = SEARCH_PAGE_SIZE,
+                          prefetch: int = 3) -> AsyncIterator[Product]:
+        """
+        Async counterpart of MercadoLibreAPI.iter_search
+        Remaining pages are fetched as tasks, at most `prefetch` ahead
+        """
+        if max_items <= 0:
+            return
+        params = self.search_params(query, category_id)
+        page_size = min(page_size, max_items, SEARCH_PAGE_SIZE)
+        prefetch = max(1, prefetch)
+
+        first = await self.fetch_search_page(params, 0, page_size)
+        if not first:
+            return
+
+        yielded = 0
+        for item in first.get('results', []):
+            if yielded >= max_items:
+                return
+            yield self.parse_item(item)
+            yielded += 1
+
+        total = first.get('paging', {}).get('total')
+        if total is None:
+            offset = page_size
+            while yielded < max_items and offset < MAX_SEARCH_OFFSET:
+                page = await self.fetch_search_page(params, offset, page_size)
+                items = page.get('results', []) if page else []
+                for item in items[:max_items - yielded]:
+                    yield self.parse_item(item)
+                    yielded += 1
+                if len(items) < page_size:
+                    return
+                offset += page_size
+            return
+
+        offsets = iter(self.page_offsets(total, max_items, page_size))
+        in_flight = deque(
+            asyncio.ensure_future(self.fetch_search_page(params, offset, page_size))
+            for offset in islice(offsets, prefetch)
+        )
+
+        try:
+            while in_flight and yielded < max_items:
+                page = await in_flight.popleft()
+                for offset in islice(offsets, 1):
+                    in_flight.append(asyncio.ensure_future(
+                        self.fetch_search_page(params, offset, page_size)
+                    ))
+
+                for item in (page or {}).get('results', []):
+                    if yielded >= max_items:
+                        break
+                    yield self.parse_item(item)
+                    yielded += 1
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def fetch_items_chunk(self, chunk: List[str], attributes: Optional[List[str]] = None):
+        """Raw multi-get answer for up to ITEMS_MULTIGET_MAX ids, or an error string"""
+        async with self._semaphore:
+            try:
+                response = await self.get(f"{self.base_url}/items", params=self.items_params(chunk, attributes))
+                if response.status_code == 200:
+                    return response.json()
+                return f"HTTP {response.status_code}"
+
+            except Exception as e:
+                return f"request error: {str(e)}"
+
+    async def get_items(self, ids: Iterable[str], attributes: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Async counterpart of MercadoLibreAPI.get_items
+        Every chunk is issued at once, bounded by max_concurrency
+        """
+        chunks = self.item_chunks(ids)
+        answers = await asyncio.gather(*(self.fetch_items_chunk(chunk, attributes) for chunk in chunks))
+        return self.collect_items(chunks, answers)
+
+    async def get_holiday_recommendations(self, holiday_type: str) -> Dict:
+        """
+        Get product recommendations based on holiday type
+        Every query for the holiday is issued at once
+        """
+        queries = HOLIDAY_QUERIES.get(holiday_type, ['regalo'])
+        results = await asyncio.gather(
+            *(self.search_products(query, limit=5, filters=False) for query in queries)
+        )
+        return self.holiday_recommendations(holiday_type, zip(queries, results))
+
+    async def get_all_holiday_recommendations(self, holiday_types: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Get recommendations for many holidays in one concurrent batch
+        Defaults to every holiday in HOLIDAY_QUERIES
+        """
+        holiday_types = list(holiday_types or HOLIDAY_QUERIES)
+
+        results = await asyncio.gather(
+            *(self.get_holiday_recommendations(holiday) for holiday in holiday_types)
+        )
+
+        return dict(zip(holiday_types, results))
 
-def format_product_display(product: Dict) -> str:
+def format_product_display(product: Product) -> str:
     """Format product for display"""
     output = []
-    output.append(f"  📦 {product['title'][:60]}...")
-    output.append(f"  💰 {product['price']}")
-    if product.get('discount'):
-        output.append(f"  🏷️ {product['discount']}")
-    output.append(f"  📊 Vendidos: {product['sold_quantity']}")
-    output.append(f"  🚚 {product['shipping']}")
-    output.append(f"  🔗 {product['permalink'][:50]}...")
+    output.append(f"  📦 {product.title[:60]}...")
+    output.append(f"  💰 {format_clp(product.price)}")
+    if product.discount:
+        output.append(f"  🏷️ {product.discount:.0f}% OFF")
+    output.append(f"  📊 Vendidos: {product.sold_quantity}")
+    output.append(f"  🚚 {'Envío gratis' if product.free_shipping else 'Envío pagado'}")
+    output.append(f"  🔗 {(product.permalink or '')[:50]}...")
     return '\n'.join(output)
 
 def main():
@@ -200,7 +663,12 @@ def main():
     print("🛒 MERCADOLIBRE CHILE API TEST")
     print("="*70)
 
-    api = MercadoLibreAPI()
+    # Authenticated when mercadolibre_token.json holds a usable token
+    tokens = TokenManager.from_default()
+    if tokens:
+        print(f"🔐 Using MercadoLibre token from {tokens.source}")
+        tokens.start()
+    api = MercadoLibreAPI(tokens=tokens)
 
     # Test 1: Basic product search
     print("\n" + "="*70)
@@ -256,7 +724,7 @@ def main():
     for category, products in holiday_recs['categories'].items():
         print(f"\n📌 {category.upper()}:")
         for product in products[:2]:
-            print(f"  • {product['title'][:50]}... - {product['price']}")
+            print(f"  • {product.title[:50]}... - {format_clp(product.price)}")
 
     print("\n🇨🇱 Fiestas Patrias Recommendations:")
     patrias_recs = api.get_holiday_recommendations('fiestas_patrias')
@@ -264,7 +732,31 @@ def main():
     for category, products in patrias_recs['categories'].items():
         print(f"\n📌 {category.upper()}:")
         for product in products[:2]:
-            print(f"  • {product['title'][:50]}... - {product['price']}")
+            print(f"  • {product.title[:50]}... - {format_clp(product.price)}")
+
+    # Test 4: Concurrent refresh of every holiday
+    if httpx is not None:
+        print("\n" + "="*70)
+        print("TEST 4: Concurrent Holiday Refresh")
+        print("="*70)
+
+        async def refresh_all():
+            async with AsyncMercadoLibreAPI(max_concurrency=8, tokens=tokens) as async_api:
+                return await async_api.get_all_holiday_recommendations()
+
+        started = time.perf_counter()
+        all_recs = asyncio.run(refresh_all())
+        elapsed = time.perf_counter() - started
+
+        print(f"\n✅ Refreshed {len(all_recs)} holidays in {elapsed:.2f}s")
+        for holiday, recs in all_recs.items():
+            print(f"  • {holiday}: {len(recs['categories'])} categories")
+
+    if api.cache:
+        stats = api.cache.stats()
+        print(f"\n📦 Cache: {stats['hits']} hits, {stats['revalidated']} revalidated, "
+              f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+    report()
 
     # Summary
     print("\n" + "="*70)
@@ -4,13 +4,160 @@ Test MercadoLibre PUBLIC endpoints (no auth required)
 Using the same endpoints that their website uses
 """
 
+import os
 import requests
 import json
-from typing import Dict, List, Optional
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 import urllib.parse
 
+from http_cache import ResponseCache, default_cache_dir, install_cache
+from json_stream import CHUNK_SIZE, JSONStream
+from metrics import get_metrics, report, timed_parser, verbose
+from products import Product, format_clp, intern, to_clp
+
+# Markers that precede the embedded state JSON in MercadoLibre pages
+STATE_MARKERS = [
+    'window.__PRELOADED_STATE__ =',
+    'window.initialState =',
+    '__INITIAL_STATE__ ='
+]
+STATE_MARKER_PATTERN = '(' + '|'.join(re.escape(marker) for marker in STATE_MARKERS) + r')\s*'
+STATE_MARKER_RE = re.compile(STATE_MARKER_PATTERN)
+STATE_MARKER_BYTES_RE = re.compile(STATE_MARKER_PATTERN.encode())
+STATE_DECODER = json.JSONDecoder()
+# Where an embedded state's <script> ends, bounding the bytes decoded as text
+SCRIPT_END_RE = re.compile(rb'</script', re.IGNORECASE)
+
+# Search sources in their default order, tried until one gives products
+SEARCH_SOURCES = {
+    'listado': "https://listado.mercadolibre.cl/{query}",
+    'jm_search': "https://www.mercadolibre.cl/jm/search?as_word={query}",
+    'api': "https://api.mercadolibre.com/sites/MLC/search?q={query}&limit=10"
+}
+
+# Hedge delay bounds (seconds), and the delay used before a source has history
+MIN_HEDGE_DELAY = 0.05
+MAX_HEDGE_DELAY = 3.0
+DEFAULT_HEDGE_DELAY = 1.0
+# Latency samples kept per source, and samples needed before trusting its p95
+LATENCY_WINDOW = 50
+MIN_LATENCY_SAMPLES = 5
+# Weight kept by past attempts on every new one, so success rates follow changes
+SUCCESS_DECAY = 0.95
+# Seconds a failed attempt costs: roughly the wait for another source to answer
+FAILURE_COST = 3.0
+# Least seconds between writes of the stats file
+STATS_SAVE_INTERVAL = 30
+
+def decode_json_at(buffer: memoryview, start: int) -> object:
+    """
+    Decode one JSON value starting at a byte offset of a UTF-8 buffer
+    Only the bytes up to the end of the enclosing <script> are turned into
+    text, and invalid UTF-8 is replaced rather than failing the extraction.
+    A value running past that point is read on in chunks, growing the
+    window until it ends, so the rest of the page is never copied
+    """
+    end = SCRIPT_END_RE.search(buffer, start)
+    window = str(buffer[start:end.start() if end else len(buffer)], 'utf-8', 'replace')
+    try:
+        data, _ = STATE_DECODER.raw_decode(window)
+        return data
+    except ValueError:
+        if end is None:
+            raise
+    chunks = (buffer[offset:offset + CHUNK_SIZE] for offset in range(start, len(buffer), CHUNK_SIZE))
+    return JSONStream(chunks).value()
+
+class SourceStats:
+    """
+    Latency samples and success rate per search source, persisted between runs
+    Drives both the hedge delay (the source's p95) and the order sources
+    are tried in (expected time to a usable answer)
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(default_cache_dir(), 'mercadolibre_sources.json')
+        self._lock = threading.Lock()
+        self.sources: Dict[str, Dict] = self.load()
+        self.saved_at = 0.0
+
+    def load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_if_due(self):
+        """Persist at most every STATS_SAVE_INTERVAL, so searches don't each pay for a write"""
+        if time.monotonic() - self.saved_at >= STATS_SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        with self._lock:
+            snapshot = json.dumps(self.sources)
+            self.saved_at = time.monotonic()
+        try:
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            # Unique per writer: pipeline workers each hold their own stats on the same file
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.mercadolibre_sources.')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not persist source stats: {e}")
+
+    def record(self, name: str, latency: float, success: Optional[bool]):
+        """
+        Add one observation; success=None means the attempt was cancelled,
+        so only its latency (a lower bound) is kept
+        """
+        with self._lock:
+            entry = self.sources.setdefault(name, {'latencies': [], 'attempts': 0.0, 'successes': 0.0})
+            entry['latencies'] = (entry['latencies'] + [round(latency, 4)])[-LATENCY_WINDOW:]
+            if success is not None:
+                entry['attempts'] = entry['attempts'] * SUCCESS_DECAY + 1
+                entry['successes'] = entry['successes'] * SUCCESS_DECAY + (1 if success else 0)
+
+    def p95(self, name: str) -> Optional[float]:
+        with self._lock:
+            latencies = sorted(self.sources.get(name, {}).get('latencies', []))
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def success_rate(self, name: str) -> float:
+        """Smoothed, so a new source starts at 1/2 rather than 0 or 1"""
+        with self._lock:
+            entry = self.sources.get(name, {})
+            return (entry.get('successes', 0) + 1) / (entry.get('attempts', 0) + 2)
+
+    def hedge_delay(self, name: str) -> float:
+        """How long to give a source before firing the next one"""
+        p95 = self.p95(name)
+        if p95 is None:
+            return DEFAULT_HEDGE_DELAY
+        return min(MAX_HEDGE_DELAY, max(MIN_HEDGE_DELAY, p95))
+
+    def expected_cost(self, name: str) -> float:
+        """Expected wait for a usable answer: median latency plus the cost of failing"""
+        with self._lock:
+            latencies = sorted(self.sources.get(name, {}).get('latencies', []))
+        median = latencies[len(latencies) // 2] if latencies else DEFAULT_HEDGE_DELAY
+        return median + (1 - self.success_rate(name)) * FAILURE_COST
+
+    def order(self, names: List[str]) -> List[str]:
+        """Cheapest sources first; ties keep the given order"""
+        return sorted(names, key=self.expected_cost)
+
 class MercadoLibrePublicAPI:
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None, source_stats: Optional[SourceStats] = None):
         self.session = requests.Session()
         # Mimic browser headers
         self.headers = {
@@ -21,28 +168,86 @@ class MercadoLibrePublicAPI:
             'Origin': 'https://www.mercadolibre.cl'
         }
         self.session.headers.update(self.headers)
+        self.cache = install_cache(self.session, cache)
+        self.source_stats = source_stats or SourceStats()
 
     def search_web_format(self, query: str) -> Optional[Dict]:
         """
         Use the same URL format as the website
         This mimics what happens when you search on mercadolibre.cl
+
+        Sources are hedged: the best one by past latency and success goes
+        first, and if it hasn't answered within its p95 the next one is
+        fired too. The first usable answer wins and the rest are dropped
         """
         # URL encode the query
         encoded_query = urllib.parse.quote(query)
+        names = self.source_stats.order(list(SEARCH_SOURCES))
+        urls = {name: SEARCH_SOURCES[name].format(query=encoded_query) for name in names}
+
+        won = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=len(names))
+        pending = {}
+        started = {}
+        queue = iter(names)
+
+        def fire() -> Optional[str]:
+            name = next(queue, None)
+            if name is not None:
+                verbose(f"\n🔍 Testing URL: {urls[name][:80]}...")
+                started[name] = time.perf_counter()
+                pending[pool.submit(self.fetch_source, name, urls[name], won)] = name
+            return name
 
-        # Try different URL patterns that MercadoLibre uses
-        urls = [
-            f"https://listado.mercadolibre.cl/{encoded_query}",
-            f"https://www.mercadolibre.cl/jm/search?as_word={encoded_query}",
-            f"https://api.mercadolibre.com/sites/MLC/search?q={encoded_query}&limit=10"
-        ]
+        try:
+            current = fire()
+            while pending:
+                done, _ = wait(pending, timeout=self.source_stats.hedge_delay(current), return_when=FIRST_COMPLETED)
+                if not done:
+                    # The current source is slower than its p95: hedge with the next
+                    hedge = fire()
+                    if hedge is not None:
+                        get_metrics().inc('hedged_requests_total', source=hedge)
+                        current = hedge
+                    continue
+
+                for future in done:
+                    name = pending.pop(future)
+                    result = future.result()
+                    if result is not None:
+                        won.set()
+                        verbose(f"✅ Using {name} after {time.perf_counter() - started[name]:.2f}s")
+                        return result
 
-        for url in urls:
-            print(f"\n🔍 Testing URL: {url[:80]}...")
+                # A source failed outright: move on without waiting
+                current = fire() or current
 
-            try:
-                response = self.session.get(url, timeout=10, allow_redirects=True)
-                print(f"Status: {response.status_code}")
+            return None
+
+        finally:
+            won.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+            for future, name in pending.items():
+                if not future.done():
+                    # Dropped for a faster source; its time so far is a lower bound
+                    self.source_stats.record(name, time.perf_counter() - started[name], None)
+            self.source_stats.save_if_due()
+
+    def fetch_source(self, name: str, url: str, won: Optional[threading.Event] = None) -> Optional[Dict]:
+        """
+        Products from one search source, or None when it has none
+        Records the attempt in source_stats unless another source won first
+        """
+        started = time.perf_counter()
+        result = None
+        try:
+            response = self.session.get(url, timeout=10, allow_redirects=True, stream=True)
+
+            with response:
+                verbose(f"Status: {response.status_code}")
+                if won is not None and won.is_set():
+                    # Closed unread: the response cache only keeps bodies read to the end
+                    return None
 
                 if response.status_code == 200:
                     # Check if it's JSON
@@ -51,57 +256,67 @@ class MercadoLibrePublicAPI:
                     if 'application/json' in content_type:
                         data = response.json()
                         if 'results' in data:
-                            return self.parse_api_response(data)
+                            result = self.parse_api_response(data)
                         else:
-                            print(f"JSON structure: {list(data.keys())[:5]}")
+                            verbose(f"JSON structure: {list(data.keys())[:5]}")
 
                     elif 'text/html' in content_type:
-                        # It's HTML - look for embedded JSON data
-                        return self.extract_from_html(response.text)
+                        # It's HTML - look for embedded JSON data in the raw body
+                        result = self.extract_from_html(memoryview(response.content))
 
-            except Exception as e:
-                print(f"Error: {str(e)[:100]}")
+        except Exception as e:
+            print(f"Error: {str(e)[:100]}")
 
-        return None
+        if result is not None and not result['products']:
+            result = None
+        if won is None or not won.is_set():
+            self.source_stats.record(name, time.perf_counter() - started, result is not None)
+        return result
 
-    def extract_from_html(self, html: str) -> Optional[Dict]:
+    @timed_parser('mercadolibre.listado')
+    def extract_from_html(self, html: Union[str, bytes, memoryview]) -> Optional[Dict]:
         """
         Extract product data from HTML response
         MercadoLibre embeds JSON data in their HTML
+        Accepts the decoded text or the raw body (bytes/memoryview)
         """
         result = {'products': [], 'source': 'html'}
 
-        # Look for common patterns in MercadoLibre HTML
-        markers = [
-            'window.__PRELOADED_STATE__ = ',
-            'window.initialState = ',
-            '__INITIAL_STATE__ = '
-        ]
-
-        for marker in markers:
-            if marker in html:
-                try:
-                    start = html.index(marker) + len(marker)
-                    # Find the end of the JSON object
-                    end = html.index('</script>', start)
-                    json_str = html[start:end].strip()
-
-                    # Remove trailing semicolon if present
-                    if json_str.endswith(';'):
-                        json_str = json_str[:-1]
+        for marker, data in self.iter_embedded_states(html):
+            verbose(f"✅ Found embedded JSON with marker: {marker}")
 
-                    data = json.loads(json_str)
-                    print(f"✅ Found embedded JSON with marker: {marker}")
+            # Navigate the structure to find products
+            if self.extract_products_from_state(data, result):
+                return result
 
-                    # Navigate the structure to find products
-                    if self.extract_products_from_state(data, result):
-                        return result
+        verbose("❌ No embedded JSON data found in HTML")
+        return None
 
-                except (ValueError, json.JSONDecodeError) as e:
+    def iter_embedded_states(self, html: Union[str, bytes, memoryview]) -> Iterator[Tuple[str, object]]:
+        """
+        Yield (marker, state) for each embedded state blob, earliest first
+        One regex pass finds every marker; the JSON is decoded in place from
+        the marker offset, so the document is never sliced or searched for
+        </script>
+        """
+        if isinstance(html, str):
+            for match in STATE_MARKER_RE.finditer(html):
+                try:
+                    data, _ = STATE_DECODER.raw_decode(html, match.end())
+                except ValueError as e:
                     print(f"Failed to parse JSON: {str(e)[:100]}")
+                    continue
+                yield match.group(1), data
+            return
 
-        print("❌ No embedded JSON data found in HTML")
-        return None
+        buffer = memoryview(html)
+        for match in STATE_MARKER_BYTES_RE.finditer(buffer):
+            try:
+                data = decode_json_at(buffer, match.end())
+            except ValueError as e:
+                print(f"Failed to parse JSON: {str(e)[:100]}")
+                continue
+            yield match.group(1).decode(), data
 
     def extract_products_from_state(self, data: Dict, result: Dict) -> bool:
         """
@@ -127,7 +342,7 @@ class MercadoLibrePublicAPI:
             else:
                 # Successfully navigated the path
                 if isinstance(current, list) and current:
-                    print(f"✅ Found products at path: {' -> '.join(path)}")
+                    verbose(f"✅ Found products at path: {' -> '.join(path)}")
                     for item in current[:5]:
                         product = self.extract_product_info(item)
                         if product:
@@ -136,30 +351,24 @@ class MercadoLibrePublicAPI:
 
         return False
 
-    def extract_product_info(self, item: Dict) -> Optional[Dict]:
+    def extract_product_info(self, item: Dict) -> Optional[Product]:
         """Extract product information from item data"""
         try:
-            return {
-                'id': item.get('id', 'N/A'),
-                'title': item.get('title', item.get('name', 'Unknown'))[:80],
-                'price': self.format_price(item.get('price', item.get('price_info', {}))),
-                'thumbnail': item.get('thumbnail', item.get('image', '')),
-                'permalink': item.get('permalink', ''),
-                'condition': item.get('condition', 'new'),
-                'shipping': 'free' if item.get('shipping', {}).get('free_shipping') else 'paid'
-            }
+            return Product(
+                id=item.get('id', 'N/A'),
+                title=item.get('title', item.get('name', 'Unknown')),
+                price=to_clp(item.get('price', item.get('price_info'))),
+                original_price=to_clp(item.get('original_price')),
+                thumbnail=item.get('thumbnail', item.get('image', '')),
+                permalink=item.get('permalink', ''),
+                condition=intern(item.get('condition', 'new')),
+                free_shipping=bool(item.get('shipping', {}).get('free_shipping')),
+                source='mercadolibre'
+            )
         except:
             return None
 
-    def format_price(self, price_data) -> str:
-        """Format price from various structures"""
-        if isinstance(price_data, (int, float)):
-            return f"${price_data:,.0f} CLP"
-        elif isinstance(price_data, dict):
-            amount = price_data.get('amount', price_data.get('value', 0))
-            return f"${amount:,.0f} CLP"
-        return "N/A"
-
+    @timed_parser('mercadolibre.api')
     def parse_api_response(self, data: Dict) -> Dict:
         """Parse API JSON response"""
         result = {
@@ -169,17 +378,7 @@ class MercadoLibrePublicAPI:
         }
 
         for item in data.get('results', [])[:10]:
-            product = {
-                'id': item.get('id'),
-                'title': item.get('title')[:80],
-                'price': f"${item.get('price', 0):,.0f} CLP",
-                'thumbnail': item.get('thumbnail'),
-                'permalink': item.get('permalink'),
-                'condition': item.get('condition'),
-                'shipping': 'Envío gratis' if item.get('shipping', {}).get('free_shipping') else 'Envío pagado',
-                'seller': item.get('seller', {}).get('nickname', 'Unknown')
-            }
-            result['products'].append(product)
+            result['products'].append(Product.from_mercadolibre(item))
 
         return result
 
@@ -203,7 +402,8 @@ class MercadoLibrePublicAPI:
         for endpoint in test_endpoints:
             print(f"\nTesting: {endpoint}")
             try:
-                response = requests.get(endpoint, timeout=5)
+                # Through the shared session: one warm connection for every endpoint
+                response = self.session.get(endpoint, timeout=5)
                 print(f"Status: {response.status_code}")
 
                 if response.status_code == 200:
@@ -245,16 +445,18 @@ def main():
 
             for i, product in enumerate(result['products'][:3], 1):
                 print(f"\nProduct {i}:")
-                print(f"  📦 {product['title']}")
-                print(f"  💰 {product['price']}")
-                print(f"  🚚 Shipping: {product.get('shipping', 'N/A')}")
-                if product.get('permalink'):
-                    print(f"  🔗 {product['permalink'][:60]}...")
+                print(f"  📦 {product.title[:80]}")
+                print(f"  💰 {format_clp(product.price)}")
+                print(f"  🚚 Shipping: {'free' if product.free_shipping else 'paid'}")
+                if product.permalink:
+                    print(f"  🔗 {product.permalink[:60]}...")
         else:
             print("\n❌ Could not retrieve products")
 
     # Test direct API
     api.test_direct_api()
+    api.source_stats.save()
+    report()
 
     print("\n" + "="*70)
     print("💡 FINAL RECOMMENDATIONS")
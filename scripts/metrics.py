@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+"""
+Instrumentation shared by the marketplace clients
+Per host and endpoint HTTP phase timings (dns, connect, tls, ttfb,
+download), response bytes, retries, cache lookups and parser timings,
+exported in the Prometheus text format, plus optional
+OpenTelemetry-style spans
+
+FERIADOS24_METRICS=0 turns recording off, FERIADOS24_TRACE=1 records
+spans and FERIADOS24_VERBOSE=0 silences per-request progress prints
+"""
+
+import bisect
+import contextvars
+import functools
+import json
+import os
+import re
+import secrets
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # Spans are only mirrored to OpenTelemetry when it's installed
+    otel_trace = None
+
+METRIC_PREFIX = 'feriados24_'
+
+# Seconds, from cached answers up to slow listing pages
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name: (type, help)
+METRICS_HELP = {
+    'http_phase_seconds': ('histogram', 'Time spent in each phase of an upstream HTTP exchange'),
+    'http_requests_total': ('counter', 'Upstream HTTP requests by status'),
+    'http_response_bytes_total': ('counter', 'Upstream response body bytes'),
+    'http_retries_total': ('counter', 'Upstream requests retried after a throttle or transport error'),
+    'cache_lookups_total': ('counter', 'Response cache lookups by result'),
+    'parse_seconds': ('histogram', 'Time spent in each response parser'),
+    'hedged_requests_total': ('counter', 'Fallback sources fired because the previous one was slower than its p95'),
+}
+
+# Path pieces that vary per request, collapsed so endpoints stay few
+ENDPOINT_RULES = [
+    (re.compile(r'\bM[A-Z]{2}\d+\b'), ':id'),
+    (re.compile(r'(?<=/)\d+(?=/|$)'), ':id'),
+]
+# Hosts whose whole path is the search text
+QUERY_PATH_HOSTS = {'listado.mercadolibre.cl'}
+
+# Finished spans kept in memory for export
+SPAN_BUFFER = 10_000
+
+VERBOSE = os.environ.get('FERIADOS24_VERBOSE', '1') != '0'
+
+
+def set_verbose(enabled: bool):
+    global VERBOSE
+    VERBOSE = enabled
+
+
+def verbose(*args, **kwargs):
+    """print() for per-request progress lines; silenced by FERIADOS24_VERBOSE=0"""
+    if VERBOSE:
+        print(*args, **kwargs)
+
+
+def endpoint_labels(url: str) -> Tuple[str, str]:
+    """(host, endpoint) labels for a URL, with ids and free text collapsed"""
+    parts = urlsplit(url)
+    host = parts.hostname or ''
+    if host in QUERY_PATH_HOSTS:
+        return host, '/:query'
+    path = parts.path or '/'
+    for pattern, replacement in ENDPOINT_RULES:
+        path = pattern.sub(replacement, path)
+    return host, path
+
+
+class Histogram:
+    """Prometheus-style histogram: per-bucket counts, sum and count"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+@dataclass(slots=True)
+class Span:
+    """One timed operation, shaped like an OpenTelemetry span"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict = field(default_factory=dict)
+    status: str = 'OK'
+    otel: object = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+        if self.otel is not None:
+            self.otel.set_attribute(key, value)
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_span_id': self.parent_id,
+            'start_time_unix_nano': self.start_ns,
+            'end_time_unix_nano': self.end_ns,
+            'attributes': self.attributes,
+            'status': self.status
+        }
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('feriados24_span', default=None)
+
+
+class Metrics:
+    """
+    Thread-safe counters and histograms keyed by name and labels
+    Cheap enough for every request and parse: one lock and a dict update
+    """
+
+    def __init__(self, enabled: bool = True, tracing: bool = False,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.tracing = tracing
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._histograms: Dict[Tuple[str, tuple], Histogram] = {}
+        self.spans: deque = deque(maxlen=SPAN_BUFFER)
+        self._tracer = otel_trace.get_tracer('feriados24') if otel_trace is not None else None
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def counter(self, name: str, **labels) -> float:
+        """Sum of a counter over every series matching the given labels"""
+        wanted = labels.items()
+        with self._lock:
+            return sum(
+                value for (metric, series), value in self._counters.items()
+                if metric == name and wanted <= dict(series).items()
+            )
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+        self.spans.clear()
+
+    # Spans
+
+    def start_span(self, name: str, attributes: Optional[Dict] = None) -> Optional[Span]:
+        """Begin a span under the current one; None when tracing is off"""
+        if not self.tracing:
+            return None
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.time_ns(),
+            attributes=dict(attributes or {})
+        )
+        if self._tracer is not None:
+            span.otel = self._tracer.start_span(name, attributes=span.attributes)
+        return span
+
+    def end_span(self, span: Optional[Span], error: Optional[str] = None):
+        if span is None:
+            return
+        span.end_ns = time.time_ns()
+        if error:
+            span.status = 'ERROR'
+            span.attributes['error.message'] = error
+        if span.otel is not None:
+            if error:
+                span.otel.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, error))
+            span.otel.end()
+        self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """Span around a block; spans started inside become its children"""
+        span = self.start_span(name, attributes)
+        if span is None:
+            yield None
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, type(e).__name__)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            _current_span.reset(token)
+
+    def export_spans(self, path: str) -> int:
+        """Write finished spans as NDJSON; returns how many were written"""
+        spans = list(self.spans)
+        with open(path, 'w', encoding='utf-8') as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False) + '\n')
+        return len(spans)
+
+    # Export
+
+    def to_prometheus(self) -> str:
+        """Every series in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.sum, h.count)) for key, h in self._histograms.items()
+            )
+
+        lines = []
+        described = set()
+
+        def describe(name: str, kind: str):
+            if name not in described:
+                described.add(name)
+                help_text = METRICS_HELP.get(name, (kind, name))[1]
+                lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name, 'counter')
+            lines.append(f"{METRIC_PREFIX}{name}{format_labels(labels)} {value:g}")
+
+        for (name, labels), (counts, total, count) in histograms:
+            describe(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float('inf')), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                lines.append(f"{METRIC_PREFIX}{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{METRIC_PREFIX}{name}_sum{format_labels(labels)} {total:.6f}")
+            lines.append(f"{METRIC_PREFIX}{name}_count{format_labels(labels)} {count}")
+
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        """Atomically write the Prometheus text, e.g. for node_exporter's textfile collector"""
+        try:
+            directory = os.path.dirname(path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            # Unique per writer and without the .prom suffix the collector scrapes
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
+            # mkstemp creates it 0600; the collector may run as another user
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write metrics: {e}")
+
+    def summary(self) -> Dict:
+        """Where the time went: mean/p95 per phase and host, parsers, cache and retries"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (h.sum / h.count if h.count else 0.0, h.quantile(0.95), h.count)
+                          for key, h in self._histograms.items()}
+
+        requests: Dict[str, Dict] = {}
+        for (name, labels), (mean, p95, count) in histograms.items():
+            labels = dict(labels)
+            if name == 'http_phase_seconds':
+                entry = requests.setdefault(f"{labels['host']}{labels['endpoint']}", {})
+                entry[labels['phase']] = {'mean_ms': mean * 1000, 'p95_ms': p95 * 1000, 'count': count}
+
+        parsers = {
+            dict(labels)['parser']: {'mean_ms': mean * 1000, 'p95_ms': p95 * 1000, 'calls': count}
+            for (name, labels), (mean, p95, count) in histograms.items() if name == 'parse_seconds'
+        }
+
+        totals: Dict[str, float] = {}
+        for (name, labels), value in counters.items():
+            labels = dict(labels)
+            if name == 'cache_lookups_total':
+                totals[f"cache_{labels['result']}"] = totals.get(f"cache_{labels['result']}", 0) + value
+            elif name in ('http_requests_total', 'http_retries_total', 'http_response_bytes_total'):
+                totals[name] = totals.get(name, 0) + value
+
+        lookups = sum(value for key, value in totals.items() if key.startswith('cache_'))
+        hits = totals.get('cache_hit', 0) + totals.get('cache_revalidated', 0)
+        return {
+            'requests': requests,
+            'parsers': parsers,
+            'upstream_requests': int(totals.get('http_requests_total', 0)),
+            'retries': int(totals.get('http_retries_total', 0)),
+            'bytes': int(totals.get('http_response_bytes_total', 0)),
+            'cache_hit_rate': hits / lookups if lookups else 0.0,
+        }
+
+
+def format_labels(labels: tuple) -> str:
+    """{key="value",...} with backslashes, quotes and newlines escaped"""
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+_shared_metrics: Optional[Metrics] = None
+_shared_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """Process-wide registry every client reports to"""
+    global _shared_metrics
+    with _shared_lock:
+        if _shared_metrics is None:
+            _shared_metrics = Metrics(
+                enabled=os.environ.get('FERIADOS24_METRICS', '1') != '0',
+                tracing=os.environ.get('FERIADOS24_TRACE', '0') == '1'
+            )
+        return _shared_metrics
+
+
+def report(metrics: Optional[Metrics] = None):
+    """
+    Print where the time went at the end of a run
+    Also writes the Prometheus text to FERIADOS24_METRICS_FILE and the
+    spans to FERIADOS24_TRACE_FILE when those are set
+    """
+    metrics = metrics or get_metrics()
+    if not metrics.enabled:
+        return
+    summary = metrics.summary()
+
+    print(f"\n📈 Upstream: {summary['upstream_requests']} requests, {summary['retries']} retries, "
+          f"{summary['bytes'] / 1024:.0f} KiB, cache hit rate {summary['cache_hit_rate']:.0%}")
+    for endpoint, phases in sorted(summary['requests'].items()):
+        timings = ', '.join(f"{phase} {stats['mean_ms']:.1f}ms" for phase, stats in phases.items())
+        print(f"  • {endpoint}: {timings}")
+    for parser, stats in sorted(summary['parsers'].items()):
+        print(f"  • parse {parser}: {stats['mean_ms']:.2f}ms mean over {stats['calls']} calls")
+
+    metrics_file = os.environ.get('FERIADOS24_METRICS_FILE')
+    if metrics_file:
+        metrics.write_textfile(metrics_file)
+    trace_file = os.environ.get('FERIADOS24_TRACE_FILE')
+    if trace_file and metrics.tracing:
+        metrics.export_spans(trace_file)
+
+
+# Parsers currently being timed on this thread, so recursive calls count once
+_parsing = threading.local()
+
+
+def timed_parser(name: str) -> Callable:
+    """Decorator recording a parser's run time as parse_seconds{parser=name}"""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            metrics = get_metrics()
+            active = getattr(_parsing, 'names', None)
+            if active is None:
+                active = _parsing.names = set()
+            if not metrics.enabled or name in active:
+                return fn(*args, **kwargs)
+
+            active.add(name)
+            span = metrics.start_span(f"parse {name}")
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metrics.observe('parse_seconds', time.perf_counter() - started, parser=name)
+                metrics.end_span(span)
+                active.discard(name)
+        return wrapper
+    return decorate
+
+
+class Exchange:
+    """
+    Timings of one upstream request/response
+    The adapter marks when headers and body arrive; a requests connection
+    opened for it reports dns/connect/tls through the thread-local current
+    exchange, and httpx reports them through trace()
+    """
+
+    __slots__ = ('metrics', 'host', 'endpoint', 'phases', 'started', 'headers_at', 'span', '_marks')
+
+    def __init__(self, metrics: Metrics, url: str, method: str = 'GET'):
+        self.metrics = metrics
+        self.host, self.endpoint = endpoint_labels(url)
+        self.phases: Dict[str, float] = {}
+        self.headers_at: Optional[float] = None
+        self._marks: Dict[str, float] = {}
+        self.span = metrics.start_span(f"HTTP {method}", {
+            'http.request.method': method,
+            'server.address': self.host,
+            'url.path': self.endpoint
+        })
+        self.started = time.perf_counter()
+
+    def add_phase(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def headers_received(self):
+        self.headers_at = time.perf_counter()
+
+    async def trace(self, event: str, info: Dict):
+        """httpx/httpcore `trace` extension callback"""
+        name, _, stage = event.rpartition('.')
+        if stage == 'started':
+            self._marks[name] = time.perf_counter()
+        elif stage == 'complete' and name in self._marks:
+            elapsed = time.perf_counter() - self._marks.pop(name)
+            if name.endswith('connect_tcp'):
+                # httpcore resolves inside connect, so dns is part of it here
+                self.add_phase('connect', elapsed)
+            elif name.endswith('start_tls'):
+                self.add_phase('tls', elapsed)
+            elif name.endswith('receive_response_headers'):
+                self.headers_received()
+
+    def finish(self, status, nbytes: Optional[int] = None, downloaded: bool = True):
+        """Record the exchange; status is the HTTP code or 'error'"""
+        finished = time.perf_counter()
+        metrics, host, endpoint = self.metrics, self.host, self.endpoint
+
+        if self.headers_at is not None:
+            setup = sum(self.phases.values())
+            self.phases['ttfb'] = max(0.0, self.headers_at - self.started - setup)
+            if downloaded:
+                self.phases['download'] = finished - self.headers_at
+        for phase, seconds in self.phases.items():
+            metrics.observe('http_phase_seconds', seconds, host=host, endpoint=endpoint, phase=phase)
+
+        metrics.inc('http_requests_total', host=host, endpoint=endpoint, status=str(status))
+        if nbytes:
+            metrics.inc('http_response_bytes_total', nbytes, host=host, endpoint=endpoint)
+
+        if self.span is not None:
+            self.span.set_attribute('http.response.status_code', status)
+            for phase, seconds in self.phases.items():
+                self.span.set_attribute(f'feriados24.{phase}_ms', round(seconds * 1000, 3))
+            error = None if isinstance(status, int) and status < 500 else str(status)
+            metrics.end_span(self.span, error)
+
+
+_exchange = threading.local()
+
+
+def current_exchange() -> Optional[Exchange]:
+    return getattr(_exchange, 'current', None)
+
+
+def set_current_exchange(exchange: Optional[Exchange]):
+    _exchange.current = exchange
+
+
+class TimedConnectionMixin:
+    """
+    urllib3 connection that splits connection setup into dns, connect and
+    tls for the exchange in progress on this thread
+    """
+
+    def _new_conn(self):
+        exchange = current_exchange()
+        if exchange is None:
+            return super()._new_conn()
+
+        started = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        resolved = time.perf_counter()
+        exchange.add_phase('dns', resolved - started)
+
+        # Connect to the resolved addresses in order, as create_connection would
+        host = self._dns_host
+        error = None
+        try:
+            for address in dict.fromkeys(info[4][0] for info in addresses):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    error = e
+            else:
+                raise error
+        finally:
+            self._dns_host = host
+            exchange.add_phase('connect', time.perf_counter() - resolved)
+        return sock
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        exchange = current_exchange()
+        if exchange is None:
+            return super().connect()
+
+        started = time.perf_counter()
+        before = exchange.phases.get('dns', 0.0) + exchange.phases.get('connect', 0.0)
+        super().connect()
+        socket_setup = exchange.phases.get('dns', 0.0) + exchange.phases.get('connect', 0.0) - before
+        exchange.add_phase('tls', max(0.0, time.perf_counter() - started - socket_setup))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+# For PoolManager.pool_classes_by_scheme
+TIMED_POOL_CLASSES = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+
+def main():
+    """Print the metrics of a quick run against the local stub server"""
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.environ['FERIADOS24_HTTP_CACHE'] = '0'
+
+    from falabella_api_test import FalabellaAPI
+    from mercadolibre_api_test import MercadoLibreAPI
+    from rate_limiter import get_shared_limiters
+    from stub_server import StubServer, redirect_session
+
+    # The clients report to the importable module, not to this __main__ copy
+    import metrics as shared
+
+    shared.set_verbose(False)
+    get_shared_limiters().limits['127.0.0.1'] = (1000.0, 1000)
+    metrics = shared.get_metrics()
+    metrics.tracing = True
+
+    with StubServer(latency=0.005) as stub:
+        ml = MercadoLibreAPI()
+        falabella = FalabellaAPI()
+        redirect_session(ml.session, stub)
+        redirect_session(falabella.session, stub)
+        with metrics.span('demo'):
+            for query in ('parrilla', 'carbon', 'cerveza'):
+                ml.search_products(query)
+                falabella.search_products(query)
+
+    shared.report(metrics)
+    print(f"\n{len(metrics.spans)} spans recorded\n")
+    print(metrics.to_prometheus()[:1500])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+OAuth token manager for the MercadoLibre API
+Seeds from mercadolibre_token.json, refreshes the access token shortly
+before it expires and keeps the rotated token atomically under the cache
+directory (never in the repository), so requests carry a valid bearer header
+without ever paying for a 401 and a retry
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+
+from http_cache import default_cache_dir
+
+try:
+    import httpx
+except ImportError:  # Only needed for AsyncMercadoLibreAPI
+    httpx = None
+
+TOKEN_URL = "https://api.mercadolibre.com/oauth/token"
+
+DEFAULT_TOKEN_PATH = os.environ.get(
+    'FERIADOS24_ML_TOKEN',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mercadolibre_token.json')
+)
+# Rotated tokens live here, outside the repository; the seed file is only read
+DEFAULT_STATE_PATH = os.environ.get(
+    'FERIADOS24_ML_TOKEN_STATE',
+    os.path.join(default_cache_dir(), 'mercadolibre_token.json')
+)
+
+# Refresh this long before expiry, so in-flight requests never hold a stale token
+REFRESH_MARGIN = 10 * 60
+# After a failed refresh, wait this long before trying again
+RETRY_INTERVAL = 30
+
+
+class TokenManager:
+    """
+    Holds the current access token and refreshes it before it expires
+    token() is lock-free while the token is fresh; when it is not, exactly
+    one caller refreshes while the others wait for its result (single
+    flight across threads, and across async tasks through token_async).
+    A refresh written by another process is picked up from disk first.
+    `path` is the seed token, read only while `state_path` does not exist yet;
+    an expired token that cannot be refreshed is not sent at all
+    """
+
+    def __init__(self, path: Optional[str] = None, client_id: Optional[str] = None,
+                 client_secret: Optional[str] = None, margin: float = REFRESH_MARGIN,
+                 state_path: Optional[str] = None):
+        self.path = path or DEFAULT_TOKEN_PATH
+        self.state_path = state_path or DEFAULT_STATE_PATH
+        self.client_id = client_id or os.environ.get('MERCADOLIBRE_CLIENT_ID')
+        self.client_secret = client_secret or os.environ.get('MERCADOLIBRE_CLIENT_SECRET')
+        self.margin = margin
+
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._timer: Optional[threading.Timer] = None
+        self._background = False
+        self._retry_at = 0.0
+        self._warned = False
+        self.refreshes = 0
+
+        self.data: Dict = {}
+        self._mtime = 0.0
+        self.load()
+
+    @classmethod
+    def from_default(cls) -> Optional['TokenManager']:
+        """Manager for the default token file, or None when it holds no usable token"""
+        if not (os.path.exists(DEFAULT_TOKEN_PATH) or os.path.exists(DEFAULT_STATE_PATH)):
+            return None
+        manager = cls()
+        return manager if manager.usable else None
+
+    @property
+    def source(self) -> str:
+        """The file tokens are read from: the rotated state once there is one"""
+        return self.state_path if os.path.exists(self.state_path) else self.path
+
+    def load(self) -> bool:
+        """(Re)read the token file; returns whether it held a token"""
+        source = self.source
+        try:
+            mtime = os.path.getmtime(source) if source == self.state_path else 0.0
+            with open(source, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read MercadoLibre token: {e}")
+            return False
+
+        # Files written by the OAuth flow only carry expires_in, and a file's
+        # mtime says nothing about when it was issued: no expires_at means expired
+        data.setdefault('expires_at', 0)
+        self.data = data
+        self._mtime = mtime
+        return bool(data.get('access_token'))
+
+    @property
+    def expires_at(self) -> float:
+        return self.data.get('expires_at', 0)
+
+    @property
+    def fresh(self) -> bool:
+        return bool(self.data.get('access_token')) and time.time() < self.expires_at - self.margin
+
+    @property
+    def can_refresh(self) -> bool:
+        return bool(self.data.get('refresh_token') and self.client_id and self.client_secret)
+
+    @property
+    def valid(self) -> bool:
+        return bool(self.data.get('access_token')) and time.time() < self.expires_at
+
+    @property
+    def usable(self) -> bool:
+        return self.valid or self.can_refresh
+
+    def token(self) -> Optional[str]:
+        """
+        Current access token, refreshing first if it is about to expire
+        None once it has expired and cannot be refreshed, so requests go out
+        anonymously instead of with a dead bearer
+        """
+        if self.fresh:
+            return self.data['access_token']
+
+        with self._lock:
+            # Whoever held the lock before us may already have refreshed
+            if not self.fresh:
+                self._refresh_locked()
+            return self.data['access_token'] if self.valid else None
+
+    async def token_async(self) -> Optional[str]:
+        """token() for coroutines; a refresh runs off the event loop"""
+        if self.fresh:
+            return self.data['access_token']
+        return await asyncio.to_thread(self.token)
+
+    def _refresh_locked(self):
+        # Another process may have refreshed and rotated the refresh token
+        try:
+            if os.path.getmtime(self.state_path) != self._mtime and self.load() and self.fresh:
+                return
+        except OSError:
+            pass
+
+        if not self.can_refresh:
+            if not self.valid and not self._warned:
+                self._warned = True
+                print("⚠️ MercadoLibre token expired and cannot be refreshed, continuing anonymously "
+                      "(set MERCADOLIBRE_CLIENT_ID and MERCADOLIBRE_CLIENT_SECRET)")
+            return
+        if time.time() < self._retry_at:
+            return
+
+        try:
+            response = self._session.post(TOKEN_URL, data={
+                'grant_type': 'refresh_token',
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'refresh_token': self.data['refresh_token']
+            }, headers={'Accept': 'application/json'}, timeout=10)
+            if response.status_code != 200:
+                raise ValueError(f"HTTP {response.status_code}: {response.text[:200]}")
+            refreshed = response.json()
+        except Exception as e:
+            self._retry_at = time.time() + RETRY_INTERVAL
+            print(f"⚠️ MercadoLibre token refresh failed: {e}")
+            return
+
+        refreshed['expires_at'] = time.time() + refreshed.get('expires_in', 0)
+        # The refresh token rotates on every use; keep the old one only if none came back
+        refreshed.setdefault('refresh_token', self.data['refresh_token'])
+        self.data = {**self.data, **refreshed}
+        self.refreshes += 1
+        self._warned = False
+        self.save()
+        self._schedule()
+
+    def save(self):
+        """Write the token to state_path atomically, readable only by the owner"""
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp_path, self.state_path)
+            self._mtime = os.path.getmtime(self.state_path)
+        except OSError as e:
+            print(f"⚠️ Could not persist MercadoLibre token: {e}")
+
+    def refresh(self):
+        """Refresh now, regardless of expiry"""
+        with self._lock:
+            self._refresh_locked()
+
+    def start(self):
+        """Refresh in a background thread ahead of expiry, off the request path"""
+        self._background = True
+        self._schedule()
+        return self
+
+    def stop(self):
+        self._background = False
+        self._cancel_timer()
+
+    def _cancel_timer(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def _schedule(self):
+        if not (self._background and self.can_refresh):
+            return
+        self._cancel_timer()
+        delay = max(self.expires_at - self.margin - time.time(), RETRY_INTERVAL)
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        self._timer = None
+        with self._lock:
+            if not self.fresh:
+                self._refresh_locked()
+        self._schedule()
+
+
+class BearerAuth(requests.auth.AuthBase):
+    """requests auth hook adding the managed bearer token to every request"""
+
+    def __init__(self, manager: TokenManager):
+        self.manager = manager
+
+    def __call__(self, request):
+        token = self.manager.token()
+        if token:
+            request.headers['Authorization'] = f"Bearer {token}"
+        return request
+
+
+if httpx is not None:
+    class AsyncBearerAuth(httpx.Auth):
+        """httpx auth flow adding the managed bearer token to every request"""
+
+        def __init__(self, manager: TokenManager):
+            self.manager = manager
+
+        def sync_auth_flow(self, request):
+            token = self.manager.token()
+            if token:
+                request.headers['Authorization'] = f"Bearer {token}"
+            yield request
+
+        async def async_auth_flow(self, request):
+            token = await self.manager.token_async()
+            if token:
+                request.headers['Authorization'] = f"Bearer {token}"
+            yield request
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Fetch/parse pipeline for Falabella and MercadoLibre listing pages
+Async fetchers put raw bodies on a bounded queue; a ProcessPoolExecutor
+runs FalabellaScraper.parse_search_results and
+MercadoLibrePublicAPI.extract_from_html, so parsing never holds the GIL
+the fetchers need. When parsers fall behind, the full queue pauses the
+fetchers, which keeps memory bounded
+
+Run directly for an offline throughput benchmark against a local server:
+python scripts/parse_pipeline.py [pages]
+"""
+
+import asyncio
+import os
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import httpx
+except ImportError:  # Only needed when the pipeline runs
+    httpx = None
+
+from metrics import Exchange, Metrics, get_metrics
+from rate_limiter import RateLimiterRegistry, get_shared_limiters, parse_retry_after
+from transport import create_async_client
+
+FALABELLA_SEARCH_URL = "https://www.falabella.com/falabella-cl/search?Ntt={query}"
+MERCADOLIBRE_LISTADO_URL = "https://listado.mercadolibre.cl/{query}"
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'es-CL,es;q=0.9'
+}
+
+
+@dataclass(slots=True)
+class PageJob:
+    site: str            # 'falabella' or 'mercadolibre'
+    query: str
+    url: Optional[str] = None
+
+    def __post_init__(self):
+        if self.url is None:
+            template = FALABELLA_SEARCH_URL if self.site == 'falabella' else MERCADOLIBRE_LISTADO_URL
+            self.url = template.format(query=urllib.parse.quote(self.query))
+
+
+# Parsers live once per worker process, created by the pool initializer
+_worker_parsers: Dict[str, object] = {}
+
+
+def _init_worker(quiet: bool):
+    # Workers only parse: no HTTP cache connection, and no progress prints
+    os.environ['FERIADOS24_HTTP_CACHE'] = '0'
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+
+    from mercadolibre_public_test import MercadoLibrePublicAPI
+    from test_falabella_scraper import FalabellaScraper
+
+    _worker_parsers['falabella'] = FalabellaScraper()
+    _worker_parsers['mercadolibre'] = MercadoLibrePublicAPI()
+
+
+def parse_page(site: str, body: bytes) -> Optional[Dict]:
+    """Parse one raw body in a worker; returns the parser's compact result"""
+    if site == 'falabella':
+        return _worker_parsers['falabella'].parse_search_results(body.decode('utf-8', 'replace'))
+    return _worker_parsers['mercadolibre'].extract_from_html(body)
+
+
+class ParsePipeline:
+    """
+    Bounded producer/consumer pipeline over PageJobs
+    `fetchers` coroutines download pages, at most `queue_size` bodies wait
+    for a parser, and `workers` processes parse them; results are yielded
+    in completion order
+    """
+
+    def __init__(self, workers: Optional[int] = None, fetchers: int = 8, queue_size: Optional[int] = None,
+                 timeout: float = 10, limiters: Optional[RateLimiterRegistry] = None,
+                 max_retries: int = 3, quiet: bool = True, metrics: Optional[Metrics] = None):
+        if httpx is None:
+            raise ImportError("ParsePipeline requires httpx (pip install httpx)")
+
+        self.workers = workers or os.cpu_count() or 1
+        self.fetchers = fetchers
+        self.queue_size = queue_size or self.workers * 2
+        self.timeout = timeout
+        self.limiters = limiters or get_shared_limiters()
+        self.max_retries = max_retries
+        self.quiet = quiet
+        self.metrics = metrics or get_metrics()
+        self.max_queued = 0
+
+    async def fetch(self, client: "httpx.AsyncClient", job: PageJob) -> Optional[bytes]:
+        """Raw body of a page through the per-host rate limiter, or None"""
+        limiter = self.limiters.for_url(job.url)
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire_async()
+            exchange = Exchange(self.metrics, job.url) if self.metrics.enabled else None
+            try:
+                response = await client.get(job.url, extensions={'trace': exchange.trace} if exchange else None)
+            except Exception as e:
+                if exchange:
+                    exchange.finish('error', downloaded=False)
+                limiter.on_error(e, attempt)
+                if not self.quiet:
+                    print(f"❌ Request error for {job.url}: {e}")
+                return None
+
+            if exchange:
+                exchange.finish(response.status_code, len(response.content))
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if not limiter.feedback(response.status_code, retry_after, attempt):
+                break
+            if exchange and attempt < self.max_retries:
+                self.metrics.inc('http_retries_total', host=exchange.host, reason='throttle')
+
+        if response.status_code != 200:
+            if not self.quiet:
+                print(f"❌ Error {response.status_code} for {job.url}")
+            return None
+        return response.content
+
+    async def run(self, jobs: Iterable[PageJob]) -> AsyncIterator[Tuple[PageJob, Optional[Dict]]]:
+        """Yield (job, parsed result) as pages finish; failed pages yield None"""
+        loop = asyncio.get_running_loop()
+        pending = iter(jobs)
+        bodies: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        # Bounded too, so a slow consumer also pauses the parsers
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        done = object()
+
+        async def fetcher(client):
+            for job in pending:  # shared iterator: each job is taken once
+                body = await self.fetch(client, job)
+                if body is None:
+                    await results.put((job, None))
+                    continue
+                # Blocks while parsers are behind: this is the backpressure
+                await bodies.put((job, body))
+                self.max_queued = max(self.max_queued, bodies.qsize())
+
+        async def parser(pool):
+            while True:
+                item = await bodies.get()
+                if item is done:
+                    return
+                job, body = item
+                try:
+                    parsed = await loop.run_in_executor(pool, parse_page, job.site, body)
+                except Exception as e:
+                    if not self.quiet:
+                        print(f"❌ Parse error for {job.url}: {e}")
+                    parsed = None
+                await results.put((job, parsed))
+
+        async def produce(client, pool):
+            parsers = [asyncio.create_task(parser(pool)) for _ in range(self.workers)]
+            try:
+                await asyncio.gather(*(fetcher(client) for _ in range(self.fetchers)))
+            finally:
+                # Even when a fetcher raised: the consumer then gets the error from the producer
+                for _ in parsers:
+                    await bodies.put(done)
+                await asyncio.gather(*parsers)
+                await results.put(done)
+
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.quiet,)) as pool:
+            async with create_async_client(BROWSER_HEADERS, self.fetchers, self.timeout,
+                                           follow_redirects=True) as client:
+                producer = asyncio.create_task(produce(client, pool))
+                try:
+                    while True:
+                        item = await results.get()
+                        if item is done:
+                            break
+                        yield item
+                    await producer
+                finally:
+                    producer.cancel()
+
+    def run_all(self, jobs: Iterable[PageJob]) -> List[Tuple[PageJob, Optional[Dict]]]:
+        """Blocking helper collecting every result"""
+        async def collect():
+            return [item async for item in self.run(jobs)]
+        return asyncio.run(collect())
+
+
+def main():
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from bench_extract_state import synthetic_listado
+    from bench_html_parsers import synthetic_listing
+
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    bodies = {
+        'falabella': synthetic_listing().encode(),
+        'mercadolibre': synthetic_listado(500).encode()
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            body = bodies['falabella' if '/falabella/' in self.path else 'mercadolibre']
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    jobs = [
+        PageJob(site, f"q{i}", f"{base}/{site}/q{i}")
+        for i in range(pages // 2) for site in ('falabella', 'mercadolibre')
+    ]
+    limiters = RateLimiterRegistry({'127.0.0.1': (10000, 10000)})
+
+    print("="*70)
+    print(f"⚙️ FETCH/PARSE PIPELINE ({len(jobs)} pages, {os.cpu_count()} cores)")
+    print("="*70)
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        pipeline = ParsePipeline(workers=workers, limiters=limiters)
+        started = time.perf_counter()
+        results = pipeline.run_all(jobs)
+        elapsed = time.perf_counter() - started
+        parsed = sum(1 for _, result in results if result and result['products'])
+        print(f"{workers:>2} worker(s) {len(jobs) / elapsed:>10.1f} pages/s  "
+              f"{parsed}/{len(jobs)} parsed, queue peak {pipeline.max_queued}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Append-only columnar price history for every fetched product
+Snapshots are buffered and written as NumPy column files per segment;
+queries load the columns memory-mapped and answer discount, price-drop and best-deal
+questions with vectorized operations
+
+Run directly for a synthetic benchmark: python scripts/price_history.py [rows]
+"""
+
+import glob
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # Only needed when a history store is used
+    np = None
+
+from products import Product
+
+ROW_FIELDS = [
+    ('item', 'i4'),            # index into the item id dictionary
+    ('query', 'i4'),           # index into the query dictionary
+    ('ts', 'i8'),              # unix seconds
+    ('price', 'i8'),           # CLP, 0 when unknown
+    ('original_price', 'i8'),  # CLP, 0 when not on sale
+    ('sold_quantity', 'i4'),
+    ('free_shipping', '?'),
+]
+
+DAY = 24 * 3600
+
+# Temp files and directories are named .<name>.<pid>.<random>.tmp; one whose
+# writer is gone, or older than this, is left over from a crash
+STALE_TMP_AGE = 3600
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name != 'posix':  # No signal 0 elsewhere: only the age check applies
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Someone else's process, but alive
+        pass
+    return True
+
+
+class PriceHistoryStore:
+    """
+    Columnar snapshot store: one directory per segment, one .npy per column
+    Item ids and query strings are dictionary-encoded in dictionary.json, so
+    per-item aggregates run on dense integer codes. The dictionary only grows
+    and is written before any segment using its codes, and compaction swaps
+    segments through a compact-N directory, so a crash at any point leaves
+    every row readable exactly once
+    """
+
+    def __init__(self, directory: str, flush_rows: int = 50000):
+        if np is None:
+            raise ImportError("PriceHistoryStore requires numpy (pip install numpy)")
+
+        self.directory = directory
+        self.flush_rows = flush_rows
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._buffer: List[tuple] = []
+        self._columns: Optional[Dict] = None
+
+        try:
+            with open(self._dictionary_path(), encoding='utf-8') as f:
+                dictionary = json.load(f)
+        except (OSError, ValueError):
+            dictionary = {'items': [], 'queries': ['']}
+        self.items: List[str] = dictionary['items']
+        self.queries: List[str] = dictionary['queries']
+        self._item_index = {item: i for i, item in enumerate(self.items)}
+        self._query_index = {query: i for i, query in enumerate(self.queries)}
+        self._recover()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def _dictionary_path(self) -> str:
+        return os.path.join(self.directory, 'dictionary.json')
+
+    def _segments(self) -> List[str]:
+        return sorted(
+            p for p in glob.glob(os.path.join(self.directory, 'segment-*'))
+            if os.path.isdir(p) and not p.endswith('.tmp')
+        )
+
+    def _temp_path(self, name: str, directory: bool = False) -> str:
+        """A fresh temp file (or directory) for `name`, unique to this writer"""
+        prefix, suffix = f'.{name}.{os.getpid()}.', '.tmp'
+        if directory:
+            return tempfile.mkdtemp(prefix=prefix, suffix=suffix, dir=self.directory)
+        fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=self.directory)
+        os.close(fd)
+        return path
+
+    @staticmethod
+    def _stale(path: str) -> bool:
+        """Whether a temp entry's writer is done with it: dead pid or too old"""
+        try:
+            if time.time() - os.path.getmtime(path) > STALE_TMP_AGE:
+                return True
+            pid = int(os.path.basename(path).split('.')[-3])
+        except (OSError, IndexError, ValueError):
+            return True
+        return pid != os.getpid() and not _pid_alive(pid)
+
+    @staticmethod
+    def _segment_id(path: str) -> int:
+        return int(os.path.basename(path).split('-')[1])
+
+    def _recover(self):
+        """
+        Drop temp files left by crashed writers and finish a compaction
+        interrupted after its merged segment was complete
+        Temp entries of writers still running are left alone
+        """
+        for path in glob.glob(os.path.join(self.directory, '.*.tmp')):
+            if self._stale(path):
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        for path in sorted(glob.glob(os.path.join(self.directory, 'compact-*'))):
+            self._swap_compacted(path)
+
+    def _swap_compacted(self, merged: str):
+        # compact-N holds every row of segments 0..N: drop those, then take N's name
+        last_id = self._segment_id(merged)
+        for path in self._segments():
+            if self._segment_id(path) <= last_id:
+                shutil.rmtree(path)
+        os.replace(merged, os.path.join(self.directory, f'segment-{last_id:06d}'))
+
+    def _encode(self, value: str, values: List[str], index: Dict[str, int]) -> int:
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(values)
+            values.append(value)
+        return code
+
+    def append(self, products: Iterable[Product], query: str = '', timestamp: Optional[float] = None):
+        """Record one snapshot row per product; rows without an id are skipped"""
+        ts = int(timestamp if timestamp is not None else time.time())
+        with self._lock:
+            query_code = self._encode(query, self.queries, self._query_index)
+            for product in products:
+                if not product.id:
+                    continue
+                self._buffer.append((
+                    self._encode(product.id, self.items, self._item_index),
+                    query_code,
+                    ts,
+                    product.price or 0,
+                    product.original_price or 0,
+                    product.sold_quantity or 0,
+                    product.free_shipping
+                ))
+            should_flush = len(self._buffer) >= self.flush_rows
+
+        if should_flush:
+            self.flush()
+
+    def _write_segment(self, columns: Dict, name: str):
+        # Build under a temp name so readers never see a partial segment
+        tmp_path = self._temp_path(name, directory=True)
+        for field, _ in ROW_FIELDS:
+            np.save(os.path.join(tmp_path, f'{field}.npy'), columns[field])
+        os.replace(tmp_path, os.path.join(self.directory, name))
+
+    def _write_dictionary(self):
+        tmp_path = self._temp_path('dictionary.json')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'items': self.items, 'queries': self.queries}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._dictionary_path())
+
+    def flush(self):
+        """Write the dictionary, then buffered rows as a new segment"""
+        with self._lock:
+            if not self._buffer:
+                return
+            rows = np.array(self._buffer, dtype=ROW_FIELDS)
+            self._buffer = []
+
+            # Codes in the segment must already be on disk, or a restart would reassign them
+            self._write_dictionary()
+            segments = self._segments()
+            next_id = self._segment_id(segments[-1]) + 1 if segments else 0
+            self._write_segment({field: rows[field] for field, _ in ROW_FIELDS}, f'segment-{next_id:06d}')
+
+            self._columns = None
+
+    def compact(self):
+        """Merge all segments into one, keeping row order"""
+        self.flush()
+        with self._lock:
+            segments = self._segments()
+            if len(segments) < 2:
+                return
+            merged = self._load(segments)
+
+            # Complete under compact-N before any segment goes; _recover finishes the swap after a crash
+            last_id = self._segment_id(segments[-1])
+            self._write_segment(merged, f'compact-{last_id:06d}')
+            del merged
+            self._columns = None
+            self._swap_compacted(os.path.join(self.directory, f'compact-{last_id:06d}'))
+
+    def _load(self, segments: List[str]) -> Dict:
+        columns = {}
+        for field, dtype in ROW_FIELDS:
+            parts = [np.load(os.path.join(path, f'{field}.npy'), mmap_mode='r') for path in segments]
+            if not parts:
+                columns[field] = np.empty(0, dtype=dtype)
+            elif len(parts) == 1:
+                columns[field] = parts[0]
+            else:
+                columns[field] = np.concatenate(parts)
+        return columns
+
+    def columns(self) -> Dict:
+        """Every flushed row as contiguous column arrays (memory-mapped for one segment)"""
+        with self._lock:
+            if self._columns is None:
+                self._columns = self._load(self._segments())
+            return self._columns
+
+    def _mask(self, columns: Dict, since: Optional[float], until: Optional[float]):
+        mask = columns['price'] > 0
+        if since is not None:
+            mask &= columns['ts'] >= since
+        if until is not None:
+            mask &= columns['ts'] <= until
+        return mask
+
+    def _latest_rows(self, columns: Dict, mask):
+        """Row index of each item's latest observation within mask, -1 if none"""
+        rows = np.flatnonzero(mask)
+        item = columns['item'][rows]
+        ts = columns['ts'][rows]
+
+        last_ts = np.full(len(self.items), -1, dtype=np.int64)
+        np.maximum.at(last_ts, item, ts)
+        # Ties on the same second go to the row written last
+        at_last = ts == last_ts[item]
+        last_row = np.full(len(self.items), -1, dtype=np.int64)
+        np.maximum.at(last_row, item[at_last], rows[at_last])
+        return last_row
+
+    @staticmethod
+    def discounts(price, original_price):
+        """Percent off the original price, 0 when not on sale"""
+        price = price.astype(np.float64)
+        original = original_price.astype(np.float64)
+        on_sale = original > price
+        return np.where(on_sale, (original - price) / np.where(on_sale, original, 1) * 100, 0.0)
+
+    def lowest_prices(self, since: Optional[float] = None, until: Optional[float] = None) -> Dict[str, int]:
+        """Lowest observed price per item within a time window"""
+        columns = self.columns()
+        mask = self._mask(columns, since, until)
+
+        lowest = np.full(len(self.items), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(lowest, columns['item'][mask], columns['price'][mask])
+        seen = np.flatnonzero(lowest != np.iinfo(np.int64).max)
+        return {self.items[i]: int(lowest[i]) for i in seen}
+
+    def lowest_price_this_month(self, now: Optional[float] = None) -> Dict[str, int]:
+        now = now if now is not None else time.time()
+        start = time.localtime(now)
+        month_start = time.mktime((start.tm_year, start.tm_mon, 1, 0, 0, 0, 0, 0, -1))
+        return self.lowest_prices(since=month_start, until=now)
+
+    def price_drops(self, days: int, now: Optional[float] = None, min_drop: float = 0.0) -> Dict[str, Dict]:
+        """
+        Items whose latest price is below their price `days` ago
+        Compares each item's latest row with its last row at or before the cutoff
+        """
+        now = now if now is not None else time.time()
+        columns = self.columns()
+        latest = self._latest_rows(columns, self._mask(columns, None, now))
+        before = self._latest_rows(columns, self._mask(columns, None, now - days * DAY))
+
+        items = np.flatnonzero((latest >= 0) & (before >= 0))
+        new_price = columns['price'][latest[items]]
+        old_price = columns['price'][before[items]]
+        drop_pct = (old_price - new_price) / old_price * 100
+        keep = drop_pct > min_drop
+
+        return {
+            self.items[item]: {'from': int(old), 'to': int(new), 'drop_pct': round(float(pct), 1)}
+            for item, old, new, pct in zip(items[keep], old_price[keep], new_price[keep], drop_pct[keep])
+        }
+
+    def best_deals(self, since: Optional[float] = None, top: int = 1) -> Dict[str, List[Dict]]:
+        """Items with the highest current discount among those seen for each query"""
+        columns = self.columns()
+        mask = self._mask(columns, since, None)
+        latest = self._latest_rows(columns, mask)
+
+        has_latest = latest >= 0
+        current_price = np.zeros(len(self.items), dtype=np.int64)
+        current_original = np.zeros(len(self.items), dtype=np.int64)
+        current_price[has_latest] = columns['price'][latest[has_latest]]
+        current_original[has_latest] = columns['original_price'][latest[has_latest]]
+        discount = self.discounts(current_price, current_original)
+
+        deals: Dict[str, List[Dict]] = {}
+        item = columns['item'][mask]
+        query = columns['query'][mask]
+        for code in np.unique(query):
+            seen = np.zeros(len(self.items), dtype=bool)
+            seen[item[query == code]] = True
+            candidates = np.flatnonzero(seen & (discount > 0))
+            if not len(candidates):
+                continue
+
+            count = min(top, len(candidates))
+            picked = candidates[np.argpartition(-discount[candidates], count - 1)[:count]]
+            picked = picked[np.argsort(-discount[picked], kind='stable')]
+            deals[self.queries[code]] = [
+                {'item': self.items[i], 'price': int(current_price[i]),
+                 'original_price': int(current_original[i]), 'discount': round(float(discount[i]), 1)}
+                for i in picked
+            ]
+        return deals
+
+
+def main():
+    import sys
+    import tempfile
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    rng = np.random.default_rng(24)
+    now = time.time()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = PriceHistoryStore(directory)
+        store.items = [f'MLC{1000000 + i}' for i in range(50000)]
+        store.queries = [''] + [f'query {i}' for i in range(20)]
+
+        rows = np.empty(count, dtype=ROW_FIELDS)
+        rows['item'] = rng.integers(0, len(store.items), count)
+        rows['query'] = rng.integers(1, len(store.queries), count)
+        # Append-only, so rows arrive in time order
+        rows['ts'] = np.sort(now - rng.integers(0, 60 * DAY, count))
+        rows['price'] = rng.integers(2990, 899990, count)
+        rows['original_price'] = np.where(rng.random(count) < 0.3, rows['price'] + rng.integers(0, 50000, count), 0)
+        rows['sold_quantity'] = rng.integers(0, 5000, count)
+        rows['free_shipping'] = rng.random(count) < 0.5
+        store._write_dictionary()
+        store._write_segment({field: np.ascontiguousarray(rows[field]) for field, _ in ROW_FIELDS}, 'segment-000000')
+
+        store = PriceHistoryStore(directory)
+        print("="*70)
+        print(f"📈 PRICE HISTORY QUERIES ({count:,} rows)")
+        print("="*70)
+        for name, query in [
+            ('load (mmap)', store.columns),
+            ('lowest price this month', lambda: store.lowest_price_this_month(now)),
+            ('price drop vs 7 days ago', lambda: store.price_drops(7, now)),
+            ('best deal per query', lambda: store.best_deals()),
+        ]:
+            started = time.perf_counter()
+            result = query()
+            print(f"{name:<28}{(time.perf_counter() - started) * 1000:>10.1f} ms  ({len(result):,} results)")
+
+
+if __name__ == "__main__":
+    main()
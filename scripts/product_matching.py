@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Cross-marketplace entity resolution for Product records
+Titles are normalized into token sets, MinHash signatures are bucketed with
+LSH so only likely matches are compared, and matching listings are merged
+into canonical products that keep every store's offer
+
+Run directly for a benchmark against brute-force pairing:
+python scripts/product_matching.py [items] [brute_force_items]
+"""
+
+import re
+import time
+import zlib
+from dataclasses import dataclass, field
+from itertools import combinations
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Only needed when products are matched
+    np = None
+
+from products import Product, fold
+
+NUM_PERM = 64
+BANDS = 16            # 16 bands x 4 rows: pairs above ~0.5 Jaccard usually share a bucket
+MAX_BUCKET = 20       # generic titles fill huge buckets; only compare near neighbours there
+MATCH_THRESHOLD = 0.6
+# Candidates whose MinHash estimate falls this far below the threshold skip exact comparison
+ESTIMATE_SLACK = 0.1
+MAX_PRICE_RATIO = 2.0
+
+MERSENNE_PRIME = (1 << 31) - 1
+
+TOKEN_RE = re.compile(r'[a-z0-9]+(?:[.,][0-9]+[a-z]*)?')
+# '500 ml' -> '500ml', '1,5 l' -> '1.5l'
+UNIT_RE = re.compile(r'\b(\d+(?:[.,]\d+)?)\s*(ml|cc|lt|l|kg|gr|g|cm|mm|mt|m|pulgadas|w|mah|gb|tb)\b')
+
+STOPWORDS = frozenset("""
+a al con de del el en la las lo los para por sin un una y
+nuevo nueva original oferta envio gratis pack unidad unidades color
+""".split())
+
+
+def normalize_title(title: str) -> FrozenSet[str]:
+    """Accent-free lowercase tokens without filler words, units glued to their amounts"""
+    text = UNIT_RE.sub(lambda m: m.group(1).replace(',', '.') + m.group(2), fold(title))
+    return frozenset(token.replace(',', '.') for token in TOKEN_RE.findall(text) if token not in STOPWORDS)
+
+
+def numbers(tokens: FrozenSet[str]) -> FrozenSet[str]:
+    """Tokens carrying a digit: models, sizes, capacities"""
+    return frozenset(token for token in tokens if not token.isalpha())
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+@dataclass(slots=True)
+class CanonicalProduct:
+    """One real-world product and the offers every store lists for it"""
+    title: str
+    offers: List[Product] = field(default_factory=list)
+
+    @property
+    def stores(self) -> List[str]:
+        return sorted({offer.source for offer in self.offers})
+
+    @property
+    def best_offer(self) -> Optional[Product]:
+        priced = [offer for offer in self.offers if offer.price]
+        return min(priced, key=lambda offer: offer.price) if priced else None
+
+
+class ProductMatcher:
+    """
+    Groups listings of the same product across stores
+    Candidate pairs come from LSH buckets over MinHash signatures of the
+    normalized titles; a pair matches when its token Jaccard reaches
+    `threshold`, model/size numbers agree and prices are within
+    `max_price_ratio` of each other
+    """
+
+    def __init__(self, threshold: float = MATCH_THRESHOLD, num_perm: int = NUM_PERM,
+                 bands: int = BANDS, max_bucket: int = MAX_BUCKET,
+                 max_price_ratio: float = MAX_PRICE_RATIO, seed: int = 24):
+        if np is None:
+            raise ImportError("ProductMatcher requires numpy (pip install numpy)")
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_bucket = max_bucket
+        self.max_price_ratio = max_price_ratio
+
+        rng = np.random.default_rng(seed)
+        self.perm_a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.perm_b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.band_mix = rng.integers(1, 1 << 62, self.rows, dtype=np.uint64) | np.uint64(1)
+        self._token_hashes: Dict[str, int] = {}
+
+    def signatures(self, token_sets: List[FrozenSet[str]], chunk_tokens: int = 65536):
+        """MinHash signature matrix (items x num_perm), computed in token chunks"""
+        hashes = self._token_hashes
+        flat, owners = [], []
+        for i, tokens in enumerate(token_sets):
+            for token in tokens or ('',):
+                h = hashes.get(token)
+                if h is None:
+                    h = hashes[token] = zlib.crc32(token.encode())
+                flat.append(h)
+                owners.append(i)
+
+        flat = np.array(flat, dtype=np.uint64)
+        owners = np.array(owners, dtype=np.int64)
+        # Values are below 2**31, so uint32 halves the memory of every comparison
+        signatures = np.empty((len(token_sets), len(self.perm_a)), dtype=np.uint32)
+
+        # Items own contiguous token runs, so chunks split on item boundaries
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+        first = 0
+        while first < len(starts):
+            last = min(np.searchsorted(starts, starts[first] + chunk_tokens), len(starts))
+            last = max(last, first + 1)
+            lo = starts[first]
+            hi = starts[last] if last < len(starts) else len(flat)
+            permuted = (flat[lo:hi, None] * self.perm_a + self.perm_b) % np.uint64(MERSENNE_PRIME)
+            signatures[owners[starts[first:last]]] = np.minimum.reduceat(permuted, starts[first:last] - lo, axis=0)
+            first = last
+        return signatures
+
+    def candidate_pairs(self, signatures, min_similarity: float = 0.0) -> 'np.ndarray':
+        """
+        Unique (i, j) pairs, i < j, sharing at least one LSH bucket
+        Pairs whose signatures agree on fewer than `min_similarity` of the
+        positions (the MinHash Jaccard estimate) are dropped on the spot
+        """
+        count = len(signatures)
+        min_agree = int(np.ceil(min_similarity * signatures.shape[1]))
+        found = []
+        for band in range(self.bands):
+            rows = signatures[:, band * self.rows:(band + 1) * self.rows].astype(np.uint64)
+            keys = (rows * self.band_mix).sum(axis=1)  # wraps mod 2**64, which is fine for bucketing
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            # Pair each item with the next few in its bucket instead of enumerating whole buckets
+            for distance in range(1, self.max_bucket):
+                same = np.flatnonzero(sorted_keys[distance:] == sorted_keys[:-distance])
+                if not len(same):
+                    break
+                a, b = order[same], order[same + distance]
+                if min_agree:
+                    close = np.count_nonzero(signatures[a] == signatures[b], axis=1) >= min_agree
+                    a, b = a[close], b[close]
+                found.append(np.minimum(a, b) * count + np.maximum(a, b))
+
+        if not found:
+            return np.empty((0, 2), dtype=np.int64)
+        codes = np.unique(np.concatenate(found))
+        return np.stack([codes // count, codes % count], axis=1)
+
+    def verify(self, products: List[Product], token_sets: List[FrozenSet[str]],
+               pairs: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Pairs that really match: token Jaccard reaches the threshold,
+        model/size numbers agree and prices are close
+        """
+        number_sets = [numbers(tokens) for tokens in token_sets]
+        prices = [product.price for product in products]
+        threshold, max_ratio = self.threshold, self.max_price_ratio
+
+        matched = []
+        for i, j in pairs:
+            if jaccard(token_sets[i], token_sets[j]) < threshold:
+                continue
+            if number_sets[i] and number_sets[j] and number_sets[i] != number_sets[j]:
+                continue
+            price_i, price_j = prices[i], prices[j]
+            if price_i and price_j and max(price_i, price_j) > min(price_i, price_j) * max_ratio:
+                continue
+            matched.append((i, j))
+        return matched
+
+    def match(self, products: List[Product],
+              token_sets: Optional[List[FrozenSet[str]]] = None) -> List[Tuple[int, int]]:
+        """Index pairs of listings judged to be the same product"""
+        if token_sets is None:
+            token_sets = [normalize_title(product.title) for product in products]
+        if len(products) < 2:
+            return []
+        pairs = self.candidate_pairs(self.signatures(token_sets), self.threshold - ESTIMATE_SLACK)
+        return self.verify(products, token_sets, pairs.tolist())
+
+    def brute_force_match(self, products: List[Product]) -> List[Tuple[int, int]]:
+        """Every pair compared directly; the O(n²) reference for match()"""
+        token_sets = [normalize_title(product.title) for product in products]
+        return self.verify(products, token_sets, combinations(range(len(products)), 2))
+
+    def resolve(self, products: Iterable[Product]) -> List[CanonicalProduct]:
+        """Merge matching listings into canonical products, largest groups first"""
+        products = list(products)
+        token_sets = [normalize_title(product.title) for product in products]
+        parent = list(range(len(products)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in self.match(products, token_sets):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[root_j] = root_i
+
+        groups: Dict[int, List[int]] = {}
+        for i in range(len(products)):
+            groups.setdefault(find(i), []).append(i)
+
+        canonical = [
+            # The most descriptive title among the offers names the product
+            CanonicalProduct(title=products[max(members, key=lambda i: (len(token_sets[i]), products[i].title))].title,
+                             offers=[products[i] for i in members])
+            for members in groups.values()
+        ]
+        canonical.sort(key=lambda product: len(product.offers), reverse=True)
+        return canonical
+
+
+def synthetic_listings(count: int, seed: int = 24) -> List[Product]:
+    """Products listed 1-3 times across stores with the usual title drift"""
+    import random
+
+    rng = random.Random(seed)
+    brands = ['Samsung', 'LG', 'Sony', 'Philips', 'Oster', 'Weber', 'Mademsa', 'Fensa', 'Lenovo', 'HP', 'Xiaomi', 'Bosch']
+    kinds = ['Parrilla Carbón', 'Televisor Smart TV', 'Notebook', 'Refrigerador', 'Licuadora', 'Audífonos Bluetooth',
+             'Aspiradora', 'Cafetera', 'Microondas', 'Lavadora', 'Celular', 'Bicicleta Aro']
+    extras = ['Negro', 'Blanco', 'Acero Inoxidable', 'Inalámbrico', 'Portátil', 'Premium', 'Pro', 'Plus', 'Lite', 'Max']
+    drift = ['Original', 'Oficial', 'Garantía', 'Envío Gratis', 'Importado', '']
+
+    listings = []
+    while len(listings) < count:
+        brand, kind, model = rng.choice(brands), rng.choice(kinds), str(rng.randrange(100, 99999))
+        features = rng.sample(extras, 2)
+        size = f"{rng.choice([1, 2, 5, 20, 32, 55, 128, 500])} {rng.choice(['L', 'GB', 'W', 'Pulgadas'])}"
+        price = rng.randrange(9990, 1999990, 10)
+        for store in rng.sample(['mercadolibre', 'falabella', 'paris'], rng.randint(1, 3)):
+            # Each store words the same product a little differently
+            words = [brand, kind, f"Modelo {model}" if rng.random() < 0.3 else model, *features, size]
+            if rng.random() < 0.3:
+                words.remove(features[rng.randrange(2)])
+            rng.shuffle(words)
+            title = ' '.join(words + [rng.choice(drift)])
+            if rng.random() < 0.3:
+                title = title.upper()
+            listings.append(Product(id=f"{store}-{len(listings)}", title=title, source=store,
+                                    price=round(price * rng.uniform(0.9, 1.1))))
+    return listings[:count]
+
+
+def main():
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    brute_count = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    matcher = ProductMatcher()
+
+    sample = synthetic_listings(brute_count)
+    started = time.perf_counter()
+    reference = set(matcher.brute_force_match(sample))
+    brute_time = time.perf_counter() - started
+    started = time.perf_counter()
+    found = set(matcher.match(sample))
+    lsh_sample_time = time.perf_counter() - started
+
+    listings = synthetic_listings(count)
+    started = time.perf_counter()
+    canonical = matcher.resolve(listings)
+    lsh_time = time.perf_counter() - started
+
+    print("="*70)
+    print(f"🔗 PRODUCT MATCHING ({count:,} listings)")
+    print("="*70)
+    print(f"brute force, {brute_count:,} items  {brute_time * 1000:>10.0f} ms  "
+          f"(~{brute_time * (count / brute_count) ** 2:,.0f} s projected for {count:,})")
+    print(f"LSH, {brute_count:,} items          {lsh_sample_time * 1000:>10.0f} ms  "
+          f"recall {len(found & reference) / max(len(reference), 1):.1%} of {len(reference):,} matching pairs")
+    print(f"LSH + merge, {count:,} items   {lsh_time * 1000:>10.0f} ms  "
+          f"{len(canonical):,} canonical products, "
+          f"{sum(len(product.stores) > 1 for product in canonical):,} listed in several stores")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Compact product record shared by the MercadoLibre and Falabella clients
+Prices are kept as integer CLP; formatting only happens at display time
+"""
+
+import re
+import sys
+import unicodedata
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Tuple
+
+# First amount in display text, e.g. '$ 19.990' or '$19,990 CLP'
+PRICE_TEXT_RE = re.compile(r'\d[\d.,]*')
+NON_DIGITS_RE = re.compile(r'\D')
+
+
+def to_clp(value) -> Optional[int]:
+    """Integer CLP from a number, a price dict or display text like '$ 19.990'"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return round(value)
+    if isinstance(value, dict):
+        return to_clp(value.get('amount', value.get('value')))
+    if isinstance(value, (list, tuple)):
+        return to_clp(value[0]) if value else None
+    if isinstance(value, str):
+        # CLP has no decimals, so every separator is a thousands separator
+        match = PRICE_TEXT_RE.search(value)
+        return int(NON_DIGITS_RE.sub('', match.group())) if match else None
+    return None
+
+
+def intern(value: Optional[str]) -> Optional[str]:
+    """Share one copy of low-cardinality strings like seller or condition"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def fold(text: str) -> str:
+    """Lowercase ASCII form for matching: 'Año Niños' -> 'ano ninos'"""
+    # NFKD splits accents off their letters; the ASCII round trip drops them
+    return unicodedata.normalize('NFKD', text.lower()).encode('ascii', 'ignore').decode()
+
+
+def format_clp(amount: Optional[int]) -> str:
+    """Display form of a CLP amount"""
+    return f"${amount:,.0f} CLP" if amount else 'N/A'
+
+
+@dataclass(slots=True)
+class Product:
+    id: Optional[str]
+    title: str
+    price: Optional[int] = None
+    original_price: Optional[int] = None
+    currency: str = 'CLP'
+    condition: Optional[str] = None
+    seller: Optional[str] = None
+    brand: Optional[str] = None
+    thumbnail: Optional[str] = None
+    permalink: Optional[str] = None
+    free_shipping: bool = False
+    available_quantity: int = 0
+    sold_quantity: int = 0
+    tags: Tuple[str, ...] = ()
+    source: str = ''
+
+    @property
+    def discount(self) -> Optional[float]:
+        """Percent off the original price, or None when not on sale"""
+        if self.original_price and self.price and self.original_price > self.price:
+            return (self.original_price - self.price) / self.original_price * 100
+        return None
+
+    @classmethod
+    def from_mercadolibre(cls, item: Dict) -> 'Product':
+        """Build from a MercadoLibre search hit or item body"""
+        return cls(
+            id=item.get('id'),
+            title=item.get('title') or '',
+            price=to_clp(item.get('price')),
+            original_price=to_clp(item.get('original_price')),
+            currency=intern(item.get('currency_id') or 'CLP'),
+            condition=intern(item.get('condition')),
+            seller=intern((item.get('seller') or {}).get('nickname', 'Unknown')),
+            thumbnail=item.get('thumbnail'),
+            permalink=item.get('permalink'),
+            free_shipping=bool((item.get('shipping') or {}).get('free_shipping')),
+            available_quantity=item.get('available_quantity') or 0,
+            sold_quantity=item.get('sold_quantity') or 0,
+            tags=tuple(intern(tag) for tag in item.get('tags') or ()),
+            source='mercadolibre'
+        )
+
+    def to_dict(self) -> Dict:
+        """Plain dict with numeric prices, for JSON export"""
+        return asdict(self)
+
+    def display_fields(self) -> Dict[str, str]:
+        """Formatted, non-empty fields for printing"""
+        fields = {
+            'title': self.title,
+            'price': format_clp(self.price) if self.price else None,
+            'original_price': format_clp(self.original_price) if self.original_price else None,
+            'discount': f"{self.discount:.0f}% OFF" if self.discount else None,
+            'brand': self.brand,
+            'seller': self.seller,
+            'shipping': 'Envío gratis' if self.free_shipping else None,
+            'thumbnail': self.thumbnail,
+            'permalink': self.permalink,
+        }
+        return {key: value for key, value in fields.items() if value}
+
+
+def frontend_product(product: Product) -> Dict:
+    """MercadoLibreProduct shape from lib/types/mercadolibre.ts"""
+    return {
+        'id': product.id,
+        'title': product.title,
+        'price': str(product.price) if product.price is not None else '0',
+        'currency': product.currency,
+        'thumbnail': product.thumbnail or '',
+        'permalink': product.permalink or '',
+        'condition': product.condition,
+        'available_quantity': product.available_quantity,
+        'sold_quantity': product.sold_quantity,
+        'shipping_free': product.free_shipping,
+        'original_price': str(product.original_price) if product.original_price else None,
+        'discount_percentage': round(product.discount, 1) if product.discount else None,
+    }
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Per-host rate limiting shared by the marketplace clients
+Token bucket with bursts whose rate adapts AIMD-style to upstream feedback:
+it creeps up while requests succeed and halves on 429/503 or a timeout,
+honoring Retry-After. Safe to use from threads and from asyncio tasks.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectTimeout, ReadTimeout
+from requests.models import PreparedRequest, Response
+
+from metrics import TIMED_POOL_CLASSES, Exchange, Metrics, get_metrics, set_current_exchange
+from transport import POOL_HOSTS, SizedPoolManager, httpx
+
+# Starting (rate per second, burst) for the hosts we crawl
+HOST_LIMITS = {
+    'api.mercadolibre.com': (10.0, 20),
+    'listado.mercadolibre.cl': (2.0, 4),
+    'www.mercadolibre.cl': (2.0, 4),
+    'www.falabella.com': (1.0, 3),
+}
+DEFAULT_LIMIT = (2.0, 4)
+
+# Statuses that mean "slow down" rather than "broken request"
+THROTTLE_STATUSES = {429, 503}
+
+# Transport errors that mean the host is struggling: it didn't connect or
+# answer in time. Requests cancelled or closed on purpose (hedges, races)
+# and other failures leave the rate alone
+THROTTLE_ERRORS = (ConnectTimeout, ReadTimeout)
+if httpx is not None:
+    THROTTLE_ERRORS += (httpx.ConnectTimeout, httpx.ReadTimeout)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds, from either delta-seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """
+    Adaptive token bucket for a single host
+    Tokens may go negative: each caller reserves one and sleeps until the
+    bucket would have refilled to it, so waiting never holds the lock
+    """
+
+    def __init__(self, rate: float = 2.0, burst: int = 4, min_rate: float = 0.1,
+                 max_rate: Optional[float] = None, increase: float = 0.1,
+                 decrease: float = 0.5, backoff_base: float = 0.5, backoff_cap: float = 30.0,
+                 max_pause: float = 60.0):
+        self.rate = rate
+        self.capacity = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate * 4
+        self.increase = increase
+        self.decrease = decrease
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        # Longest a Retry-After may hold the host: a bogus one can't stall it for good
+        self.max_pause = max_pause
+
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            # `updated` may sit in the future while a Retry-After is pending
+            ready_at = self.updated + max(0.0, -self.tokens) / self.rate
+            return max(0.0, ready_at - now)
+
+    def acquire(self):
+        """Block the calling thread until a request may be sent"""
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait in the event loop until a request may be sent"""
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for a retry attempt"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def on_success(self):
+        """Additive increase after a healthy response"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: Optional[float] = None, attempt: int = 0):
+        """
+        Multiplicative decrease after a 429/503 or a timeout
+        Pauses the whole host for Retry-After (at most max_pause), or a
+        jittered backoff
+        """
+        pause = min(retry_after, self.max_pause) if retry_after is not None else self.backoff(attempt)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = max(self.updated, now + pause)
+            self.throttled += 1
+
+    def on_error(self, error: Exception, attempt: int = 0):
+        """Adapt to a failed send: only timeouts count as throttling"""
+        if isinstance(error, THROTTLE_ERRORS):
+            self.on_throttle(attempt=attempt)
+
+    def feedback(self, status_code: int, retry_after: Optional[float] = None, attempt: int = 0) -> bool:
+        """Adapt to a response; returns True when the request should be retried"""
+        if status_code in THROTTLE_STATUSES:
+            self.on_throttle(retry_after, attempt)
+            return True
+        if status_code < 500:
+            self.on_success()
+        return False
+
+
+class RateLimiterRegistry:
+    """One RateLimiter per host, created on first use"""
+
+    def __init__(self, limits: Optional[Dict[str, tuple]] = None):
+        self.limits = {**HOST_LIMITS, **(limits or {})}
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_host(self, host: str) -> RateLimiter:
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                rate, burst = self.limits.get(host, DEFAULT_LIMIT)
+                limiter = self._limiters[host] = RateLimiter(rate, burst)
+            return limiter
+
+    def for_url(self, url: str) -> RateLimiter:
+        return self.for_host(urlsplit(url).hostname or '')
+
+    def stats(self) -> Dict[str, Dict]:
+        """Current adapted rate and throttle count per host"""
+        with self._lock:
+            return {
+                host: {'rate': round(limiter.rate, 2), 'throttled': limiter.throttled}
+                for host, limiter in self._limiters.items()
+            }
+
+
+_shared_limiters: Optional[RateLimiterRegistry] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_limiters() -> RateLimiterRegistry:
+    """Process-wide registry, so every client hitting a host shares its budget"""
+    global _shared_limiters
+    with _shared_lock:
+        if _shared_limiters is None:
+            _shared_limiters = RateLimiterRegistry()
+        return _shared_limiters
+
+
+class ThrottledAdapter(HTTPAdapter):
+    """
+    Transport adapter that paces requests per host and retries 429/503
+    Every network send is timed phase by phase into the shared metrics,
+    and each host gets a connection pool sized by transport.POOL_SIZES
+    """
+
+    def __init__(self, limiters: Optional[RateLimiterRegistry] = None, max_retries_throttled: int = 3,
+                 metrics: Optional[Metrics] = None, **kwargs):
+        self.metrics = metrics or get_metrics()
+        kwargs.setdefault('pool_connections', POOL_HOSTS)
+        super().__init__(**kwargs)
+        self.limiters = limiters or get_shared_limiters()
+        self.max_retries_throttled = max_retries_throttled
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        # Same bookkeeping as HTTPAdapter.init_poolmanager, with per-host pool sizes
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = SizedPoolManager(num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs)
+        if self.metrics.enabled:
+            self.poolmanager.pool_classes_by_scheme = TIMED_POOL_CLASSES
+
+    def send_timed(self, request: PreparedRequest, **kwargs) -> Response:
+        """One network send, recording its phases, status and size"""
+        if not self.metrics.enabled:
+            return super().send(request, **kwargs)
+
+        exchange = Exchange(self.metrics, request.url, request.method)
+        set_current_exchange(exchange)
+        try:
+            response = super().send(request, **kwargs)
+            exchange.headers_received()
+            if not kwargs.get('stream'):
+                # Session.send would read it right after; reading here times the download
+                nbytes, downloaded = len(response.content or b''), True
+            else:
+                nbytes, downloaded = int(response.headers.get('Content-Length') or 0), False
+        except Exception:
+            exchange.finish('error', downloaded=False)
+            raise
+        finally:
+            set_current_exchange(None)
+
+        exchange.finish(response.status_code, nbytes, downloaded)
+        return response
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        limiter = self.limiters.for_url(request.url)
+
+        for attempt in range(self.max_retries_throttled + 1):
+            limiter.acquire()
+            try:
+                response = self.send_timed(request, **kwargs)
+            except Exception as e:
+                limiter.on_error(e, attempt)
+                raise
+
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if not limiter.feedback(response.status_code, retry_after, attempt):
+                return response
+            if attempt == self.max_retries_throttled:
+                return response
+
+            # The limiter now holds the host back; the next acquire() waits it out
+            self.metrics.inc('http_retries_total', host=urlsplit(request.url).hostname or '', reason='throttle')
+            response.close()
+
+        return response
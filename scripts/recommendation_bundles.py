@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Precomputed holiday recommendation bundles for the Next.js frontend
+Materializes get_holiday_recommendations for every holiday as static JSON,
+pre-compressed with gzip (and brotli when installed), under a
+content-addressed version directory plus a manifest.json pointing at it.
+Each version is written to a scratch directory and renamed into place
+before the manifest flips, so readers never see a half-written bundle
+
+Usage: python scripts/recommendation_bundles.py [--output DIR] [holiday ...]
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from mercadolibre_api_test import HOLIDAY_QUERIES, AsyncMercadoLibreAPI, MercadoLibreAPI, httpx
+from products import frontend_product
+
+try:
+    import brotli
+except ImportError:  # .br files are skipped without it
+    brotli = None
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Served by Next.js as /static/recommendations/...
+BUNDLES_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), 'public', 'static', 'recommendations')
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Older versions kept for readers still holding a previous manifest
+KEEP_VERSIONS = 3
+# Scratch directories of a live writer older than this are assumed abandoned
+SCRATCH_MAX_AGE = 3600
+
+
+def pid_alive(pid: int) -> bool:
+    if os.name != 'posix':  # No signal 0 elsewhere: only the age check applies
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Someone else's process, but alive
+        pass
+    return True
+
+
+def bundle_body(recommendations: Dict) -> bytes:
+    """
+    Deterministic JSON for one holiday: products deduplicated in query
+    order, and the ids each query contributed
+    """
+    products: Dict[str, Dict] = {}
+    queries = {}
+    for query, hits in recommendations['categories'].items():
+        queries[query] = [product.id for product in hits]
+        for product in hits:
+            products.setdefault(product.id, frontend_product(product))
+
+    bundle = {'holiday': recommendations['holiday'], 'queries': queries, 'products': list(products.values())}
+    return json.dumps(bundle, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def encodings(body: bytes) -> Dict[str, bytes]:
+    """File suffix -> body; mtime=0 keeps the gzip bytes reproducible"""
+    encoded = {'': body, '.gz': gzip.compress(body, 9, mtime=0)}
+    if brotli is not None:
+        encoded['.br'] = brotli.compress(body, quality=11)
+    return encoded
+
+
+class BundleWriter:
+    """Versioned bundle directory with an atomically replaced manifest"""
+
+    def __init__(self, directory: str = BUNDLES_DIR, keep: int = KEEP_VERSIONS):
+        self.directory = directory
+        self.keep = keep
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def load_manifest(self) -> Optional[Dict]:
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def published(self) -> List[str]:
+        """Holidays in the current manifest"""
+        return list((self.load_manifest() or {}).get('bundles', {}))
+
+    def previous_body(self, holiday: str) -> Optional[bytes]:
+        """The currently published bundle for a holiday, if any"""
+        manifest = self.load_manifest()
+        entry = (manifest or {}).get('bundles', {}).get(holiday)
+        if not entry:
+            return None
+        try:
+            with open(os.path.join(self.directory, entry['path']), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def write(self, bodies: Dict[str, bytes]) -> Dict:
+        """Publish one bundle per holiday and return the new manifest"""
+        digest = hashlib.sha256()
+        for holiday in sorted(bodies):
+            digest.update(holiday.encode('utf-8') + b'\0' + bodies[holiday] + b'\0')
+        version = digest.hexdigest()[:12]
+
+        os.makedirs(self.directory, exist_ok=True)
+        version_dir = os.path.join(self.directory, version)
+        if not os.path.isdir(version_dir):
+            # Same content means same version: an unchanged refresh writes nothing new
+            scratch = os.path.join(self.directory, f".tmp-{version}-{os.getpid()}")
+            shutil.rmtree(scratch, ignore_errors=True)
+            os.makedirs(scratch)
+            for holiday, body in bodies.items():
+                for suffix, data in encodings(body).items():
+                    with open(os.path.join(scratch, f"{holiday}.json{suffix}"), 'wb') as f:
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+            try:
+                os.replace(scratch, version_dir)
+            except OSError:
+                # A concurrent run published the same version first
+                if not os.path.isdir(version_dir):
+                    raise
+                shutil.rmtree(scratch, ignore_errors=True)
+
+        bundles = {}
+        for holiday, body in sorted(bodies.items()):
+            entry = {
+                'path': f"{version}/{holiday}.json",
+                'sha256': hashlib.sha256(body).hexdigest(),
+                'products': len(json.loads(body)['products']),
+            }
+            for suffix, name in (('', 'bytes'), ('.gz', 'gzip_bytes'), ('.br', 'br_bytes')):
+                path = os.path.join(version_dir, f"{holiday}.json{suffix}")
+                if os.path.exists(path):
+                    entry[name] = os.path.getsize(path)
+            bundles[holiday] = entry
+
+        manifest = {
+            'manifest_version': MANIFEST_VERSION,
+            'version': version,
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'bundles': bundles,
+        }
+        # Unique per writer, so concurrent runs never share a temp file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{MANIFEST_NAME}.")
+        # mkstemp creates it 0600; the web server must be able to read it
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+        self.prune(version)
+        return manifest
+
+    def prune(self, current: str):
+        """
+        Drop all but the `keep` newest versions and abandoned scratch directories
+        A scratch directory is abandoned once its writer's pid is gone or it
+        is older than SCRATCH_MAX_AGE; a concurrent run's is left alone
+        """
+        versions = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isdir(path):
+                continue
+            if name.startswith('.tmp-'):
+                if self.abandoned(name, path):
+                    shutil.rmtree(path, ignore_errors=True)
+            elif name != current:
+                versions.append((os.path.getmtime(path), path))
+
+        for _, path in sorted(versions, reverse=True)[max(0, self.keep - 1):]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def abandoned(name: str, path: str) -> bool:
+        """Whether a `.tmp-<version>-<pid>` scratch directory's writer is done with it"""
+        try:
+            if time.time() - os.path.getmtime(path) > SCRATCH_MAX_AGE:
+                return True
+            pid = int(name.rsplit('-', 1)[1])
+        except (OSError, IndexError, ValueError):
+            return True
+        return pid != os.getpid() and not pid_alive(pid)
+
+
+def fetch_recommendations(holidays: List[str]) -> Dict[str, Dict]:
+    """Every holiday's recommendations, concurrently when httpx is installed"""
+    if httpx is not None:
+        async def refresh():
+            async with AsyncMercadoLibreAPI() as api:
+                return await api.get_all_holiday_recommendations(holidays)
+        return asyncio.run(refresh())
+
+    api = MercadoLibreAPI()
+    return {holiday: api.get_holiday_recommendations(holiday) for holiday in holidays}
+
+
+def build_bundles(writer: BundleWriter, recommendations: Dict[str, Dict]) -> Dict:
+    """
+    Bundle bodies for every holiday, then publish them
+    A holiday that came back empty keeps its published bundle rather than
+    replacing it with nothing, and published holidays that weren't fetched
+    this run are carried over unchanged, so a partial refresh never drops
+    them from the manifest (or lets prune() delete their files)
+    """
+    bodies = {}
+    for holiday in writer.published():
+        if holiday not in recommendations:
+            previous = writer.previous_body(holiday)
+            if previous is not None:
+                bodies[holiday] = previous
+    for holiday, recs in recommendations.items():
+        if not recs['categories']:
+            previous = writer.previous_body(holiday)
+            if previous is not None:
+                print(f"⚠️ No products for {holiday}, keeping the published bundle")
+                bodies[holiday] = previous
+                continue
+        bodies[holiday] = bundle_body(recs)
+    return writer.write(bodies)
+
+
+def main():
+    args = sys.argv[1:]
+    directory = BUNDLES_DIR
+    if '--output' in args:
+        index = args.index('--output')
+        directory = args[index + 1]
+        del args[index:index + 2]
+    holidays = args or list(HOLIDAY_QUERIES)
+
+    writer = BundleWriter(directory)
+    started = time.perf_counter()
+    manifest = build_bundles(writer, fetch_recommendations(holidays))
+    elapsed = time.perf_counter() - started
+
+    print("="*70)
+    print(f"📦 RECOMMENDATION BUNDLES (version {manifest['version']}, {elapsed:.1f}s)")
+    print("="*70)
+    for holiday, entry in manifest['bundles'].items():
+        sizes = ', '.join(f"{name.split('_')[0]} {entry[name]:,}B"
+                          for name in ('bytes', 'gzip_bytes', 'br_bytes') if name in entry)
+        print(f"  • {holiday:<16}{entry['products']:>4} products  {sizes}")
+    print(f"\n💾 Manifest: {writer.manifest_path}")
+    if brotli is None:
+        print("ℹ️ brotli not installed: only gzip variants written (pip install brotli)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Local BM25 search over every product the crawlers have fetched
+Serves /api/v1/marketplace/search-style answers from an in-memory inverted
+index with accent folding and price / free-shipping filters. The crawl
+scheduler feeds the persisted index as pages arrive; MercadoLibre is only
+asked when the index can't answer a query, and its answer is indexed too
+
+Run directly for a latency benchmark: python scripts/search_index.py [products]
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from http_cache import default_cache_dir
+from products import Product, fold, frontend_product
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Standard BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Renumber documents once removed ones outnumber live ones (past this many slots)
+COMPACT_MIN_DOCS = 1024
+
+# Share of a query's terms a product must contain to count as an answer;
+# with fewer such products LocalSearch asks upstream
+MIN_COVERAGE = 0.6
+
+
+def tokenize(text: str) -> List[str]:
+    """Accent-folded tokens, so 'año' matches 'ano' and 'niños' matches 'ninos'"""
+    return TOKEN_RE.findall(fold(text))
+
+
+class ProductIndex:
+    """
+    Incremental BM25 inverted index over Product records
+    Re-adding a product id replaces the old document, so crawl results can
+    be fed in as they arrive; postings of removed documents are dropped
+    right away, keeping every query proportional to its matches, and their
+    slots are reclaimed once they outnumber the live documents
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path or os.path.join(default_cache_dir(), 'product_index.json')
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.RLock()
+        self.products: List[Optional[Product]] = []
+        self.doc_ids: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths: List[int] = []
+        self.total_length = 0
+        self.live = 0
+
+    def __len__(self) -> int:
+        return self.live
+
+    def text_of(self, product: Product) -> str:
+        return f"{product.title} {product.brand or ''}"
+
+    def add(self, products: Iterable[Product]) -> int:
+        """Index or re-index products by id; returns how many were added"""
+        added = 0
+        with self._lock:
+            for product in products:
+                if not product.id or not product.title:
+                    continue
+                if product.id in self.doc_ids:
+                    self._remove_doc(self.doc_ids[product.id])
+
+                doc = len(self.products)
+                terms = Counter(tokenize(self.text_of(product)))
+                for term, tf in terms.items():
+                    self.postings.setdefault(term, {})[doc] = tf
+                length = sum(terms.values())
+
+                self.products.append(product)
+                self.doc_lengths.append(length)
+                self.doc_ids[product.id] = doc
+                self.total_length += length
+                self.live += 1
+                added += 1
+            self._maybe_compact()
+        return added
+
+    def remove(self, product_id: str) -> bool:
+        with self._lock:
+            doc = self.doc_ids.pop(product_id, None)
+            if doc is None:
+                return False
+            self._remove_doc(doc)
+            self._maybe_compact()
+            return True
+
+    def _remove_doc(self, doc: int):
+        product = self.products[doc]
+        for term in set(tokenize(self.text_of(product))):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc, None)
+                if not postings:
+                    del self.postings[term]
+        self.products[doc] = None
+        self.total_length -= self.doc_lengths[doc]
+        self.live -= 1
+
+    def _maybe_compact(self):
+        """Drop removed slots and renumber live documents, keeping their order"""
+        slots = len(self.products)
+        if slots < COMPACT_MIN_DOCS or self.live * 2 > slots:
+            return
+
+        renumber: Dict[int, int] = {}
+        products, lengths = [], []
+        for doc, product in enumerate(self.products):
+            if product is not None:
+                renumber[doc] = len(products)
+                products.append(product)
+                lengths.append(self.doc_lengths[doc])
+
+        self.products, self.doc_lengths = products, lengths
+        self.doc_ids = {product_id: renumber[doc] for product_id, doc in self.doc_ids.items()}
+        self.postings = {
+            term: {renumber[doc]: tf for doc, tf in postings.items()}
+            for term, postings in self.postings.items()
+        }
+
+    def matches(self, product: Product, min_price: Optional[int], max_price: Optional[int],
+                free_shipping: Optional[bool]) -> bool:
+        if min_price is not None and (product.price or 0) < min_price:
+            return False
+        if max_price is not None and (not product.price or product.price > max_price):
+            return False
+        if free_shipping is not None and product.free_shipping != free_shipping:
+            return False
+        return True
+
+    def search(self, query: str, limit: int = 10, offset: int = 0,
+               min_price: Optional[int] = None, max_price: Optional[int] = None,
+               free_shipping: Optional[bool] = None,
+               min_coverage: float = 0.0) -> Tuple[List[Tuple[Product, float]], int]:
+        """
+        Best (product, score) pairs for the page, and the total number of matches
+        Any query term makes a match unless `min_coverage` asks for at least
+        that share of the terms
+        """
+        terms = set(tokenize(query))
+        # Every scored document has at least one term, so only more needs counting
+        need = math.ceil(min_coverage * len(terms) - 1e-9)
+        with self._lock:
+            if not terms or not self.live:
+                return [], 0
+
+            avg_length = self.total_length / self.live
+            k1, b = self.k1, self.b
+            lengths = self.doc_lengths
+            scores: Dict[int, float] = {}
+            matched: Dict[int, int] = {}
+
+            # Rarest terms first, so their postings seed the accumulator
+            for term in sorted(terms, key=lambda t: len(self.postings.get(t, ()))):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (self.live - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, tf in postings.items():
+                    norm = k1 * (1 - b + b * lengths[doc] / avg_length)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+                    if need > 1:
+                        matched[doc] = matched.get(doc, 0) + 1
+
+            if need > 1:
+                scores = {doc: score for doc, score in scores.items() if matched[doc] >= need}
+
+            filtering = min_price is not None or max_price is not None or free_shipping is not None
+            if filtering:
+                products = self.products
+                scores = {
+                    doc: score for doc, score in scores.items()
+                    if self.matches(products[doc], min_price, max_price, free_shipping)
+                }
+
+            best = heapq.nlargest(offset + limit, scores.items(), key=lambda item: item[1])[offset:]
+            return [(self.products[doc], score) for doc, score in best], len(scores)
+
+    def save(self):
+        """Persist the indexed products atomically; postings are rebuilt on load"""
+        with self._lock:
+            products = [product.to_dict() for product in self.products if product is not None]
+        try:
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            # Unique per writer: the scheduler and a LocalSearch may save at once
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.product_index.')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(products, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not persist product index: {e}")
+
+    def load(self) -> int:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                products = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        return self.add(Product(**{**item, 'tags': tuple(item.get('tags') or ())}) for item in products)
+
+
+class LocalSearch:
+    """
+    Marketplace search served from a ProductIndex
+    Without an index, the persisted one is loaded. Upstream MercadoLibre is
+    only queried when fewer than `min_results` products contain at least
+    `min_coverage` of the query's terms; whatever it returns is indexed and
+    saved for next time, and the answer then ranks partial matches too.
+    `source` tells whether the last answer came from the index or upstream
+    """
+
+    def __init__(self, index: Optional[ProductIndex] = None, api=None, min_results: int = 1,
+                 min_coverage: float = MIN_COVERAGE):
+        if index is None:
+            index = ProductIndex()
+            index.load()
+        self.index = index
+        self.api = api
+        self.min_results = min_results
+        self.min_coverage = min_coverage
+        self.hits = 0
+        self.fallbacks = 0
+        self.source = 'index'
+
+    def search(self, q: str, limit: int = 10, offset: int = 0, min_price: Optional[int] = None,
+               max_price: Optional[int] = None, free_shipping: Optional[bool] = None) -> Dict:
+        """Same shape as the backend's ProductSearchResponse (lib/types/mercadolibre.ts)"""
+        filters = (min_price, max_price, free_shipping)
+        results, total = self.index.search(q, limit, offset, *filters, min_coverage=self.min_coverage)
+        self.source = 'index'
+
+        if total >= self.min_results:
+            self.hits += 1
+        else:
+            if self.api is not None:
+                self.fallbacks += 1
+                # Enough upstream hits to fill the requested page, across as many search pages as that takes
+                if self.index.add(self.api.iter_search(q, max_items=max(limit + offset, 50))):
+                    self.index.save()
+                    self.source = 'upstream'
+            # Upstream's own matching is looser than full coverage: rank any match
+            results, total = self.index.search(q, limit, offset, *filters)
+
+        return {
+            'query': q,
+            'total_results': total,
+            'products': [frontend_product(product) for product, _ in results],
+            'paging': {'offset': offset, 'limit': limit, 'total': total}
+        }
+
+
+def main():
+    import sys
+
+    from product_matching import synthetic_listings
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    products = synthetic_listings(count)
+    for i, product in enumerate(products):
+        product.free_shipping = i % 2 == 0
+
+    index = ProductIndex(path=os.devnull)
+    started = time.perf_counter()
+    index.add(products)
+    build = time.perf_counter() - started
+
+    queries = [
+        ('parrilla carbon', {}),
+        ('PARRILLA CARBÓN', {}),
+        ('televisor smart tv 55 pulgadas', {}),
+        ('audifonos bluetooth', {'max_price': 50000}),
+        ('notebook lenovo', {'free_shipping': True}),
+        ('bicicleta aro', {'min_price': 100000, 'max_price': 300000}),
+    ]
+
+    print("="*70)
+    print(f"🔎 LOCAL PRODUCT SEARCH ({len(index):,} products, built in {build:.2f}s)")
+    print("="*70)
+    for query, filters in queries:
+        runs = 20
+        started = time.perf_counter()
+        for _ in range(runs):
+            results, total = index.search(query, **filters)
+        elapsed = (time.perf_counter() - started) / runs
+        label = f"{query} {filters or ''}".strip()
+        print(f"{label:<52}{elapsed * 1000:>8.2f} ms  {total:>7,} matches")
+
+    started = time.perf_counter()
+    index.add(synthetic_listings(1000, seed=7))
+    print(f"\nIncremental add of 1,000 products: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Local stub of the MercadoLibre and Falabella endpoints the clients use
+Replays recorded responses from scripts/fixtures/ (synthetic ones when
+nothing is recorded), with optional latency and error injection, so
+clients can be benchmarked and exercised without the internet
+
+Requests are routed by the original host as the first path segment:
+http://127.0.0.1:<port>/api.mercadolibre.com/sites/MLC/search?q=...
+redirect_session() rewrites a requests session's URLs that way
+
+Fixtures are recorded from the real sites with --record, which fetches
+each fixture once through the clients' own sessions and exits
+
+Usage: python scripts/stub_server.py [--latency 0.05] [--error-rate 0.1]
+       python scripts/stub_server.py --record [--query parrilla]
+"""
+
+import glob
+import json
+import os
+import random
+import re
+import ssl
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+from requests import Session
+from requests.adapters import BaseAdapter
+
+from bench_extract_state import synthetic_listado
+from bench_html_parsers import synthetic_listing
+from bench_product_memory import synthetic_hits
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(SCRIPTS_DIR, 'fixtures')
+
+# Recorded fixture files, relative to FIXTURES_DIR
+FIXTURE_FILES = {
+    'ml_search': 'mercadolibre/search.json',
+    'ml_categories': 'mercadolibre/categories.json',
+    'ml_highlights': 'mercadolibre/highlights.json',
+    'ml_listado': 'mercadolibre/*.html',
+    'falabella_listing': 'falabella/*.html',
+    'falabella_search': 'falabella/search.json',
+}
+
+# What --record asks the real sites for
+RECORD_QUERY = 'parrilla'
+# Search pages (of 50) merged into the recorded search fixture
+RECORD_SEARCH_PAGES = 4
+
+ML_ITEM_ID_RE = re.compile(r'^MLC\d+$')
+
+# Small reference endpoints test_direct_api reads
+SITE_INFO = {
+    '/sites/MLC': {'id': 'MLC', 'name': 'Chile', 'country_id': 'CL', 'default_currency_id': 'CLP'},
+    '/currencies/CLP': {'id': 'CLP', 'symbol': '$', 'description': 'Peso Chileno', 'decimal_places': 0},
+    '/sites/MLC/listing_types': [{'site_id': 'MLC', 'id': 'gold_pro', 'name': 'Premium'},
+                                 {'site_id': 'MLC', 'id': 'gold_special', 'name': 'Clásica'}],
+}
+
+
+def synthetic_ml_search(count: int = 1000) -> Dict:
+    """A /sites/MLC/search answer holding `count` results (served a page at a time)"""
+    return {
+        'site_id': 'MLC',
+        'paging': {'total': count, 'offset': 0, 'limit': 50, 'primary_results': count},
+        'results': synthetic_hits(count),
+        'available_filters': [
+            {'id': 'shipping_cost', 'name': 'Costo de envío', 'type': 'text',
+             'values': [{'id': 'free', 'name': 'Gratis', 'results': count // 2}]},
+            {'id': 'condition', 'name': 'Condición', 'type': 'text',
+             'values': [{'id': 'new', 'name': 'Nuevo'}, {'id': 'used', 'name': 'Usado'}]},
+            {'id': 'price', 'name': 'Precio', 'type': 'range',
+             'values': [{'id': '*-20000.0', 'name': 'Hasta $20.000'}, {'id': '20000.0-*', 'name': 'Más de $20.000'}]},
+        ]
+    }
+
+
+def synthetic_ml_categories() -> list:
+    names = ['Accesorios para Vehículos', 'Alimentos y Bebidas', 'Animales y Mascotas', 'Antigüedades',
+             'Arte y Artesanías', 'Bebés', 'Belleza y Cuidado Personal', 'Celulares y Telefonía',
+             'Computación', 'Deportes y Fitness', 'Electrodomésticos', 'Hogar y Muebles', 'Juegos y Juguetes']
+    return [{'id': f'MLC{1000 + i}', 'name': name} for i, name in enumerate(names)]
+
+
+def synthetic_ml_category_tree(top_level: list, fanout: int = 6, depth: int = 3) -> Dict[str, Dict]:
+    """/categories/{id} answers for a tree under the top-level categories; every parent has an 'Otros'"""
+    tree = {}
+
+    def add(category: Dict, path: list, level: int):
+        path = path + [{'id': category['id'], 'name': category['name']}]
+        children = []
+        if level < depth:
+            for i in range(fanout):
+                name = 'Otros' if i == fanout - 1 else f"{category['name'].split(' · ')[0]} · {level + 1}.{i}"
+                children.append({'id': f"{category['id']}{i}", 'name': name, 'total_items_in_this_category': 100 * (i + 1)})
+        tree[category['id']] = {
+            'id': category['id'],
+            'name': category['name'],
+            'path_from_root': path,
+            'children_categories': children,
+            'total_items_in_this_category': sum(c['total_items_in_this_category'] for c in children) or 100,
+        }
+        for child in children:
+            add(child, path, level + 1)
+
+    for category in top_level:
+        add(category, [], 0)
+    return tree
+
+
+def synthetic_ml_highlights() -> Dict:
+    return {'query_data': {'highlight_type': 'BEST_SELLER'},
+            'content': [{'id': f'MLC{1000000000 + i}', 'position': i + 1, 'type': 'ITEM'} for i in range(20)]}
+
+
+def synthetic_falabella_search(count: int = 48) -> Dict:
+    return {'data': {'results': [{
+        'productId': str(880000 + i),
+        'displayName': f'Parrilla a carbón modelo {i}',
+        'brand': f'Marca {i % 7}',
+        'price': 19990 + i * 1000,
+        'listPrice': 29990 + i * 1000,
+        'imageUrl': f'https://media.falabella.com/{880000 + i}.jpg',
+        'url': f'https://www.falabella.com/falabella-cl/product/{880000 + i}',
+    } for i in range(count)]}}
+
+
+def load_fixture(name: str) -> Optional[bytes]:
+    """Recorded fixture bytes, or None; globs pick the first file in name order"""
+    paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, FIXTURE_FILES[name])))
+    if not paths:
+        return None
+    with open(paths[0], 'rb') as f:
+        return f.read()
+
+
+def save_fixture(path: str, body: bytes):
+    """Write one recorded fixture, relative to FIXTURES_DIR"""
+    path = os.path.join(FIXTURES_DIR, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(body)
+
+
+def record_fixtures(query: str = RECORD_QUERY) -> Dict[str, Optional[int]]:
+    """
+    Fetch the fixture set from the real sites into FIXTURES_DIR
+    Requests go through the clients' own sessions, so headers (and the
+    MercadoLibre token when one is configured) are what the clients send.
+    A fixture that fails is skipped and keeps its synthetic stand-in;
+    returns {path: bytes written, or None when skipped}
+    """
+    from falabella_api_test import FalabellaAPI
+    from mercadolibre_api_test import MercadoLibreAPI
+    from mercadolibre_public_test import SEARCH_SOURCES, MercadoLibrePublicAPI
+    from test_falabella_scraper import FalabellaScraper
+
+    ml = MercadoLibreAPI()
+    public = MercadoLibrePublicAPI()
+    scraper = FalabellaScraper()
+    falabella = FalabellaAPI()
+    ml_api = f"{ml.base_url}/sites/{ml.site_id}"
+
+    def search() -> bytes:
+        # Several pages merged into one answer, as the stub serves it a page at a time
+        answer, results = None, []
+        for offset in range(0, RECORD_SEARCH_PAGES * 50, 50):
+            response = ml.session.get(f"{ml_api}/search", params={'q': query, 'limit': 50, 'offset': offset},
+                                      timeout=10)
+            response.raise_for_status()
+            page = response.json()
+            answer = answer or page
+            results.extend(page.get('results', []))
+            if len(page.get('results', [])) < 50:
+                break
+        answer['results'] = results
+        answer['paging'] = {**answer.get('paging', {}), 'total': len(results), 'offset': 0}
+        return json.dumps(answer, ensure_ascii=False).encode('utf-8')
+
+    def get(session, url: str, params: Optional[Dict] = None) -> bytes:
+        response = session.get(url, params=params, timeout=10)
+        response.raise_for_status()
+        return response.content
+
+    def highlights() -> bytes:
+        categories = json.loads(get(ml.session, f"{ml_api}/categories"))
+        return get(ml.session, f"{ml.base_url}/highlights/{ml.site_id}/category/{categories[0]['id']}")
+
+    recordings = {
+        FIXTURE_FILES['ml_search']: search,
+        FIXTURE_FILES['ml_categories']: lambda: get(ml.session, f"{ml_api}/categories"),
+        FIXTURE_FILES['ml_highlights']: highlights,
+        f"mercadolibre/listado-{query}.html": lambda: get(public.session, SEARCH_SOURCES['listado'].format(query=query)),
+        f"falabella/search-{query}.html": lambda: get(scraper.session, f"{scraper.base_url}/search", {'Ntt': query}),
+        FIXTURE_FILES['falabella_search']: lambda: get(
+            falabella.session, f"{falabella.base_url}{falabella.api_endpoint}",
+            falabella.build_param_sets(query, 1, 48)[0]
+        ),
+    }
+
+    written = {}
+    for path, fetch in recordings.items():
+        try:
+            body = fetch()
+        except Exception as e:
+            print(f"⚠️ {path}: {e}")
+            written[path] = None
+            continue
+        save_fixture(path, body)
+        written[path] = len(body)
+        print(f"✅ {path} ({len(body):,} bytes)")
+    return written
+
+
+def select_attributes(data: Dict, attributes: Optional[str]) -> Dict:
+    """Top-level keys named in an `attributes=` param, as the API projects answers"""
+    if not attributes:
+        return data
+    return {key: data[key] for key in attributes.split(',') if key in data}
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Concurrent clients open many connections at once; the default backlog
+    # of 5 drops SYNs and stalls them for a 1 s retransmit
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Clients that cancel a request (hedges, races) just hang up
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    """
+    Threaded HTTP server answering like the upstream sites
+    `latency` (+ uniform `jitter`) delays every answer; `error_rate` turns
+    answers into 500s and `throttle_rate` into 429s with Retry-After.
+    With a certfile/keyfile it speaks HTTPS, so handshakes cost what they do
+    upstream
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after: float = 0.05, seed: int = 24,
+                 certfile: Optional[str] = None, keyfile: Optional[str] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self.connections = 0
+        self.certfile = certfile
+        self.keyfile = keyfile
+
+        self.ml_search = json.loads(load_fixture('ml_search') or 'null') or synthetic_ml_search()
+        self.ml_categories = load_fixture('ml_categories') or json.dumps(synthetic_ml_categories()).encode()
+        self.ml_highlights = load_fixture('ml_highlights') or json.dumps(synthetic_ml_highlights()).encode()
+        self.falabella_search = load_fixture('falabella_search') or json.dumps(synthetic_falabella_search()).encode()
+
+        listado = load_fixture('ml_listado')
+        listing = load_fixture('falabella_listing')
+        self.ml_listado = listado or synthetic_listado(500).encode()
+        self.falabella_listing = listing or synthetic_listing().encode()
+        self.items = {item['id']: item for item in self.ml_search.get('results', [])}
+        self.ml_category_tree = synthetic_ml_category_tree(json.loads(self.ml_categories))
+
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        scheme = 'https' if self.certfile else 'http'
+        return f"{scheme}://127.0.0.1:{self._server.server_port}"
+
+    def origin(self, host: str) -> str:
+        """Stub URL standing in for https://<host>"""
+        return f"{self.base_url}/{host}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body leave in one write, without Nagle delays
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stub.connection_opened()
+
+            def do_GET(self):
+                stub.handle(self)
+
+            def do_HEAD(self):
+                stub.handle(self, body=False)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = StubHTTPServer(('127.0.0.1', 0), Handler)
+        if self.certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.certfile, self.keyfile)
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections += 1
+
+    def count(self, route: str):
+        with self._lock:
+            self.counts[route] = self.counts.get(route, 0) + 1
+
+    def handle(self, request: BaseHTTPRequestHandler, body: bool = True):
+        parts = urlsplit(request.path)
+        host, _, path = parts.path.lstrip('/').partition('/')
+        path = '/' + path
+        params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+
+        route, status, content_type, payload = self.route(host, path, params)
+        self.count(route)
+
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+            roll = self._rng.random()
+        if delay:
+            time.sleep(delay)
+
+        headers = {}
+        if status == 200 and roll < self.error_rate:
+            status, content_type, payload = 500, 'application/json', b'{"message":"injected error"}'
+        elif status == 200 and roll < self.error_rate + self.throttle_rate:
+            status, content_type, payload = 429, 'application/json', b'{"message":"too many requests"}'
+            headers['Retry-After'] = f"{self.retry_after:g}"
+
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.end_headers()
+        if body:
+            request.wfile.write(payload)
+
+    def route(self, host: str, path: str, params: Dict[str, str]) -> Tuple[str, int, str, bytes]:
+        """(route name, status, content type, body) for a request"""
+        json_type = 'application/json; charset=utf-8'
+        html_type = 'text/html; charset=utf-8'
+
+        if host == 'api.mercadolibre.com':
+            if path == '/sites/MLC/search':
+                return 'ml_search', 200, json_type, self.search_page(params)
+            if path == '/sites/MLC/categories':
+                return 'ml_categories', 200, json_type, self.ml_categories
+            if path.startswith('/categories/'):
+                category = self.ml_category_tree.get(path.rsplit('/', 1)[1])
+                if category is not None:
+                    return 'ml_category', 200, json_type, json.dumps(category).encode()
+            if path in SITE_INFO:
+                return 'ml_site_info', 200, json_type, json.dumps(SITE_INFO[path]).encode()
+            if path.startswith('/highlights/'):
+                return 'ml_highlights', 200, json_type, self.ml_highlights
+            if path == '/items':
+                return 'ml_items', 200, json_type, self.multi_get(params.get('ids', ''))
+        elif host in ('listado.mercadolibre.cl', 'www.mercadolibre.cl'):
+            return 'ml_listado', 200, html_type, self.ml_listado
+        elif host == 'www.falabella.com':
+            if path.startswith('/rest/'):
+                return 'falabella_api', 200, json_type, self.falabella_search
+            if path.startswith('/falabella-cl/search'):
+                return 'falabella_listing', 200, html_type, self.falabella_listing
+
+        return 'not_found', 404, json_type, b'{"message":"not found"}'
+
+    def search_page(self, params: Dict[str, str]) -> bytes:
+        offset = int(params.get('offset', 0))
+        limit = min(int(params.get('limit', 50)), 50)
+        results = self.ml_search.get('results', [])
+        paging = {**self.ml_search.get('paging', {}), 'offset': offset, 'limit': limit}
+        return json.dumps(select_attributes({
+            **self.ml_search,
+            'query': params.get('q'),
+            'paging': paging,
+            'results': results[offset:offset + limit]
+        }, params.get('attributes'))).encode()
+
+    def multi_get(self, ids: str) -> bytes:
+        answers = []
+        for item_id in filter(None, ids.split(',')):
+            item = self.items.get(item_id)
+            if item is not None:
+                answers.append({'code': 200, 'body': item})
+            elif ML_ITEM_ID_RE.match(item_id):
+                answers.append({'code': 404, 'body': {'message': f'Item with id {item_id} not found', 'status': 404}})
+            else:
+                answers.append({'code': 400, 'body': {'message': f'Invalid id {item_id}', 'status': 400}})
+        return json.dumps(answers).encode()
+
+
+class RedirectAdapter(BaseAdapter):
+    """Sends every request of a session to the stub, keeping the original host in the path"""
+
+    def __init__(self, inner: BaseAdapter, stub: StubServer):
+        super().__init__()
+        self.inner = inner
+        self.stub = stub
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        stub = urlsplit(self.stub.base_url)
+        request.url = urlunsplit((stub.scheme, stub.netloc, f"/{parts.hostname}{parts.path}", parts.query, ''))
+        return self.inner.send(request, **kwargs)
+
+    def close(self):
+        self.inner.close()
+
+
+def redirect_session(session: Session, stub: StubServer):
+    """Route a client's session to the stub, keeping its mounted cache/rate limiting"""
+    inner = session.get_adapter('https://')
+    adapter = RedirectAdapter(inner, stub)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if stub.certfile:
+        # The stub's self-signed certificate is its own CA; REQUESTS_CA_BUNDLE
+        # would otherwise take precedence over session.verify
+        session.verify = stub.certfile
+        session.trust_env = False
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--record', action='store_true', help='save real responses as fixtures and exit')
+    parser.add_argument('--query', default=RECORD_QUERY, help='search term --record uses')
+    args = parser.parse_args()
+
+    if args.record:
+        # Record what the sites answer now, not what the response cache holds
+        os.environ['FERIADOS24_HTTP_CACHE'] = '0'
+        print(f"📼 Recording fixtures into {FIXTURES_DIR}")
+        written = record_fixtures(args.query)
+        sys.exit(0 if any(size is not None for size in written.values()) else 1)
+
+    with StubServer(args.latency, args.jitter, args.error_rate, args.throttle_rate) as stub:
+        print(f"🧪 Stub server on {stub.base_url}")
+        print(f"   e.g. {stub.origin('api.mercadolibre.com')}/sites/MLC/search?q=parrilla")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,37 @@ Tests if we can extract product data from the site
 """
 
 import requests
-from bs4 import BeautifulSoup
 import json
-import time
 from typing import Dict, List, Optional
 
+from endpoint_discovery import EndpointRegistry, discover, print_discovery
+from extraction_plan import ExtractionPlan, PlanStore
+from html_parsers import ParserBackend, get_parser
+from http_cache import ResponseCache, install_cache
+from metrics import report, timed_parser, verbose
+from products import Product, to_clp
+
+# Product container patterns, in priority order
+PRODUCT_SELECTORS = [
+    'div[data-testid="product-pod"]',
+    'div[class*="search-results-item"]',
+    'div[class*="product-item"]',
+    'article[class*="product"]',
+    'div[class*="pod-item"]',
+    'div[class*="ProductCard"]'
+]
+
+# Patterns for each product field, in priority order
+FIELD_SELECTORS = {
+    'name': ['h2', 'h3', 'a[class*="name"]', 'span[class*="title"]', '[class*="product-name"]'],
+    'price': ['span[class*="price"]', 'div[class*="price"]', '[data-testid*="price"]'],
+    'image': ['img'],
+    'link': ['a']
+}
+
 class FalabellaScraper:
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None, parser: Optional[str] = None,
+                 plan_store: Optional[PlanStore] = None):
         self.base_url = "https://www.falabella.com/falabella-cl"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -24,6 +48,11 @@ class FalabellaScraper:
         }
         self.session = requests.Session()
         self.session.headers.update(self.headers)
+        self.cache = install_cache(self.session, cache)
+        # Fastest installed HTML parser unless one is named explicitly
+        self.parser: ParserBackend = get_parser(parser)
+        # Remembers which container selector works for the current layout
+        self.plan = ExtractionPlan('falabella', PRODUCT_SELECTORS, FIELD_SELECTORS, plan_store)
 
     def search_products(self, query: str, category: str = "") -> Optional[Dict]:
         """
@@ -32,11 +61,11 @@ class FalabellaScraper:
         search_url = f"{self.base_url}/search?Ntt={query}"
 
         try:
-            print(f"🔍 Searching for: {query}")
-            print(f"URL: {search_url}")
+            verbose(f"🔍 Searching for: {query}")
+            verbose(f"URL: {search_url}")
 
             response = self.session.get(search_url, timeout=10)
-            print(f"Status Code: {response.status_code}")
+            verbose(f"Status Code: {response.status_code}")
 
             if response.status_code == 200:
                 return self.parse_search_results(response.text)
@@ -48,114 +77,108 @@ class FalabellaScraper:
             print(f"❌ Error during request: {str(e)}")
             return None
 
+    @timed_parser('falabella.listing')
     def parse_search_results(self, html: str) -> Dict:
         """
         Parse HTML and extract product information
         """
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = self.parser.parse(html)
         results = {
             'products': [],
             'total_found': 0
         }
 
         # Try to find products in common container patterns
-        product_selectors = [
-            'div[data-testid="product-pod"]',
-            'div[class*="search-results-item"]',
-            'div[class*="product-item"]',
-            'article[class*="product"]',
-            'div[class*="pod-item"]',
-            'div[class*="ProductCard"]'
-        ]
-
-        products_found = False
-        for selector in product_selectors:
-            products = soup.select(selector)
-            if products:
-                print(f"✅ Found {len(products)} products with selector: {selector}")
-                products_found = True
+        products, selector = self.plan.find_products(soup, html)
+        if products:
+            verbose(f"✅ Found {len(products)} products with selector: {selector}")
 
-                for product in products[:5]:  # Limit to first 5 for testing
-                    product_data = self.extract_product_data(product)
-                    if product_data:
-                        results['products'].append(product_data)
-                break
+            for product in products[:5]:  # Limit to first 5 for testing
+                product_data = self.extract_product_data(product)
+                if product_data:
+                    results['products'].append(product_data)
 
-        if not products_found:
+        else:
             # Try to find if there's a script tag with product data
-            scripts = soup.find_all('script', type='application/ld+json')
+            scripts = soup.select('script[type="application/ld+json"]')
             for script in scripts:
                 try:
-                    data = json.loads(script.string)
+                    data = json.loads(script.get_text())
                     if '@type' in data and data['@type'] == 'Product':
-                        print("✅ Found product data in JSON-LD")
-                        results['products'].append({
-                            'name': data.get('name', 'Unknown'),
-                            'price': data.get('offers', {}).get('price', 'N/A'),
-                            'image': data.get('image', ''),
-                            'description': data.get('description', '')[:200]
-                        })
+                        verbose("✅ Found product data in JSON-LD")
+                        results['products'].append(Product(
+                            id=data.get('sku'),
+                            title=data.get('name', 'Unknown'),
+                            price=to_clp(data.get('offers', {}).get('price')),
+                            thumbnail=data.get('image', ''),
+                            permalink=data.get('url'),
+                            source='falabella'
+                        ))
                 except:
                     pass
 
             # Also check for Next.js data
-            next_data = soup.find('script', id='__NEXT_DATA__')
+            next_data = soup.select_one('script#__NEXT_DATA__')
             if next_data:
-                print("ℹ️ Found Next.js data - site uses React/Next.js rendering")
+                verbose("ℹ️ Found Next.js data - site uses React/Next.js rendering")
                 try:
-                    data = json.loads(next_data.string)
-                    print(f"Next.js build ID: {data.get('buildId', 'unknown')}")
+                    data = json.loads(next_data.get_text())
+                    verbose(f"Next.js build ID: {data.get('buildId', 'unknown')}")
                 except:
                     pass
 
         results['total_found'] = len(results['products'])
         return results
 
-    def extract_product_data(self, product_element) -> Optional[Dict]:
+    def extract_product_data(self, product_element) -> Optional[Product]:
         """
         Extract data from a product element
         """
         try:
             product_info = {}
 
-            # Try different patterns for name
-            name_selectors = ['h2', 'h3', 'a[class*="name"]', 'span[class*="title"]', '[class*="product-name"]']
-            for selector in name_selectors:
-                name_elem = product_element.select_one(selector)
-                if name_elem:
-                    product_info['name'] = name_elem.get_text(strip=True)
-                    break
-
-            # Try different patterns for price
-            price_selectors = ['span[class*="price"]', 'div[class*="price"]', '[data-testid*="price"]']
-            for selector in price_selectors:
-                price_elem = product_element.select_one(selector)
-                if price_elem:
-                    product_info['price'] = price_elem.get_text(strip=True)
-                    break
+            # One walk over the element resolves every field's selectors
+            fields = self.plan.extract_fields(product_element)
+
+            name_elem = fields.get('name')
+            if name_elem:
+                product_info['title'] = name_elem.get_text(strip=True)
+
+            price_elem = fields.get('price')
+            if price_elem:
+                product_info['price'] = to_clp(price_elem.get_text(strip=True))
 
             # Try to get image
-            img = product_element.select_one('img')
+            img = fields.get('image')
             if img:
-                product_info['image'] = img.get('src', img.get('data-src', ''))
+                product_info['thumbnail'] = img.get('src', img.get('data-src', ''))
 
             # Get link
-            link = product_element.select_one('a')
+            link = fields.get('link')
             if link:
                 href = link.get('href', '')
                 if not href.startswith('http'):
                     href = f"https://www.falabella.com{href}"
-                product_info['url'] = href
+                product_info['permalink'] = href
 
-            return product_info if product_info else None
+            if not product_info:
+                return None
+            return Product(
+                id=None,
+                title=product_info.pop('title', ''),
+                source='falabella',
+                **product_info
+            )
 
         except Exception as e:
             print(f"Error extracting product data: {e}")
             return None
 
-    def test_api_endpoints(self):
+    def test_api_endpoints(self, refresh: bool = False, registry: Optional[EndpointRegistry] = None) -> Dict[str, Dict]:
         """
         Test if Falabella has accessible API endpoints
+        All candidates are probed at once; results are kept in the endpoint
+        registry and reused until they expire (or refresh is set)
         """
         print("\n🔧 Testing potential API endpoints...")
 
@@ -167,14 +190,9 @@ class FalabellaScraper:
             '/s/api/v1/search'
         ]
 
-        for endpoint in api_endpoints:
-            url = f"https://www.falabella.com{endpoint}"
-            try:
-                response = self.session.get(url, timeout=5)
-                if response.status_code != 404:
-                    print(f"✅ Found endpoint: {endpoint} (Status: {response.status_code})")
-            except:
-                pass
+        results = discover(self.session, "https://www.falabella.com", api_endpoints, registry, refresh=refresh)
+        print_discovery(results)
+        return results
 
 def main():
     print("="*50)
@@ -198,9 +216,8 @@ def main():
             print(f"\n✅ Successfully found {results['total_found']} products for '{query}'")
             for i, product in enumerate(results['products'], 1):
                 print(f"\n Product {i}:")
-                for key, value in product.items():
-                    if value:
-                        print(f"  - {key}: {value[:100] if len(str(value)) > 100 else value}")
+                for key, value in product.display_fields().items():
+                    print(f"  - {key}: {value[:100]}")
         else:
             print(f"\n⚠️ No products found or unable to parse results for '{query}'")
             print("This might be due to:")
@@ -208,10 +225,9 @@ def main():
             print("  2. Anti-scraping measures")
             print("  3. Changed HTML structure")
 
-        time.sleep(2)  # Be respectful with requests
-
     # Test for API endpoints
     scraper.test_api_endpoints()
+    report()
 
     print(f"\n{'='*50}")
     print("📊 RECOMMENDATIONS:")
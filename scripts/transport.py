@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Connection pooling shared by the marketplace clients
+Per-host pool sizes follow how many requests each client keeps in flight
+against that host, so concurrent fetches reuse warm connections instead of
+opening (and discarding) extra ones. Async clients get HTTP/2 when the h2
+package is installed, multiplexing every request to a host over one
+connection, and every client asks for the strongest compression it can
+decode
+"""
+
+import importlib.util
+from typing import Dict, Optional
+
+from urllib3 import PoolManager
+from urllib3.util import make_headers
+
+try:
+    import httpx
+except ImportError:  # Only needed for the async clients
+    httpx = None
+
+# Requests in flight per host at the clients' usual concurrency: get_items'
+# 8 workers plus iter_search prefetch and the async refresh on the API, 4
+# raced Falabella probes, the pipeline's fetchers on the listing pages
+POOL_SIZES = {
+    'api.mercadolibre.com': 16,
+    'listado.mercadolibre.cl': 8,
+    'www.mercadolibre.cl': 4,
+    'www.falabella.com': 8,
+}
+DEFAULT_POOL_SIZE = 10
+
+# Distinct hosts kept pooled at once
+POOL_HOSTS = 16
+
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# Content codings urllib3 can decode here: br / zstd when brotli or zstandard
+# is installed, gzip otherwise. Only for requests sessions
+ACCEPT_ENCODING = make_headers(accept_encoding=True)['accept-encoding']
+
+# What the installed httpx decodes, which can differ: older releases have
+# no zstd decoder even with zstandard installed
+HTTPX_ACCEPT_ENCODING = None
+if httpx is not None:
+    try:
+        from httpx._decoders import SUPPORTED_DECODERS
+        HTTPX_ACCEPT_ENCODING = ', '.join(name for name in SUPPORTED_DECODERS if name != 'identity')
+    except ImportError:  # Private module moved: the codings every httpx decodes
+        HTTPX_ACCEPT_ENCODING = 'gzip, deflate'
+
+
+def pool_size(host: Optional[str], default: int = DEFAULT_POOL_SIZE) -> int:
+    return POOL_SIZES.get(host or '', default)
+
+
+class SizedPoolManager(PoolManager):
+    """PoolManager whose per-host pools are sized from POOL_SIZES"""
+
+    def __init__(self, *args, pool_sizes: Optional[Dict[str, int]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_sizes = {**POOL_SIZES, **(pool_sizes or {})}
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        if request_context is None:
+            request_context = self.connection_pool_kw.copy()
+        default = request_context.get('maxsize') or DEFAULT_POOL_SIZE
+        request_context = {**request_context, 'maxsize': self.pool_sizes.get(host, default)}
+        return super()._new_pool(scheme, host, port, request_context)
+
+
+def create_async_client(headers: Optional[Dict] = None, max_connections: int = 8,
+                        timeout: float = 10, http2: Optional[bool] = None, **kwargs) -> "httpx.AsyncClient":
+    """
+    httpx.AsyncClient sized for `max_connections` concurrent requests
+    HTTP/2 is used when h2 is installed unless http2=False; servers that
+    don't offer it over ALPN are still spoken to over HTTP/1.1.
+    Accept-Encoding is always HTTPX_ACCEPT_ENCODING, whatever `headers` say,
+    so no coding httpx can't decode is ever advertised
+    """
+    if httpx is None:
+        raise ImportError("create_async_client requires httpx (pip install httpx)")
+    if http2 is None:
+        http2 = HTTP2_AVAILABLE
+    headers = {name: value for name, value in (headers or {}).items() if name.lower() != 'accept-encoding'}
+    headers['Accept-Encoding'] = HTTPX_ACCEPT_ENCODING
+
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=timeout,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=30
+        ),
+        **kwargs
+    )